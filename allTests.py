@@ -6,9 +6,39 @@
 import unittest
 
 from progressiveBenchmarks.src.paramsGeneratorTest import TestCase as paramsGeneratorTest
+from progressiveBenchmarks.src.paramsSearchTest import TestCase as paramsSearchTest
+from progressiveBenchmarks.src.mafComparatorTest import TestCase as mafComparatorTest
+from progressiveBenchmarks.src.resultsDbTest import TestCase as resultsDbTest
+from progressiveBenchmarks.src.summaryTest import TestCase as summaryTest
+from progressiveBenchmarks.src.paretoReportTest import TestCase as paretoReportTest
+from progressiveBenchmarks.src.criticalPathTest import TestCase as criticalPathTest
+from progressiveBenchmarks.src.scalingReportTest import TestCase as scalingReportTest
+from progressiveBenchmarks.src.executionTest import TestCase as executionTest
+from progressiveBenchmarks.src.ktServerPoolTest import TestCase as ktServerPoolTest
+from progressiveBenchmarks.src.scratchTest import TestCase as scratchTest
+from progressiveBenchmarks.src.resultCacheTest import TestCase as resultCacheTest
+from progressiveBenchmarks.src.commandCacheTest import TestCase as commandCacheTest
+from progressiveBenchmarks.src.applyNamingToMafTest import TestCase as applyNamingToMafTest
+from progressiveBenchmarks.src.resourceEstimatorTest import TestCase as resourceEstimatorTest
+from progressiveBenchmarks.src.shardsTest import TestCase as shardsTest
 
 def allSuites(): 
-    allTests = unittest.TestSuite((unittest.makeSuite(paramsGeneratorTest, 'test')))
+    allTests = unittest.TestSuite((unittest.makeSuite(paramsGeneratorTest, 'test'),
+                                   unittest.makeSuite(paramsSearchTest, 'test'),
+                                   unittest.makeSuite(mafComparatorTest, 'test'),
+                                   unittest.makeSuite(resultsDbTest, 'test'),
+                                   unittest.makeSuite(summaryTest, 'test'),
+                                   unittest.makeSuite(paretoReportTest, 'test'),
+                                   unittest.makeSuite(criticalPathTest, 'test'),
+                                   unittest.makeSuite(scalingReportTest, 'test'),
+                                   unittest.makeSuite(executionTest, 'test'),
+                                   unittest.makeSuite(ktServerPoolTest, 'test'),
+                                   unittest.makeSuite(scratchTest, 'test'),
+                                   unittest.makeSuite(resultCacheTest, 'test'),
+                                   unittest.makeSuite(commandCacheTest, 'test'),
+                                   unittest.makeSuite(applyNamingToMafTest, 'test'),
+                                   unittest.makeSuite(resourceEstimatorTest, 'test'),
+                                   unittest.makeSuite(shardsTest, 'test')))
                                    
     return allTests
         
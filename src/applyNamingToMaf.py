@@ -14,6 +14,11 @@ the output sequence names
 import os
 import sys
 import math
+import mmap
+import gzip
+import shutil
+import cPickle
+from multiprocessing import Pool
 import xml.etree.ElementTree as ET
 from optparse import OptionParser
 from cactus.progressive.multiCactusProject import MultiCactusProject
@@ -21,7 +26,36 @@ from cactus.progressive.multiCactusTree import MultiCactusTree
 from cactus.progressive.experimentWrapper import ExperimentWrapper
 from cactus.preprocessor.cactus_addFastaHeaderDots import fixHeader
 from cactus.preprocessor.cactus_preprocessor import fileList
-from sonLib.bioio import fastaRead
+from sonLib.bioio import logger
+from progressiveBenchmarks.src.resultCache import stringDigest
+from progressiveBenchmarks.src.resultCache import makeDirs
+
+# the headers of a fasta file (as fastaRead gives them), found by 
+# scanning an mmap of the file for '>' at the start of a line so that 
+# the sequence data is never read into python
+def fastaHeaders(path):
+    if os.path.getsize(path) == 0:
+        return
+    fileHandle = open(path, "rb")
+    data = mmap.mmap(fileHandle.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        if data[0] == ">":
+            start = 0
+        else:
+            start = data.find("\n>")
+            if start != -1:
+                start += 1
+        while start != -1:
+            end = data.find("\n", start)
+            if end == -1:
+                end = len(data)
+            yield data[start + 1:end]
+            start = data.find("\n>", end)
+            if start != -1:
+                start += 1
+    finally:
+        data.close()
+        fileHandle.close()
 
 class NamingMap:
     def __init__(self):
@@ -45,46 +79,180 @@ class NamingMap:
                 if not os.path.isdir(sequenceFile):
                     self.processSequence(eventName, sequenceFile)
     
-    def readExperiment(self, experimentXmlPath):
+    # if cacheDir is given, the map is stored there keyed on the 
+    # experiment path and the size and mtime of each sequence file, and
+    # only rebuilt if one of them changes
+    def readExperiment(self, experimentXmlPath, cacheDir=None):
         expXml = ET.parse(experimentXmlPath).getroot()
         exp = ExperimentWrapper(expXml)
-        self.nameMap = dict()
-        for eventName, sequencePath in exp.seqMap.items():
+        sequenceFiles = []
+        for eventName, sequencePath in sorted(exp.seqMap.items()):
             for sequenceFile in fileList(sequencePath):
                 if not os.path.isdir(sequenceFile):
-                    self.processSequence(eventName, sequenceFile)
+                    sequenceFiles.append((eventName, sequenceFile))
+        
+        cachePath = None
+        if cacheDir is not None:
+            tokens = [os.path.abspath(experimentXmlPath)]
+            for eventName, sequenceFile in sequenceFiles:
+                stat = os.stat(sequenceFile)
+                tokens += [eventName, os.path.abspath(sequenceFile), 
+                           stat.st_size, repr(stat.st_mtime)]
+            cachePath = os.path.join(cacheDir, stringDigest(*tokens))
+            if os.path.isfile(cachePath):
+                cacheFile = open(cachePath, "rb")
+                self.nameMap = cPickle.load(cacheFile)
+                cacheFile.close()
+                return
+            
+        self.nameMap = dict()
+        for eventName, sequenceFile in sequenceFiles:
+            self.processSequence(eventName, sequenceFile)
+        
+        if cachePath is not None:
+            makeDirs(cacheDir)
+            tempPath = "%s.%d" % (cachePath, os.getpid())
+            cacheFile = open(tempPath, "wb")
+            cPickle.dump(self.nameMap, cacheFile, cPickle.HIGHEST_PROTOCOL)
+            cacheFile.close()
+            os.rename(tempPath, cachePath)
+    
+    # digest of the map's contents
+    def digest(self):
+        tokens = []
+        for header, fixedHeader in sorted(self.nameMap.items()):
+            tokens += [header, fixedHeader]
+        return stringDigest(*tokens)
     
     def processSequence(self, eventName, sequencePath):
-        fileHandle = open(sequencePath, "r")
-        for header, sequence in fastaRead(fileHandle):
+        for header in fastaHeaders(sequencePath):
             fixedHeader = fixHeader(header, event=eventName.replace(".", "_"))
-            print (header, fixedHeader, eventName)
+            logger.debug("Renaming %s to %s for %s" % (header, fixedHeader, eventName))
             if header in self.nameMap:
                 assert self.nameMap[header] == fixedHeader
             else:
                 self.nameMap[header] = fixedHeader
 
-def applyNamingToMaf(experimentPath, inputPath, outputPath):
-    inFile = open(inputPath, "r")
-    outFile = open(outputPath, "w")
+BufferSize = 1 << 24
+
+def openMaf(path, mode):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode)
+    return open(path, mode, BufferSize)
+
+# rename the sequences in the s lines of a chunk of maf text.  renames
+# only holds the names that change, and only s lines are split
+def renameText(text, renames):
+    lines = text.splitlines(True)
+    for i in xrange(len(lines)):
+        line = lines[i]
+        if line[:1] == "s":
+            tokens = line.split(None, 2)
+            if len(tokens) >= 2 and tokens[0] == "s" and tokens[1] in renames:
+                lines[i] = line.replace(tokens[1], renames[tokens[1]], 1)
+    return "".join(lines)
+
+# stream length bytes (or everything if None) from inFile to outFile,
+# renaming in buffer sized pieces cut at line ends
+def renameStream(inFile, outFile, renames, length=None):
+    remainder = ""
+    while length is None or length > 0:
+        size = BufferSize
+        if length is not None:
+            size = min(size, length)
+            length -= size
+        data = inFile.read(size)
+        if not data:
+            break
+        data = remainder + data
+        cut = data.rfind("\n") + 1
+        remainder = data[cut:]
+        outFile.write(renameText(data[:cut], renames))
+    outFile.write(renameText(remainder, renames))
+
+# offsets splitting an uncompressed maf into about numChunks pieces
+# that each start at an alignment block
+def blockBoundaries(path, numChunks):
+    size = os.path.getsize(path)
+    boundaries = [0]
+    if size > 0:
+        fileHandle = open(path, "rb")
+        data = mmap.mmap(fileHandle.fileno(), 0, access=mmap.ACCESS_READ)
+        for i in xrange(1, numChunks):
+            start = data.find("\na", max(boundaries[-1], i * size / numChunks))
+            if start == -1:
+                break
+            if start + 1 > boundaries[-1]:
+                boundaries.append(start + 1)
+        data.close()
+        fileHandle.close()
+    boundaries.append(size)
+    return boundaries
+
+# renames shared with the pool workers (inherited when they fork)
+_renames = None
+
+def _renameRange(args):
+    inputPath, start, end, partPath = args
+    inFile = open(inputPath, "rb")
+    inFile.seek(start)
+    outFile = openMaf(partPath, "wb")
+    renameStream(inFile, outFile, _renames, end - start)
+    outFile.close()
+    inFile.close()
+
+# rewrite a maf with the cactus sequence names.  either maf can be
+# gzipped.  with numProcesses > 1, an uncompressed input is split at
+# block boundaries and the pieces renamed in parallel then concatenated
+# (concatenated gzip members are a valid gzip file)
+def applyNamingToMaf(experimentPath, inputPath, outputPath, cacheDir=None,
+                     numProcesses=1):
     nameMap = NamingMap()
-    nameMap.readExperiment(experimentPath)
-    
-    for line in inFile:
-        tokens = line.split()
-        if len(tokens) >= 2 and tokens[0] == 's':
-            name = tokens[1]
-            outFile.write(line.replace(name, nameMap.cactusName(name), 1))
-        else:
-            outFile.write(line)
+    nameMap.readExperiment(experimentPath, cacheDir)
+    applyNamingMapToMaf(nameMap, inputPath, outputPath, numProcesses)
+
+def applyNamingMapToMaf(nameMap, inputPath, outputPath, numProcesses=1):
+    global _renames
+    renames = dict([(k, v) for k, v in nameMap.nameMap.items() if k != v])
     
-    inFile.close()
-    outFile.close()
+    if numProcesses > 1 and not inputPath.endswith(".gz"):
+        boundaries = blockBoundaries(inputPath, numProcesses)
+        jobs = []
+        for i in xrange(len(boundaries) - 1):
+            # parts are compressed if the output is
+            partPath = "%s.part%d%s" % (outputPath, i, os.path.splitext(outputPath)[1])
+            jobs.append((inputPath, boundaries[i], boundaries[i + 1], partPath))
+        _renames = renames
+        pool = Pool(numProcesses)
+        try:
+            pool.map(_renameRange, jobs)
+        finally:
+            pool.close()
+            pool.join()
+            _renames = None
+        outFile = open(outputPath, "wb")
+        for job in jobs:
+            partFile = open(job[3], "rb")
+            shutil.copyfileobj(partFile, outFile, BufferSize)
+            partFile.close()
+            os.remove(job[3])
+        outFile.close()
+    else:
+        inFile = openMaf(inputPath, "rb")
+        outFile = openMaf(outputPath, "wb")
+        renameStream(inFile, outFile, renames)
+        inFile.close()
+        outFile.close()
     
 def main():
     usage = "usage: %prog <experiment> <input maf> <output maf>"
     description = "Apply naming conventions to maf"
     parser = OptionParser(usage=usage, description=description)
+    parser.add_option("--cacheDir", dest="cacheDir", default=None,
+                      help="directory to store name maps in for reuse")
+    parser.add_option("--numProcesses", dest="numProcesses", type="int",
+                      default=1, help="rename pieces of an uncompressed maf "
+                      "in parallel [default=%default]")
     
     options, args = parser.parse_args()
     
@@ -92,7 +260,8 @@ def main():
         parser.print_help()
         raise RuntimeError("Wrong number of arguments")
 
-    applyNamingToMaf(args[0], args[1], args[2])
+    applyNamingToMaf(args[0], args[1], args[2], options.cacheDir,
+                     options.numProcesses)
     
 if __name__ == '__main__':    
     main()
\ No newline at end of file
@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+
+#Copyright (C) 2011 by Glenn Hickey
+#
+#Released under the MIT license, see LICENSE.txt
+"""
+"""
+
+import unittest
+import os
+import gzip
+import shutil
+import tempfile
+from StringIO import StringIO
+
+from progressiveBenchmarks.src import applyNamingToMaf
+from progressiveBenchmarks.src.applyNamingToMaf import NamingMap
+from progressiveBenchmarks.src.applyNamingToMaf import fastaHeaders
+from progressiveBenchmarks.src.applyNamingToMaf import renameStream
+from progressiveBenchmarks.src.applyNamingToMaf import blockBoundaries
+from progressiveBenchmarks.src.applyNamingToMaf import applyNamingMapToMaf
+
+Block = ("a score=%d\n"
+         "s human.chr1 %d 4 + 100 ACGT\n"
+         "s mouse 2 4 - 80 AC-T\n"
+         "i mouse N 0 C 0\n"
+         "s rat.chr2 0 4 + 50 ACGT\n"
+         "e cow 0 4 + 60 I\n"
+         "\n")
+
+class TestCase(unittest.TestCase):
+
+    def setUp(self):
+        unittest.TestCase.setUp(self)
+        self.tempDir = tempfile.mkdtemp()
+        self.bufferSize = applyNamingToMaf.BufferSize
+        self.nameMap = NamingMap()
+        self.nameMap.nameMap = {"human.chr1" : "human.human_chr1",
+                                "mouse" : "mouse.mouse",
+                                "rat.chr2" : "rat.chr2"}
+        self.mafPath = self.writeFile("in.maf", "##maf version=1\n# s human.chr1\n\n" +
+                                      "".join([Block % (i, i) for i in xrange(50)]))
+        self.expected = self.oldRename(self.mafPath)
+
+    def tearDown(self):
+        unittest.TestCase.tearDown(self)
+        applyNamingToMaf.BufferSize = self.bufferSize
+        shutil.rmtree(self.tempDir)
+
+    def writeFile(self, name, contents):
+        path = os.path.join(self.tempDir, name)
+        outFile = open(path, "wb")
+        outFile.write(contents)
+        outFile.close()
+        return path
+
+    # the rename as it was done line by line before it was streamed
+    def oldRename(self, inputPath):
+        outFile = StringIO()
+        for line in open(inputPath, "r"):
+            tokens = line.split()
+            if len(tokens) >= 2 and tokens[0] == 's':
+                name = tokens[1]
+                outFile.write(line.replace(name, self.nameMap.cactusName(name), 1))
+            else:
+                outFile.write(line)
+        return outFile.getvalue()
+
+    def testFastaHeaders(self):
+        path = self.writeFile("a.fa", ">chr1 x\nAC>GT\nAC\n>chr2\n\n>chr3\nGG")
+        assert list(fastaHeaders(path)) == ["chr1 x", "chr2", "chr3"]
+        path = self.writeFile("b.fa", "junk\n>chr1\nAC\n>chr2")
+        assert list(fastaHeaders(path)) == ["chr1", "chr2"]
+        path = self.writeFile("c.fa", "")
+        assert list(fastaHeaders(path)) == []
+
+    def testRenameStream(self):
+        data = open(self.mafPath, "rb").read()
+        # buffers ending mid line, on a line end and on a block boundary
+        for bufferSize in [1, 7, 29, len(Block), len(data) - 1, len(data), 1 << 20]:
+            applyNamingToMaf.BufferSize = bufferSize
+            renames = dict([(k, v) for k, v in self.nameMap.nameMap.items() if k != v])
+            outFile = StringIO()
+            renameStream(StringIO(data), outFile, renames)
+            assert outFile.getvalue() == self.expected
+        # a length stops the stream part way, with no trailing newline
+        outFile = StringIO()
+        renameStream(StringIO(data), outFile, renames, 20)
+        assert outFile.getvalue() == self.expected[:20]
+
+    def testBlockBoundaries(self):
+        size = os.path.getsize(self.mafPath)
+        data = open(self.mafPath, "rb").read()
+        for numChunks in [1, 2, 3, 7, 1000]:
+            boundaries = blockBoundaries(self.mafPath, numChunks)
+            assert boundaries[0] == 0
+            assert boundaries[-1] == size
+            assert len(boundaries) <= numChunks + 1
+            assert boundaries == sorted(set(boundaries))
+            for start in boundaries[1:-1]:
+                assert data[start - 1:start + 1] == "\na"
+        assert blockBoundaries(self.writeFile("empty.maf", ""), 4) == [0, 0]
+
+    def testRenameRange(self):
+        data = open(self.mafPath, "rb").read()
+        boundaries = blockBoundaries(self.mafPath, 3)
+        applyNamingToMaf._renames = self.nameMap.nameMap
+        try:
+            parts = []
+            for i in xrange(len(boundaries) - 1):
+                partPath = os.path.join(self.tempDir, "part%d.maf" % i)
+                applyNamingToMaf._renameRange((self.mafPath, boundaries[i],
+                                               boundaries[i + 1], partPath))
+                parts.append(open(partPath, "rb").read())
+        finally:
+            applyNamingToMaf._renames = None
+        assert "".join(parts) == self.expected
+
+    def testSameAsLineByLine(self):
+        applyNamingToMaf.BufferSize = 64
+        outPath = os.path.join(self.tempDir, "out.maf")
+        for numProcesses in [1, 3]:
+            applyNamingMapToMaf(self.nameMap, self.mafPath, outPath, numProcesses)
+            assert open(outPath, "rb").read() == self.expected
+            # gzipped output, which in parallel is one member per piece
+            applyNamingMapToMaf(self.nameMap, self.mafPath, outPath + ".gz", numProcesses)
+            assert gzip.open(outPath + ".gz", "rb").read() == self.expected
+        assert sorted(os.listdir(self.tempDir)) == ["in.maf", "out.maf", "out.maf.gz"]
+        # gzipped input
+        gzFile = gzip.open(os.path.join(self.tempDir, "in.maf.gz"), "wb")
+        gzFile.write(open(self.mafPath, "rb").read())
+        gzFile.close()
+        applyNamingMapToMaf(self.nameMap, self.mafPath + ".gz", outPath, 3)
+        assert open(outPath, "rb").read() == self.expected
+
+def main():
+    unittest.main()
+
+if __name__ == '__main__':
+    main()
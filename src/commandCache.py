@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+
+#Copyright (C) 2011 by Glenn Hickey
+#
+#Released under the MIT license, see LICENSE.txt
+
+""" cache the output of the external commands that cactus runs on
+sequence chunks, such as the preprocessors and the lastz blast stage.  The command strings
+in the config are wrapped so that cactus calls this script instead.
+The output is looked up by the command, with the paths of its input
+chunks replaced by their digests, and the command is only run on a
+miss.  Since the key doesn't depend on cactus's temporary file names,
+every parameter combination of a sweep shares the same outputs.
+
+"""
+
+import os
+import sys
+import shutil
+from optparse import OptionParser
+
+from sonLib.bioio import logger
+from sonLib.bioio import system
+from progressiveBenchmarks.src.resultCache import fileDigest
+from progressiveBenchmarks.src.resultCache import stringDigest
+from progressiveBenchmarks.src.resultCache import makeDirs
+
+# placeholder for the output file in wrapped commands
+OutputToken = "CACHED_OUTPUT"
+
+class CommandCache:
+    # the digests of stable inputs (a whole genome given to every 
+    # chunk's command) are remembered in memoDir (see fileDigest), so
+    # they are only read once.  other inputs are cactus's temporary
+    # chunk files, whose paths are reused, so they are always read
+    def __init__(self, cacheDir, memoDir=None):
+        self.cacheDir = os.path.abspath(cacheDir)
+        self.memoDir = memoDir
+
+    def getKey(self, command, inputPaths, tag="", stablePaths=[]):
+        digests = dict([(i, fileDigest(i)) for i in inputPaths])
+        for path in stablePaths:
+            digests[path] = fileDigest(path, self.memoDir)
+        for path in sorted(digests.keys(), key=len, reverse=True):
+            command = command.replace(path, digests[path])
+        return stringDigest(command, tag)
+
+    def entryPath(self, key):
+        return os.path.join(self.cacheDir, key[:2], key)
+
+    def lookup(self, key):
+        path = self.entryPath(key)
+        if os.path.isfile(path):
+            return path
+        return None
+
+    # a scratch path on the same filesystem as the entry, so that
+    # storing it is an atomic rename
+    def tempPath(self, key):
+        makeDirs(os.path.dirname(self.entryPath(key)))
+        return "%s.%s.%d" % (self.entryPath(key), os.uname()[1], os.getpid())
+
+    def store(self, key, path):
+        os.rename(path, self.entryPath(key))
+        return self.entryPath(key)
+
+    # run command (with OutputToken standing in for the output file)
+    # unless its output is already cached, then copy the output to
+    # outputPath.  the output is copied rather than linked since
+    # cactus compresses and deletes its chunk files in place
+    def run(self, command, inputPaths, outputPath, tag="", stablePaths=[]):
+        key = self.getKey(command, inputPaths, tag, stablePaths)
+        cachedPath = self.lookup(key)
+        if cachedPath is None:
+            tempPath = self.tempPath(key)
+            try:
+                system(command.replace(OutputToken, tempPath))
+                cachedPath = self.store(key, tempPath)
+            finally:
+                if os.path.exists(tempPath):
+                    os.remove(tempPath)
+            logger.info("Cached output of %s as %s" % (command, key))
+        else:
+            logger.info("Reusing cached output %s for %s" % (key, command))
+        shutil.copyfile(cachedPath, outputPath)
+
+def shellQuote(string):
+    for c in ["\\", "\"", "$", "`"]:
+        string = string.replace(c, "\\" + c)
+    return "\"%s\"" % string
+
+# wrap a command string from the config so that it is run through the
+# cache.  inputTokens and outputToken are the placeholders that cactus
+# fills in with the chunk files (eg SEQ_FILE_1 and CIGARS_FILE).
+# stableTokens are filled in with files that are the same for every
+# chunk, whose digests are remembered in memoDir
+def wrapCommand(command, inputTokens, outputToken, cacheDir, tag="", memoDir=None,
+                stableTokens=[]):
+    tokens = [sys.executable, os.path.abspath(__file__).replace(".pyc", ".py"),
+              "--cacheDir", shellQuote(cacheDir), "--tag", shellQuote(tag)]
+    if memoDir is not None:
+        tokens += ["--memoDir", shellQuote(memoDir)]
+    for inputToken in inputTokens:
+        tokens += ["--input", inputToken]
+    for stableToken in stableTokens:
+        tokens += ["--stableInput", stableToken]
+    tokens += ["--output", outputToken]
+    tokens += ["--command", shellQuote(command.replace(outputToken, OutputToken))]
+    return " ".join(tokens)
+
+# route the blast and self blast stages of every iteration in the
+# config through the cache in cacheDir
+def wrapBlastStrings(config, cacheDir, memoDir=None):
+    iterationsElem = config.find("alignment").find("iterations")
+    for blastElem in iterationsElem.getiterator("blast"):
+        tag = "chunkSize=%s" % blastElem.attrib.get("chunkSize", "")
+        if "blastString" in blastElem.attrib:
+            blastElem.attrib["blastString"] = wrapCommand(
+                blastElem.attrib["blastString"], ["SEQ_FILE_1", "SEQ_FILE_2"],
+                "CIGARS_FILE", cacheDir, tag, memoDir)
+        if "selfBlastString" in blastElem.attrib:
+            blastElem.attrib["selfBlastString"] = wrapCommand(
+                blastElem.attrib["selfBlastString"], ["SEQ_FILE"],
+                "CIGARS_FILE", cacheDir, tag, memoDir)
+
+# route the preprocessors (header dot fixing, repeat masking) through
+# the cache in cacheDir, so each input chunk is only preprocessed once
+# per preprocessorString.  TARGET_FILE is the chunk, unless QUERY_FILE 
+# is too, in which case it is the whole sequence the chunk is masked 
+# against
+def wrapPreprocessorStrings(config, cacheDir, memoDir=None):
+    for prepElem in config.findall("preprocessor"):
+        command = prepElem.attrib["preprocessorString"]
+        if "QUERY_FILE" in command:
+            inputTokens = ["QUERY_FILE"]
+            stableTokens = [i for i in ["TARGET_FILE"] if i in command]
+        else:
+            inputTokens = [i for i in ["TARGET_FILE"] if i in command]
+            stableTokens = []
+        tag = "chunkSize=%s overlapSize=%s" % (prepElem.attrib.get("chunkSize", ""),
+                                               prepElem.attrib.get("overlapSize", ""))
+        prepElem.attrib["preprocessorString"] = wrapCommand(
+            command, inputTokens, "OUT_FILE", cacheDir, tag, memoDir, stableTokens)
+
+def main():
+    usage = "usage: %prog --cacheDir <dir> --input <file> --output <file> --command <command>"
+    description = "Run a command unless its output is already cached"
+    parser = OptionParser(usage=usage, description=description)
+    parser.add_option("--cacheDir", dest="cacheDir", help="cache directory")
+    parser.add_option("--input", dest="inputs", action="append", default=[],
+                      help="input file of the command (may be repeated)")
+    parser.add_option("--stableInput", dest="stableInputs", action="append", default=[],
+                      help="input file of the command that is the same for "
+                      "every chunk (may be repeated)")
+    parser.add_option("--output", dest="output",
+                      help="where to write the output of the command")
+    parser.add_option("--command", dest="command",
+                      help="command to run, with %s in place of the output file" % OutputToken)
+    parser.add_option("--tag", dest="tag", default="",
+                      help="extra string to include in the cache key")
+    parser.add_option("--memoDir", dest="memoDir", default=None,
+                      help="directory remembering the digests of the stable inputs")
+
+    options, args = parser.parse_args()
+
+    if len(args) != 0 or options.cacheDir is None or options.output is None \
+       or options.command is None:
+        parser.print_help()
+        raise RuntimeError("Wrong arguments")
+
+    CommandCache(options.cacheDir, options.memoDir).run(options.command, options.inputs,
+                                                        options.output, options.tag,
+                                                        options.stableInputs)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+
+#Copyright (C) 2011 by Glenn Hickey
+#
+#Released under the MIT license, see LICENSE.txt
+"""
+"""
+
+import unittest
+import os
+import shutil
+import tempfile
+import subprocess
+import xml.etree.ElementTree as ET
+
+from progressiveBenchmarks.src.commandCache import CommandCache
+from progressiveBenchmarks.src.commandCache import shellQuote
+from progressiveBenchmarks.src.commandCache import wrapCommand
+from progressiveBenchmarks.src.commandCache import wrapBlastStrings
+from progressiveBenchmarks.src.commandCache import wrapPreprocessorStrings
+
+class TestCase(unittest.TestCase):
+
+    def setUp(self):
+        unittest.TestCase.setUp(self)
+        self.tempDir = tempfile.mkdtemp()
+        self.cacheDir = os.path.join(self.tempDir, "cache")
+        self.memoDir = os.path.join(self.tempDir, "memo")
+        self.counter = os.path.join(self.tempDir, "counter")
+
+    def tearDown(self):
+        unittest.TestCase.tearDown(self)
+        shutil.rmtree(self.tempDir)
+
+    def writeFile(self, name, contents):
+        path = os.path.join(self.tempDir, name)
+        outFile = open(path, "w")
+        outFile.write(contents)
+        outFile.close()
+        return path
+
+    # number of times the test commands really ran
+    def runs(self):
+        if not os.path.exists(self.counter):
+            return 0
+        return len(open(self.counter).readlines())
+
+    def testShellQuote(self):
+        for string in ["plain", "a \"b\" $HOME `ls` \\ 'c' d;e"]:
+            output = subprocess.Popen("printf %%s %s" % shellQuote(string), shell=True,
+                                      stdout=subprocess.PIPE).communicate()[0]
+            assert output == string
+
+    def testRoundTrip(self):
+        cache = CommandCache(self.cacheDir, self.memoDir)
+        input1 = self.writeFile("chunk1.fa", ">a\nACGT\n")
+        command = "cat %s > CACHED_OUTPUT; echo ran >> %s" % (input1, self.counter)
+        output = os.path.join(self.tempDir, "out1")
+        cache.run(command, [input1], output)
+        assert open(output).read() == ">a\nACGT\n"
+        assert self.runs() == 1
+        # chunk paths are reused by cactus, so their digests aren't kept
+        assert not os.path.exists(self.memoDir)
+
+        # a chunk with another (temporary) name but the same contents hits
+        input2 = self.writeFile("chunk2.fa", ">a\nACGT\n")
+        command = "cat %s > CACHED_OUTPUT; echo ran >> %s" % (input2, self.counter)
+        output = os.path.join(self.tempDir, "out2")
+        cache.run(command, [input2], output)
+        assert open(output).read() == ">a\nACGT\n"
+        assert self.runs() == 1
+
+        # as long as the tag is the same
+        cache.run(command, [input2], output, tag="chunkSize=10")
+        assert self.runs() == 2
+
+        # different contents miss
+        self.writeFile("chunk2.fa", ">a\nACGTT\n")
+        cache.run(command, [input2], output)
+        assert open(output).read() == ">a\nACGTT\n"
+        assert self.runs() == 3
+
+        # the digests of stable inputs are remembered
+        genome = self.writeFile("genome.fa", ">g\nGGGG\n")
+        command = "cat %s %s > CACHED_OUTPUT; echo ran >> %s" % (input2, genome,
+                                                                 self.counter)
+        cache.run(command, [input2], output, stablePaths=[genome])
+        assert open(output).read() == ">a\nACGTT\n>g\nGGGG\n"
+        assert len(os.listdir(self.memoDir)) == 1
+        cache.run(command, [input2], output, stablePaths=[genome])
+        assert self.runs() == 4
+
+    def testWrapCommand(self):
+        seq1 = self.writeFile("seq1.fa", ">a\nAC\n")
+        seq2 = self.writeFile("seq2.fa", ">b\nGT\n")
+        wrapped = wrapCommand("cat SEQ_FILE_1 SEQ_FILE_2 > CIGARS_FILE; echo \"$$\" >> %s" %
+                              self.counter, ["SEQ_FILE_1", "SEQ_FILE_2"], "CIGARS_FILE",
+                              self.cacheDir, "tag", self.memoDir)
+        for i in xrange(2):
+            output = os.path.join(self.tempDir, "cigars%d" % i)
+            # as cactus fills in the tokens
+            command = wrapped.replace("SEQ_FILE_1", seq1).replace(
+                "SEQ_FILE_2", seq2).replace("CIGARS_FILE", output)
+            assert subprocess.call(command, shell=True) == 0
+            assert open(output).read() == ">a\nAC\n>b\nGT\n"
+        assert self.runs() == 1
+
+    def testWrapConfig(self):
+        config = ET.fromstring("<config><alignment><iterations>"
+                               "<iteration><blast chunkSize=\"100\" "
+                               "blastString=\"lastz SEQ_FILE_1 SEQ_FILE_2 > CIGARS_FILE\" "
+                               "selfBlastString=\"lastz SEQ_FILE > CIGARS_FILE\"/></iteration>"
+                               "<iteration><blast/></iteration>"
+                               "</iterations></alignment>"
+                               "<preprocessor chunkSize=\"5\" "
+                               "preprocessorString=\"dots TARGET_FILE OUT_FILE\"/>"
+                               "<preprocessor chunkSize=\"5\" "
+                               "preprocessorString=\"mask QUERY_FILE TARGET_FILE OUT_FILE\"/>"
+                               "</config>")
+        wrapBlastStrings(config, self.cacheDir, self.memoDir)
+        wrapPreprocessorStrings(config, self.cacheDir, self.memoDir)
+        blastElem = config.find("alignment").find("iterations").find("iteration").find("blast")
+        blastString = blastElem.attrib["blastString"]
+        assert "commandCache.py" in blastString
+        assert "--input SEQ_FILE_1 --input SEQ_FILE_2 --output CIGARS_FILE" in blastString
+        assert "--memoDir" in blastString
+        assert "chunkSize=100" in blastString
+        assert "--input SEQ_FILE --output CIGARS_FILE" in blastElem.attrib["selfBlastString"]
+        dotsString, maskString = [i.attrib["preprocessorString"] for i in
+                                  config.findall("preprocessor")]
+        assert "--input TARGET_FILE --output OUT_FILE" in dotsString
+        assert "--stableInput" not in dotsString
+        assert "dots TARGET_FILE CACHED_OUTPUT" in dotsString
+        # the chunk is masked against the whole sequence
+        assert "--input QUERY_FILE --stableInput TARGET_FILE --output OUT_FILE" in maskString
+
+def main():
+    unittest.main()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+
+#Copyright (C) 2011 by Glenn Hickey
+#
+#Released under the MIT license, see LICENSE.txt
+
+""" critical path and parallel efficiency of a finished alignment.
+A progressive run is a DAG of subproblems (one per ancestor, each
+waiting on the ancestors below it).  Each subproblem is taken to start
+when the last of its children finishes and to finish when its
+reference sequence is written.  The longest chain of subproblems, the
+tail spent building the maf after the root, and the parallelism jobTree
+achieved relative to the threads it was given are written to
+criticalPath.xml in the output directory.
+
+"""
+
+import os
+import xml.etree.ElementTree as ET
+from optparse import OptionParser
+
+from cactus.progressive.multiCactusProject import MultiCactusProject
+from cactus.progressive.experimentWrapper import ExperimentWrapper
+
+# longest chain through a DAG.  durations maps each node to its
+# length and dependencies maps each node to the nodes it waits on.
+# returns (length, nodes of the chain from first to last)
+def longestPath(durations, dependencies):
+    finish = dict()
+    previous = dict()
+    def visit(node):
+        if node not in finish:
+            finish[node] = 0.0
+            previous[node] = None
+            for dep in dependencies.get(node, []):
+                if visit(dep) > finish[node]:
+                    finish[node] = finish[dep]
+                    previous[node] = dep
+            finish[node] += durations[node]
+        return finish[node]
+    if len(durations) == 0:
+        return (0.0, [])
+    last = max(durations.keys(), key=visit)
+    path = []
+    node = last
+    while node is not None:
+        path.append(node)
+        node = previous[node]
+    path.reverse()
+    return (finish[last], path)
+
+# number of intervals running over time.  intervals is a list of
+# (start, end).  returns a list of (start, end, count) segments
+# covering the first start to the last end
+def concurrencyProfile(intervals):
+    events = []
+    for start, end in intervals:
+        events.append((start, 1))
+        events.append((end, -1))
+    events.sort()
+    profile = []
+    count = 0
+    for i, (time, change) in enumerate(events):
+        count += change
+        if i + 1 < len(events) and events[i + 1][0] > time:
+            profile.append((time, events[i + 1][0], count))
+    return profile
+
+# (start, finish) of each subproblem of a progressive project and
+# the subproblems each one waits on.  runStart is when the run began
+def subproblemTimeline(projPath, runStart):
+    project = MultiCactusProject()
+    project.readXML(projPath)
+    finish = dict()
+    dependencies = dict()
+    for name, expPath in project.expMap.items():
+        exp = ExperimentWrapper(ET.parse(expPath).getroot())
+        finish[name] = os.path.getmtime(exp.getReferencePath())
+        dependencies[name] = [i for i in exp.seqMap.keys() if i in project.expMap]
+    intervals = dict()
+    for name in finish.keys():
+        start = max([runStart] + [finish[i] for i in dependencies[name]])
+        intervals[name] = (start, max(start, finish[name]))
+    return intervals, dependencies, project.mcTree.getRootName()
+
+# write criticalPath.xml for the alignment in outputDir, run with
+# maxThreads threads
+def analyzeRun(outputDir, maxThreads):
+    jtRoot = ET.parse(os.path.join(outputDir, "jobTreeStats.xml")).getroot()
+    runTime = float(jtRoot.attrib["total_run_time"])
+    parallelism = float(jtRoot.attrib["total_clock"]) / max(runTime, 1.0)
+    elem = ET.Element("criticalPath")
+    elem.attrib["max_threads"] = str(maxThreads)
+    elem.attrib["parallelism"] = str(parallelism)
+    elem.attrib["efficiency"] = str(parallelism / maxThreads)
+
+    projPath = os.path.join(outputDir, "progressiveCactusAlignment",
+                            "progressiveCactusAlignment_project.xml")
+    if os.path.isfile(projPath):
+        runStart = os.path.getmtime(os.path.join(outputDir, "config.xml"))
+        intervals, dependencies, rootName = subproblemTimeline(projPath, runStart)
+        durations = dict([(i, j[1] - j[0]) for i, j in intervals.items()])
+        length, path = longestPath(durations, dependencies)
+        runEnd = intervals[rootName][1]
+        rootMaf = os.path.join(outputDir, "progressiveCactusAlignment", rootName,
+                               "%s.maf" % rootName)
+        if os.path.isfile(rootMaf):
+            runEnd = max(runEnd, os.path.getmtime(rootMaf))
+        elem.attrib["path"] = " ".join(path)
+        elem.attrib["path_time"] = str(length)
+        elem.attrib["tail_time"] = str(runEnd - intervals[rootName][1])
+        elem.attrib["wall_time"] = str(runEnd - runStart)
+        for name in sorted(intervals.keys()):
+            subElem = ET.SubElement(elem, "subproblem")
+            subElem.attrib["name"] = name
+            subElem.attrib["start"] = str(intervals[name][0] - runStart)
+            subElem.attrib["finish"] = str(intervals[name][1] - runStart)
+            subElem.attrib["critical"] = str(name in path)
+        profileElem = ET.SubElement(elem, "profile")
+        for start, end, count in concurrencyProfile(intervals.values()):
+            segElem = ET.SubElement(profileElem, "running")
+            segElem.attrib["start"] = str(start - runStart)
+            segElem.attrib["end"] = str(end - runStart)
+            segElem.attrib["subproblems"] = str(count)
+    ET.ElementTree(elem).write(os.path.join(outputDir, "criticalPath.xml"))
+
+def main():
+    usage = "usage: %prog <alignment output dir>"
+    description = "Write the critical path analysis of an alignment"
+    parser = OptionParser(usage=usage, description=description)
+    parser.add_option("--maxThreads", dest="maxThreads", type="int", default=None,
+                      help="threads the run was given [default=cpu in resources.xml]")
+
+    options, args = parser.parse_args()
+
+    if len(args) != 1:
+        parser.print_help()
+        raise RuntimeError("Wrong number of arguments")
+
+    maxThreads = options.maxThreads
+    if maxThreads is None:
+        record = ET.parse(os.path.join(args[0], "resources.xml")).getroot()
+        maxThreads = int(record.attrib["cpu"])
+    analyzeRun(args[0], maxThreads)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+
+#Copyright (C) 2011 by Glenn Hickey
+#
+#Released under the MIT license, see LICENSE.txt
+"""
+"""
+
+import unittest
+
+from progressiveBenchmarks.src.criticalPath import longestPath
+from progressiveBenchmarks.src.criticalPath import concurrencyProfile
+
+class TestCase(unittest.TestCase):
+    
+    def testLongestPath(self):
+        # Anc0 waits on Anc1 and Anc2, Anc1 waits on Anc3
+        durations = {"Anc0" : 5.0, "Anc1" : 2.0, "Anc2" : 10.0, "Anc3" : 4.0}
+        dependencies = {"Anc0" : ["Anc1", "Anc2"], "Anc1" : ["Anc3"]}
+        length, path = longestPath(durations, dependencies)
+        assert path == ["Anc2", "Anc0"]
+        assert length == 15.0
+        durations["Anc3"] = 9.0
+        length, path = longestPath(durations, dependencies)
+        assert path == ["Anc3", "Anc1", "Anc0"]
+        assert length == 16.0
+        assert longestPath(dict(), dict()) == (0.0, [])
+    
+    def testConcurrencyProfile(self):
+        profile = concurrencyProfile([(0.0, 10.0), (2.0, 4.0), (4.0, 12.0)])
+        assert profile == [(0.0, 2.0, 1), (2.0, 4.0, 2), (4.0, 10.0, 2),
+                           (10.0, 12.0, 1)]
+        assert concurrencyProfile([]) == []
+        
+def main():
+    unittest.main()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+
+#Copyright (C) 2011 by Glenn Hickey
+#
+#Released under the MIT license, see LICENSE.txt
+
+""" run tools and move files without going through a shell.  File
+operations are done in-process (rename where possible, so results
+appear atomically), and tools are run from argv lists, with their
+resource usage collected by wait4, an optional timeout, retries for
+flaky failures and a way to run independent tools concurrently.
+
+"""
+
+import os
+import time
+import errno
+import signal
+import shutil
+import threading
+import subprocess
+
+from sonLib.bioio import logger
+
+# like rm -rf
+def removePath(path):
+    if os.path.islink(path) or os.path.isfile(path):
+        os.remove(path)
+    elif os.path.isdir(path):
+        shutil.rmtree(path)
+
+# like mv: into dst if it is a directory.  a rename, and so atomic,
+# unless dst is on another file system
+def movePath(src, dst):
+    if os.path.isdir(dst):
+        dst = os.path.join(dst, os.path.basename(src))
+    try:
+        os.rename(src, dst)
+    except OSError, e:
+        if e.errno != errno.EXDEV:
+            raise
+        shutil.move(src, dst)
+
+# like cp, but dst only appears once it is complete
+def copyFile(src, dst):
+    if os.path.isdir(dst):
+        dst = os.path.join(dst, os.path.basename(src))
+    tempPath = "%s.%d.tmp" % (dst, os.getpid())
+    shutil.copyfile(src, tempPath)
+    os.rename(tempPath, dst)
+
+# like ln -s: into link if it is a directory
+def symlink(target, link):
+    if os.path.isdir(link):
+        link = os.path.join(link, os.path.basename(target))
+    os.symlink(target, link)
+
+class CommandResult:
+    def __init__(self, argv, returnCode, timedOut, wallTime, rusage, attempts):
+        self.argv = argv
+        self.returnCode = returnCode
+        self.timedOut = timedOut
+        self.wallTime = wallTime
+        self.userTime = rusage.ru_utime
+        self.systemTime = rusage.ru_stime
+        # kilobytes on linux
+        self.maxRss = rusage.ru_maxrss
+        self.attempts = attempts
+
+class Runner:
+    PollInterval = 0.1
+
+    # timeout is in seconds (None for no limit).  failed or timed out
+    # commands are tried again retries times, retryDelay seconds apart
+    def __init__(self, timeout=None, retries=0, retryDelay=5.0):
+        self.timeout = timeout
+        self.retries = retries
+        self.retryDelay = retryDelay
+        self.history = []
+        self.lock = threading.Lock()
+
+    # the tool is started in its own session so that on a timeout its
+    # whole process group is killed, including any tools it started
+    def __runOnce(self, argv, stdout):
+        start = time.time()
+        process = subprocess.Popen(argv, stdout=stdout, preexec_fn=os.setsid)
+        timedOut = False
+        while True:
+            if self.timeout is None:
+                pid, status, rusage = os.wait4(process.pid, 0)
+            else:
+                pid, status, rusage = os.wait4(process.pid, os.WNOHANG)
+            if pid != 0:
+                break
+            if time.time() - start > self.timeout:
+                os.killpg(process.pid, signal.SIGKILL)
+                pid, status, rusage = os.wait4(process.pid, 0)
+                timedOut = True
+                break
+            time.sleep(self.PollInterval)
+        if os.WIFEXITED(status):
+            returnCode = os.WEXITSTATUS(status)
+        else:
+            returnCode = -os.WTERMSIG(status)
+        # already reaped by wait4
+        process.returncode = returnCode
+        return returnCode, timedOut, time.time() - start, rusage
+
+    # run argv, with its standard output written to outputPath if given.
+    # raises RuntimeError if it still fails after the retries
+    def run(self, argv, outputPath=None):
+        argv = [str(i) for i in argv]
+        for attempt in xrange(self.retries + 1):
+            if attempt > 0:
+                logger.info("Retrying %s" % " ".join(argv))
+                time.sleep(self.retryDelay)
+            stdout = None
+            if outputPath is not None:
+                stdout = open(outputPath, "w")
+            try:
+                returnCode, timedOut, wallTime, rusage = self.__runOnce(argv, stdout)
+            finally:
+                if stdout is not None:
+                    stdout.close()
+            result = CommandResult(argv, returnCode, timedOut, wallTime, rusage,
+                                   attempt + 1)
+            self.lock.acquire()
+            self.history.append(result)
+            self.lock.release()
+            if returnCode == 0 and not timedOut:
+                return result
+        if timedOut:
+            raise RuntimeError("Command %s timed out after %s seconds" %
+                               (" ".join(argv), self.timeout))
+        raise RuntimeError("Command %s exited with %d" % (" ".join(argv), returnCode))
+
+    # run independent commands, at most maxProcesses at a time.  returns
+    # their results in order, or raises the first error once they have
+    # all finished
+    def runConcurrently(self, argvs, maxProcesses=None):
+        if maxProcesses is None:
+            maxProcesses = len(argvs)
+        results = [None] * len(argvs)
+        errors = []
+        pending = range(len(argvs))
+        pending.reverse()
+        def worker():
+            while True:
+                self.lock.acquire()
+                if len(pending) == 0:
+                    self.lock.release()
+                    return
+                i = pending.pop()
+                self.lock.release()
+                try:
+                    results[i] = self.run(argvs[i])
+                except Exception, e:
+                    errors.append(e)
+        threads = [threading.Thread(target=worker) for i in
+                   xrange(max(1, min(maxProcesses, len(argvs))))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if len(errors) > 0:
+            raise errors[0]
+        return results
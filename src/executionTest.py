@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+
+#Copyright (C) 2011 by Glenn Hickey
+#
+#Released under the MIT license, see LICENSE.txt
+"""
+"""
+
+import unittest
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+from progressiveBenchmarks.src.execution import Runner
+from progressiveBenchmarks.src.execution import removePath
+from progressiveBenchmarks.src.execution import movePath
+from progressiveBenchmarks.src.execution import copyFile
+from progressiveBenchmarks.src.execution import symlink
+from progressiveBenchmarks.src.instrumentation import PhaseTimer
+
+class TestCase(unittest.TestCase):
+    
+    def setUp(self):
+        unittest.TestCase.setUp(self)
+        self.tempDir = tempfile.mkdtemp()
+    
+    def tearDown(self):
+        unittest.TestCase.tearDown(self)
+        shutil.rmtree(self.tempDir)
+    
+    def python(self, code):
+        return [sys.executable, "-c", code]
+    
+    # is pid running (zombies waiting to be reaped don't count)?
+    def isRunning(self, pid):
+        try:
+            status = open("/proc/%d/status" % pid).read()
+        except IOError:
+            return False
+        return "\nState:\tZ" not in status
+    
+    def testRun(self):
+        runner = Runner()
+        outputPath = os.path.join(self.tempDir, "out.txt")
+        result = runner.run(self.python("print 'a b' ; sum(xrange(10**6))"), outputPath)
+        assert open(outputPath).read() == "a b\n"
+        assert result.returnCode == 0
+        assert result.userTime + result.systemTime > 0
+        assert result.maxRss > 0
+        assert runner.history == [result]
+        self.assertRaises(RuntimeError, runner.run, self.python("import sys; sys.exit(3)"))
+        assert runner.history[-1].returnCode == 3
+    
+    def testTimeoutAndRetries(self):
+        runner = Runner(timeout=0.2, retries=1, retryDelay=0)
+        start = time.time()
+        self.assertRaises(RuntimeError, runner.run, self.python("import time; time.sleep(10)"))
+        assert time.time() - start < 5
+        assert [i.timedOut for i in runner.history] == [True, True]
+        assert runner.history[-1].attempts == 2
+        
+        # the tools started by a timed out tool are killed with it
+        pidPath = os.path.join(self.tempDir, "pid")
+        code = "import subprocess, time\n" \
+               "child = subprocess.Popen(['sleep', '30'])\n" \
+               "open('%s', 'w').write(str(child.pid))\n" \
+               "time.sleep(30)" % pidPath
+        self.assertRaises(RuntimeError, Runner(timeout=1.0).run, self.python(code))
+        time.sleep(0.2)
+        assert not self.isRunning(int(open(pidPath).read()))
+        
+        # fails the first time only
+        flagPath = os.path.join(self.tempDir, "flag")
+        code = "import os, sys\nif not os.path.exists('%s'):\n" \
+               "    open('%s', 'w').close()\n    sys.exit(1)" % (flagPath, flagPath)
+        result = Runner(retries=2, retryDelay=0).run(self.python(code))
+        assert result.attempts == 2
+    
+    def testPhaseCommands(self):
+        timer = PhaseTimer()
+        with timer.phase("stats") as phase:
+            phase.addCommand(Runner().run(self.python("sum(xrange(10**6))")))
+        command = timer.phases[0]["commands"][0]
+        assert command["argv"][-1] == "sum(xrange(10**6))"
+        assert command["cpu"] > 0
+        assert command["peak_rss_kb"] > 0
+        assert command["attempts"] == 1
+    
+    def testRunConcurrently(self):
+        runner = Runner()
+        start = time.time()
+        results = runner.runConcurrently([self.python("import time; time.sleep(1)")] * 3)
+        assert time.time() - start < 2.5
+        assert [i.returnCode for i in results] == [0, 0, 0]
+        self.assertRaises(RuntimeError, runner.runConcurrently, 
+                          [self.python("pass"), self.python("import sys; sys.exit(1)")], 1)
+    
+    def testFileOperations(self):
+        dirPath = os.path.join(self.tempDir, "dir")
+        os.mkdir(dirPath)
+        filePath = os.path.join(self.tempDir, "file")
+        open(filePath, "w").write("x")
+        copyFile(filePath, dirPath)
+        assert open(os.path.join(dirPath, "file")).read() == "x"
+        movePath(filePath, os.path.join(self.tempDir, "moved"))
+        assert not os.path.exists(filePath)
+        symlink(os.path.join(self.tempDir, "moved"), dirPath)
+        assert os.path.islink(os.path.join(dirPath, "moved"))
+        movePath(dirPath, os.path.join(self.tempDir, "dir2"))
+        removePath(os.path.join(self.tempDir, "dir2"))
+        removePath(os.path.join(self.tempDir, "moved"))
+        removePath(os.path.join(self.tempDir, "missing"))
+        assert os.listdir(self.tempDir) == []
+        
+def main():
+    unittest.main()
+
+if __name__ == '__main__':
+    main()
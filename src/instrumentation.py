@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+
+#Copyright (C) 2011 by Glenn Hickey
+#
+#Released under the MIT license, see LICENSE.txt
+
+""" time the phases of a run outside of cactus (config rendering,
+project creation, stats, moving results around).  Each phase records
+its wall time, the cpu time of this process and of the child processes
+it waited on (the rusage wait4 reports), and the peak resident set size
+of those children, along with the usage of each tool recorded with
+addCommand.  The phases are written as json next to
+jobTreeStats.xml for the Summary, along with the conditions they ran
+under (eg where the database was placed).
+
+"""
+
+import time
+import json
+import resource
+
+class Phase:
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+        self.commands = []
+
+    # record the resource usage of a tool run in this phase (an 
+    # execution.CommandResult)
+    def addCommand(self, result):
+        self.commands.append({"argv" : result.argv, "wall" : result.wallTime,
+                              "cpu" : result.userTime + result.systemTime,
+                              "peak_rss_kb" : result.maxRss,
+                              "attempts" : result.attempts})
+
+    def __enter__(self):
+        self.start = time.time()
+        self.selfUsage = resource.getrusage(resource.RUSAGE_SELF)
+        self.childUsage = resource.getrusage(resource.RUSAGE_CHILDREN)
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        selfUsage = resource.getrusage(resource.RUSAGE_SELF)
+        childUsage = resource.getrusage(resource.RUSAGE_CHILDREN)
+        record = dict()
+        record["name"] = self.name
+        record["wall"] = time.time() - self.start
+        record["cpu"] = (selfUsage.ru_utime - self.selfUsage.ru_utime) + \
+                        (selfUsage.ru_stime - self.selfUsage.ru_stime)
+        record["child_cpu"] = (childUsage.ru_utime - self.childUsage.ru_utime) + \
+                              (childUsage.ru_stime - self.childUsage.ru_stime)
+        # the kernel only keeps the largest child so far, so the peak of
+        # this phase is only known if it set a new maximum
+        if childUsage.ru_maxrss > self.childUsage.ru_maxrss:
+            record["peak_rss_kb"] = childUsage.ru_maxrss
+        else:
+            record["peak_rss_kb"] = None
+        record["failed"] = excType is not None
+        record["commands"] = self.commands
+        self.timer.phases.append(record)
+        return False
+
+class PhaseTimer:
+    def __init__(self):
+        self.phases = []
+        # map of name to description of the conditions of the run
+        self.context = dict()
+
+    # context that records one phase, eg
+    # with timer.phase("treeStats"):
+    def phase(self, name):
+        return Phase(self, name)
+
+    def write(self, path):
+        outFile = open(path, "w")
+        json.dump({"phases" : self.phases, "context" : self.context}, outFile,
+                  indent=2)
+        outFile.close()
+
+# list of phase records written by PhaseTimer.write
+def readPhases(path):
+    inFile = open(path)
+    phases = json.load(inFile)["phases"]
+    inFile.close()
+    return phases
+
+# context written by PhaseTimer.write
+def readContext(path):
+    inFile = open(path)
+    context = json.load(inFile).get("context", dict())
+    inFile.close()
+    return context
@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+
+#Copyright (C) 2011 by Glenn Hickey
+#
+#Released under the MIT license, see LICENSE.txt
+
+""" kyoto tycoon servers for concurrent runs.  Each run is given its
+own free port, reserved with a file in a node-local directory so two
+runs starting on the same node at once can't be given the same one.
+The target that reserves a port releases it, since the reservation
+directory is only shared by the targets on the same node.  The
+reservations of processes that died without releasing them are
+removed the next time a port is reserved.
+A KtServerPool starts the server of a database the first time it is
+needed, keeps it warm for the other steps that use the same database,
+and kills everything it started when it is closed, even if a step
+failed.
+
+"""
+
+import os
+import time
+import errno
+import socket
+import tempfile
+import xml.etree.ElementTree as ET
+
+DefaultReservationDir = os.path.join(tempfile.gettempdir(), "ktServerPorts")
+
+# a port nothing is listening on, as picked by the kernel
+def findFreePort(host="localhost"):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]
+    finally:
+        sock.close()
+
+# owner of the reservations made by this process for the run writing
+# to outputDir
+def getPortOwner(outputDir):
+    return "%s %d" % (os.path.abspath(outputDir), os.getpid())
+
+# is the process that made a reservation for owner (see getPortOwner)
+# still running?  the reservation directory is node-local, so the pid
+# is one of this node's
+def isOwnerAlive(owner):
+    try:
+        pid = int(owner.split()[-1])
+    except (ValueError, IndexError):
+        return True
+    try:
+        os.kill(pid, 0)
+    except OSError, e:
+        return e.errno != errno.ESRCH
+    return True
+
+# remove the reservations of processes that died without releasing
+# them (eg killed by the out of memory killer)
+def reapReservations(reservationDir=DefaultReservationDir):
+    for name in os.listdir(reservationDir):
+        path = os.path.join(reservationDir, name)
+        try:
+            reservation = open(path)
+        except IOError, e:
+            if e.errno != errno.ENOENT:
+                raise
+            continue
+        owner = reservation.read()
+        reservation.close()
+        # a reservation without its newline is still being written
+        if owner.endswith("\n") and not isOwnerAlive(owner):
+            try:
+                os.remove(path)
+            except OSError, e:
+                if e.errno != errno.ENOENT:
+                    raise
+
+# a free port no other run has reserved.  the reservation records owner
+# (see getPortOwner) and lasts until releasePort, or until the process
+# that made it has died and another reservation is made
+def reservePort(owner, reservationDir=DefaultReservationDir, host="localhost"):
+    if not os.path.isdir(reservationDir):
+        try:
+            os.makedirs(reservationDir)
+        except OSError, e:
+            if e.errno != errno.EEXIST:
+                raise
+    reapReservations(reservationDir)
+    while True:
+        port = findFreePort(host)
+        try:
+            fd = os.open(os.path.join(reservationDir, str(port)),
+                         os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except OSError, e:
+            if e.errno != errno.EEXIST:
+                raise
+            continue
+        os.write(fd, "%s\n" % owner)
+        os.close(fd)
+        return port
+
+# remove the reservation of port, if owner made it
+def releasePort(port, owner, reservationDir=DefaultReservationDir):
+    path = os.path.join(reservationDir, str(port))
+    try:
+        reservation = open(path)
+    except IOError, e:
+        if e.errno != errno.ENOENT:
+            raise
+        return
+    reservedBy = reservation.read()
+    reservation.close()
+    if reservedBy == "%s\n" % owner:
+        os.remove(path)
+
+# (host, port) of the kyoto tycoon database of an experiment xml, or
+# None if it uses another database
+def getKtAddress(expPath):
+    confElem = ET.parse(expPath).getroot().find(".//st_kv_database_conf")
+    if confElem is None or confElem.attrib.get("type") != "kyoto_tycoon":
+        return None
+    ktElem = confElem.find("kyoto_tycoon")
+    return (ktElem.attrib["host"], int(ktElem.attrib["port"]))
+
+# write a copy of the experiment xml expPath to outPath with its kyoto
+# tycoon database served on port
+def writeWithPort(expPath, port, outPath):
+    tree = ET.parse(expPath)
+    for ktElem in tree.getroot().findall(".//st_kv_database_conf/kyoto_tycoon"):
+        ktElem.attrib["port"] = str(port)
+    tree.write(outPath)
+
+# is something accepting connections at address?
+def isListening(address):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        sock.connect(address)
+        return True
+    except socket.error:
+        return False
+    finally:
+        sock.close()
+
+class KtServerPool:
+    PollInterval = 0.1
+
+    # launcher starts and stops the server of an experiment (spawnServer
+    # and killServer), by default with cactus's KtserverLauncher.
+    # startTimeout is how long to wait for a server to accept connections
+    def __init__(self, launcher=None, startTimeout=60.0):
+        if launcher is None:
+            from cactus.progressive.ktserverLauncher import KtserverLauncher
+            launcher = KtserverLauncher()
+        self.launcher = launcher
+        self.startTimeout = startTimeout
+        # map of address to the experiment its server was started for
+        self.servers = dict()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+        return False
+
+    # start the server of an experiment, unless it is already running.
+    # a no-op if address is None (the experiment doesn't use kyoto tycoon)
+    def start(self, exp, address):
+        if address is None or address in self.servers:
+            return
+        self.launcher.spawnServer(exp)
+        self.servers[address] = exp
+        begin = time.time()
+        while not isListening(address):
+            if time.time() - begin > self.startTimeout:
+                self.__kill(address)
+                raise RuntimeError("Kyoto tycoon server at %s:%d did not start "
+                                   "within %s seconds" % (address[0], address[1],
+                                                          self.startTimeout))
+            time.sleep(self.PollInterval)
+
+    def __kill(self, address):
+        self.launcher.killServer(self.servers.pop(address))
+
+    # kill every server, raising the first error once all have been tried
+    def close(self):
+        errors = []
+        for address in self.servers.keys():
+            try:
+                self.__kill(address)
+            except Exception, e:
+                errors.append(e)
+        if len(errors) > 0:
+            raise errors[0]
@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+
+#Copyright (C) 2011 by Glenn Hickey
+#
+#Released under the MIT license, see LICENSE.txt
+"""
+"""
+
+import unittest
+import os
+import socket
+import shutil
+import tempfile
+import subprocess
+
+from progressiveBenchmarks.src.ktServerPool import KtServerPool
+from progressiveBenchmarks.src.ktServerPool import reservePort
+from progressiveBenchmarks.src.ktServerPool import releasePort
+from progressiveBenchmarks.src.ktServerPool import getKtAddress
+from progressiveBenchmarks.src.ktServerPool import isListening
+from progressiveBenchmarks.src.ktServerPool import writeWithPort
+from progressiveBenchmarks.src.ktServerPool import getPortOwner
+
+# stands in for KtserverLauncher with a socket listening on the port
+# of the experiment
+class StandInLauncher:
+    def __init__(self, listen=True):
+        self.listen = listen
+        self.sockets = dict()
+        self.spawned = 0
+        self.killed = 0
+
+    def spawnServer(self, exp):
+        self.spawned += 1
+        if self.listen:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            sock.bind(exp)
+            sock.listen(5)
+            self.sockets[exp] = sock
+
+    def killServer(self, exp):
+        self.killed += 1
+        if exp in self.sockets:
+            self.sockets.pop(exp).close()
+
+class TestCase(unittest.TestCase):
+
+    def setUp(self):
+        unittest.TestCase.setUp(self)
+        self.tempDir = tempfile.mkdtemp()
+        self.reservationDir = os.path.join(self.tempDir, "ports")
+
+    def tearDown(self):
+        unittest.TestCase.tearDown(self)
+        shutil.rmtree(self.tempDir)
+
+    def testReservePort(self):
+        ports = [reservePort("run%d" % i, self.reservationDir) for i in xrange(10)]
+        assert len(set(ports)) == 10
+        assert open(os.path.join(self.reservationDir, str(ports[3]))).read() == "run3\n"
+        # only the owner can release a reservation
+        releasePort(ports[3], "run4", self.reservationDir)
+        assert os.path.exists(os.path.join(self.reservationDir, str(ports[3])))
+        releasePort(ports[3], "run3", self.reservationDir)
+        assert not os.path.exists(os.path.join(self.reservationDir, str(ports[3])))
+        # releasing twice is harmless
+        releasePort(ports[3], "run3", self.reservationDir)
+
+    def testReapReservations(self):
+        # a process that died without releasing its port
+        process = subprocess.Popen(["true"])
+        process.wait()
+        deadOwner = "%s %d" % (os.path.join(self.tempDir, "dead"), process.pid)
+        deadPort = reservePort(deadOwner, self.reservationDir)
+        liveOwner = getPortOwner(os.path.join(self.tempDir, "live"))
+        livePort = reservePort(liveOwner, self.reservationDir)
+        assert not os.path.exists(os.path.join(self.reservationDir, str(deadPort)))
+        assert os.path.exists(os.path.join(self.reservationDir, str(livePort)))
+        # one being written is left alone
+        open(os.path.join(self.reservationDir, "1"), "w").write("%s" % deadOwner)
+        reservePort(liveOwner, self.reservationDir)
+        assert os.path.exists(os.path.join(self.reservationDir, "1"))
+
+    def testKtAddress(self):
+        expPath = os.path.join(self.tempDir, "experiment.xml")
+        open(expPath, "w").write("<cactus_workflow_experiment><cactus_disk>"
+                                 "<st_kv_database_conf type=\"kyoto_tycoon\">"
+                                 "<kyoto_tycoon host=\"localhost\" port=\"4242\" "
+                                 "database_dir=\"dummy\"/></st_kv_database_conf>"
+                                 "</cactus_disk></cactus_workflow_experiment>")
+        assert getKtAddress(expPath) == ("localhost", 4242)
+        copyPath = os.path.join(self.tempDir, "copy.xml")
+        writeWithPort(expPath, 4343, copyPath)
+        assert getKtAddress(copyPath) == ("localhost", 4343)
+        open(expPath, "w").write("<cactus_workflow_experiment><cactus_disk>"
+                                 "<st_kv_database_conf type=\"tokyo_cabinet\">"
+                                 "<tokyo_cabinet database_dir=\"db\"/></st_kv_database_conf>"
+                                 "</cactus_disk></cactus_workflow_experiment>")
+        assert getKtAddress(expPath) is None
+
+    def testWarmServer(self):
+        address = ("localhost", reservePort("run", self.reservationDir))
+        launcher = StandInLauncher()
+        with KtServerPool(launcher) as pool:
+            # the experiment is the address for the stand in
+            pool.start(address, address)
+            assert isListening(address)
+            pool.start(address, address)
+            pool.start(None, None)
+            assert launcher.spawned == 1
+        assert launcher.killed == 1
+        assert not isListening(address)
+
+    def testCleanupOnFailure(self):
+        address = ("localhost", reservePort("run", self.reservationDir))
+        launcher = StandInLauncher()
+        try:
+            with KtServerPool(launcher) as pool:
+                pool.start(address, address)
+                raise RuntimeError("step failed")
+        except RuntimeError:
+            pass
+        assert launcher.killed == 1
+        assert not isListening(address)
+
+        # a server that never comes up is killed too
+        launcher = StandInLauncher(listen=False)
+        pool = KtServerPool(launcher, startTimeout=0.3)
+        self.assertRaises(RuntimeError, pool.start, address, address)
+        assert launcher.killed == 1
+        assert len(pool.servers) == 0
+
+def main():
+    unittest.main()
+
+if __name__ == '__main__':
+    main()
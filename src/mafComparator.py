@@ -0,0 +1,320 @@
+#!/usr/bin/env python
+
+#Copyright (C) 2011 by Glenn Hickey
+#
+#Released under the MIT license, see LICENSE.txt
+
+""" multi-core replacement for the mafComparator binary.  Each maf
+is parsed once into flat arrays of its alignment columns (the sequence
+and position of every aligned residue, grouped by column).  Homology
+pairs are sampled from the columns of one maf with vectorized numpy
+operations and looked up in the other, with the batches of samples
+spread over a process pool, optionally stopping once the confidence
+intervals of the per sequence aggregates are narrow enough.  The
+output is the same homologyTests xml that mafComparator writes, so
+Summary reads it unchanged.
+
+"""
+
+import os
+import math
+import xml.etree.ElementTree as ET
+from optparse import OptionParser
+from multiprocessing import Pool
+
+import numpy as np
+
+Gap = ord("-")
+# residue keys are seqId << PosBits | position
+PosBits = 40
+
+class MafColumns:
+    """The aligned columns of a maf.  Only columns with at least two
+    residues (ie that contain a homology pair) are kept.
+    """
+    def __init__(self, seqIndex):
+        # map of sequence name to id, shared between the mafs compared
+        self.seqIndex = seqIndex
+        self.resSeq = None
+        self.resPos = None
+        self.colSizes = None
+
+    def __seqId(self, name):
+        if name not in self.seqIndex:
+            self.seqIndex[name] = len(self.seqIndex)
+        return self.seqIndex[name]
+
+    def read(self, path):
+        seqs, poss, sizes = [], [], []
+        rows = []
+        mafFile = open(path, "r")
+        for line in mafFile:
+            if line.startswith("s"):
+                tokens = line.split()
+                rows.append((self.__seqId(tokens[1]), int(tokens[2]), tokens[4],
+                             int(tokens[5]), tokens[6]))
+            elif line.startswith("a"):
+                self.__addBlock(rows, seqs, poss, sizes)
+                rows = []
+        mafFile.close()
+        self.__addBlock(rows, seqs, poss, sizes)
+        self.resSeq = np.concatenate(seqs + [np.zeros(0, dtype=np.int64)])
+        self.resPos = np.concatenate(poss + [np.zeros(0, dtype=np.int64)])
+        self.colSizes = np.concatenate(sizes + [np.zeros(0, dtype=np.int64)])
+
+    def __addBlock(self, rows, seqs, poss, sizes):
+        if len(rows) < 2:
+            return
+        text = np.array([np.frombuffer(row[4], dtype=np.uint8) for row in rows])
+        residues = text != Gap
+        pos = np.cumsum(residues, axis=1) - 1
+        pos += np.array([row[1] for row in rows], dtype=np.int64).reshape(-1, 1)
+        # positions are kept in forward strand coordinates
+        for i, row in enumerate(rows):
+            if row[2] == "-":
+                pos[i] = row[3] - 1 - pos[i]
+        seqIds = np.repeat(np.array([row[0] for row in rows], dtype=np.int64).reshape(-1, 1),
+                           text.shape[1], axis=1)
+        colSizes = residues.sum(axis=0)
+        keep = colSizes >= 2
+        mask = residues[:, keep].T.ravel()
+        seqs.append(seqIds[:, keep].T.ravel()[mask])
+        poss.append(pos[:, keep].T.ravel()[mask].astype(np.int64))
+        sizes.append(colSizes[keep].astype(np.int64))
+
+    # drop the residues of sequences not in the array seqIds, and any columns
+    # left with fewer than two residues
+    def restrict(self, seqIds):
+        colIds = np.repeat(np.arange(len(self.colSizes)), self.colSizes)
+        mask = np.in1d(self.resSeq, seqIds)
+        colSizes = np.bincount(colIds[mask], minlength=len(self.colSizes))
+        mask &= (colSizes >= 2)[colIds]
+        self.resSeq = self.resSeq[mask]
+        self.resPos = self.resPos[mask]
+        self.colSizes = colSizes[colSizes >= 2]
+
+    def numPairs(self):
+        return (self.colSizes * (self.colSizes - 1) // 2).sum()
+
+    # sample n homology pairs uniformly.  returns the residue indices
+    # of the two sides of each pair
+    def samplePairs(self, n, randomState):
+        pairCounts = self.colSizes * (self.colSizes - 1) // 2
+        pairEnds = np.cumsum(pairCounts)
+        colStarts = np.cumsum(self.colSizes) - self.colSizes
+        t = randomState.randint(0, pairEnds[-1], size=n).astype(np.int64)
+        col = np.searchsorted(pairEnds, t, side="right")
+        t -= pairEnds[col] - pairCounts[col]
+        # decode t into the t'th pair (i, j), i < j, of a column of size k
+        k = self.colSizes[col]
+        b = 2 * k - 1
+        i = ((b - np.sqrt(b * b - 8 * t)) / 2).astype(np.int64)
+        before = lambda i: i * k - i * (i + 1) // 2
+        i -= before(i) > t
+        i += before(i + 1) <= t
+        j = t - before(i) + i + 1
+        return colStarts[col] + i, colStarts[col] + j
+
+    # sorted residue keys and their column ids, for lookups
+    def index(self):
+        keys = (self.resSeq << PosBits) | self.resPos
+        colIds = np.repeat(np.arange(len(self.colSizes)), self.colSizes)
+        order = np.argsort(keys, kind="mergesort")
+        return keys[order], colIds[order]
+
+    # the column of each residue key, or -1 if it isn't aligned
+    @staticmethod
+    def lookup(index, keys):
+        sortedKeys, sortedCols = index
+        if len(sortedKeys) == 0:
+            return np.zeros(len(keys), dtype=np.int64) - 1
+        idx = np.minimum(np.searchsorted(sortedKeys, keys), len(sortedKeys) - 1)
+        return np.where(sortedKeys[idx] == keys, sortedCols[idx], -1)
+
+# 95% wilson score interval of k successes in n trials
+def wilsonInterval(k, n, z=1.96):
+    n = float(n)
+    p = k / n
+    center = (p + z * z / (2 * n)) / (1 + z * z / n)
+    half = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / (1 + z * z / n)
+    return (max(0.0, center - half), min(1.0, center + half))
+
+# state shared with the pool workers (inherited when they fork)
+_comparison = None
+
+def _testBatch(args):
+    return _comparison.testBatch(*args)
+
+class MafComparison:
+    def __init__(self, mafFile1, mafFile2):
+        self.mafFiles = [mafFile1, mafFile2]
+        self.seqIndex = dict()
+        self.columns = []
+        for mafFile in self.mafFiles:
+            columns = MafColumns(self.seqIndex)
+            columns.read(mafFile)
+            self.columns.append(columns)
+        # as mafComparator, only sequences present in both mafs are tested
+        seqIds = np.intersect1d(np.unique(self.columns[0].resSeq),
+                                np.unique(self.columns[1].resSeq))
+        for columns in self.columns:
+            columns.restrict(seqIds)
+        self.indexes = [columns.index() for columns in self.columns]
+        self.numSeqs = len(self.seqIndex)
+
+    # test n pairs sampled from maf a against maf 1 - a.  returns
+    # matrices of (tests, trues) by the sequence ids of the pair
+    def testBatch(self, a, n, seed):
+        columns = self.columns[a]
+        tests = np.zeros(self.numSeqs * self.numSeqs, dtype=np.int64)
+        trues = np.zeros(self.numSeqs * self.numSeqs, dtype=np.int64)
+        if n > 0 and columns.numPairs() > 0:
+            i, j = columns.samplePairs(n, np.random.RandomState(seed))
+            seqI, seqJ = columns.resSeq[i], columns.resSeq[j]
+            colI = MafColumns.lookup(self.indexes[1 - a], (seqI << PosBits) | columns.resPos[i])
+            colJ = MafColumns.lookup(self.indexes[1 - a], (seqJ << PosBits) | columns.resPos[j])
+            found = (colI >= 0) & (colI == colJ)
+            pairIdx = np.minimum(seqI, seqJ) * self.numSeqs + np.maximum(seqI, seqJ)
+            size = self.numSeqs * self.numSeqs
+            tests += np.bincount(pairIdx, minlength=size)
+            trues += np.bincount(pairIdx[found], minlength=size)
+        return tests.reshape(self.numSeqs, -1), trues.reshape(self.numSeqs, -1)
+
+    # per sequence aggregates over every pair the sequence is part of
+    @staticmethod
+    def sequenceTotals(matrix):
+        return matrix.sum(axis=0) + matrix.sum(axis=1) - np.diag(matrix)
+
+    # widest confidence interval of the per sequence aggregates of
+    # either direction
+    def maxInterval(self):
+        width = 0.0
+        for tests, trues in self.results:
+            for n, k in zip(self.sequenceTotals(tests), self.sequenceTotals(trues)):
+                if n > 0:
+                    low, high = wilsonInterval(k, n)
+                    width = max(width, high - low)
+        return width
+
+    # sample up to sampleNumber pairs in each direction, in parallel
+    # when numProcesses > 1.  if ciWidth is given, sampling stops early
+    # once every per sequence confidence interval is narrower than it
+    def sample(self, sampleNumber, numProcesses=1, batchSize=100000, seed=0,
+               ciWidth=None):
+        global _comparison
+        zeros = np.zeros((self.numSeqs, self.numSeqs), dtype=np.int64)
+        self.results = [(zeros.copy(), zeros.copy()), (zeros.copy(), zeros.copy())]
+        self.numSampled = 0
+        pool = None
+        if numProcesses > 1:
+            _comparison = self
+            pool = Pool(numProcesses)
+        try:
+            while self.numSampled < sampleNumber:
+                jobs = []
+                roundSize = min(sampleNumber - self.numSampled, 
+                                max(1, numProcesses) * batchSize)
+                for a in [0, 1]:
+                    remaining = roundSize
+                    while remaining > 0:
+                        jobs.append((a, min(batchSize, remaining), seed))
+                        remaining -= batchSize
+                        seed += 1
+                if pool is not None:
+                    results = pool.map(_testBatch, jobs)
+                else:
+                    results = [self.testBatch(*job) for job in jobs]
+                for job, result in zip(jobs, results):
+                    self.results[job[0]][0][:] += result[0]
+                    self.results[job[0]][1][:] += result[1]
+                self.numSampled += roundSize
+                if ciWidth is not None and self.maxInterval() <= ciWidth:
+                    break
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+                _comparison = None
+
+    def __aggregateElem(self, parent, tests, trues):
+        aggElem = ET.SubElement(ET.SubElement(parent, "aggregateResults"), "all")
+        aggElem.attrib["totalTests"] = str(int(tests))
+        aggElem.attrib["totalTrue"] = str(int(trues))
+        aggElem.attrib["totalFalse"] = str(int(tests - trues))
+        if tests > 0:
+            aggElem.attrib["average"] = str(float(trues) / tests)
+            low, high = wilsonInterval(trues, tests)
+            aggElem.attrib["ciLow"] = str(low)
+            aggElem.attrib["ciHigh"] = str(high)
+        else:
+            aggElem.attrib["average"] = "0.0"
+        return aggElem
+
+    def write(self, outputFile):
+        names = sorted(self.seqIndex.items(), key=lambda x: x[1])
+        names = [x[0] for x in names]
+        root = ET.Element("alignmentComparisons")
+        root.attrib["sampleNumber"] = str(self.numSampled)
+        for a in [0, 1]:
+            tests, trues = self.results[a]
+            htElem = ET.SubElement(root, "homologyTests")
+            htElem.attrib["fileA"] = self.mafFiles[a]
+            htElem.attrib["fileB"] = self.mafFiles[1 - a]
+            self.__aggregateElem(htElem, tests.sum(), trues.sum())
+            pairsElem = ET.SubElement(htElem, "homologyPairTests")
+            for s in xrange(self.numSeqs):
+                for t in xrange(s, self.numSeqs):
+                    if tests[s, t] > 0:
+                        testElem = ET.SubElement(pairsElem, "homologyTest")
+                        testElem.attrib["sequenceA"] = names[s]
+                        testElem.attrib["sequenceB"] = names[t]
+                        self.__aggregateElem(testElem, tests[s, t], trues[s, t])
+            seqTestsList = self.sequenceTotals(tests)
+            seqTruesList = self.sequenceTotals(trues)
+            for s in xrange(self.numSeqs):
+                seqTests, seqTrues = seqTestsList[s], seqTruesList[s]
+                if seqTests > 0:
+                    testElem = ET.SubElement(pairsElem, "homologyTest")
+                    testElem.attrib["sequenceA"] = names[s]
+                    testElem.attrib["sequenceB"] = "aggregate"
+                    self.__aggregateElem(testElem, seqTests, seqTrues)
+        ET.ElementTree(root).write(outputFile)
+
+def compareMafs(mafFile1, mafFile2, outputFile, sampleNumber=1000000,
+                numProcesses=1, seed=0, ciWidth=None):
+    comparison = MafComparison(mafFile1, mafFile2)
+    comparison.sample(sampleNumber, numProcesses=numProcesses, seed=seed,
+                      ciWidth=ciWidth)
+    comparison.write(outputFile)
+
+def main():
+    usage = "usage: %prog --mafFile1 <maf> --mafFile2 <maf> --outputFile <xml>"
+    description = "Compare the homology pairs of two mafs"
+    parser = OptionParser(usage=usage, description=description)
+    parser.add_option("--mafFile1", dest="mafFile1", help="first maf (eg the truth)")
+    parser.add_option("--mafFile2", dest="mafFile2", help="second maf")
+    parser.add_option("--outputFile", dest="outputFile", help="output xml")
+    parser.add_option("--sampleNumber", dest="sampleNumber", type="int",
+                      default=1000000, help="pairs sampled from each maf [default=%default]")
+    parser.add_option("--numProcesses", dest="numProcesses", type="int",
+                      default=1, help="processes to sample with [default=%default]")
+    parser.add_option("--seed", dest="seed", type="int", default=0,
+                      help="random seed [default=%default]")
+    parser.add_option("--ciWidth", dest="ciWidth", type="float", default=None,
+                      help="stop sampling once the 95% confidence interval of "
+                      "every sequence's aggregate is narrower than this. "
+                      "sampleNumber is then the most pairs sampled")
+
+    options, args = parser.parse_args()
+
+    if len(args) != 0 or options.mafFile1 is None or options.mafFile2 is None \
+       or options.outputFile is None:
+        parser.print_help()
+        raise RuntimeError("Wrong arguments")
+
+    compareMafs(options.mafFile1, options.mafFile2, options.outputFile,
+                options.sampleNumber, options.numProcesses, options.seed,
+                options.ciWidth)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+
+#Copyright (C) 2011 by Glenn Hickey
+#
+#Released under the MIT license, see LICENSE.txt
+"""
+"""
+
+import unittest
+import os
+import shutil
+import tempfile
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+from progressiveBenchmarks.src.mafComparator import MafColumns
+from progressiveBenchmarks.src.mafComparator import MafComparison
+from progressiveBenchmarks.src.mafComparator import compareMafs
+
+trueMaf = """##maf version=1
+
+a score=0
+s human.chr1 0 5 + 100 AC-GTA
+s mouse.chr1 10 6 + 50 ACTGTA
+s dog.chr1 0 3 - 20 A--G-A
+
+a score=0
+s human.chr1 10 4 + 100 ACGT
+s mouse.chr1 20 4 + 50 ACGT
+"""
+
+predictedMaf = """##maf version=1
+
+a score=0
+s human.chr1 0 5 + 100 AC-GTA
+s mouse.chr1 10 6 + 50 ACTGTA
+
+a score=0
+s human.chr1 10 2 + 100 AC
+s mouse.chr1 20 2 + 50 AC
+s rat.chr1 0 2 + 50 AC
+"""
+
+class TestCase(unittest.TestCase):
+    
+    def setUp(self):
+        unittest.TestCase.setUp(self)
+        self.tempDir = tempfile.mkdtemp()
+        self.trueMaf = os.path.join(self.tempDir, "true.maf")
+        self.predictedMaf = os.path.join(self.tempDir, "predicted.maf")
+        open(self.trueMaf, "w").write(trueMaf)
+        open(self.predictedMaf, "w").write(predictedMaf)
+    
+    def tearDown(self):
+        unittest.TestCase.tearDown(self)
+        shutil.rmtree(self.tempDir)
+    
+    def testColumns(self):
+        columns = MafColumns(dict())
+        columns.read(self.trueMaf)
+        assert list(columns.colSizes) == [3, 2, 3, 2, 3, 2, 2, 2, 2]
+        # dog is on the reverse strand
+        dog = columns.seqIndex["dog.chr1"]
+        assert sorted(columns.resPos[columns.resSeq == dog]) == [17, 18, 19]
+        
+    def testSampleCoversAllPairs(self):
+        columns = MafColumns(dict())
+        columns.read(self.trueMaf)
+        i, j = columns.samplePairs(10000, np.random.RandomState(0))
+        pairs = set(zip(i, j))
+        assert len(pairs) == columns.numPairs()
+        for a, b in pairs:
+            assert a < b
+    
+    def testComparison(self):
+        outputFile = os.path.join(self.tempDir, "comparison.xml")
+        compareMafs(self.trueMaf, self.predictedMaf, outputFile, 
+                    sampleNumber=20000, numProcesses=2)
+        homologyTests = ET.parse(outputFile).getroot().findall("homologyTests")
+        assert len(homologyTests) == 2
+        averages = [float(ht.find("aggregateResults").find("all").attrib["average"])
+                    for ht in homologyTests]
+        # 7 of the 9 true human-mouse pairs are predicted (dog and rat
+        # aren't in both mafs so aren't tested)
+        assert abs(averages[0] - 7.0 / 9.0) < 0.02
+        assert averages[1] == 1.0
+        names = [t.attrib["sequenceA"] for t in 
+                 homologyTests[0].find("homologyPairTests").findall("homologyTest")
+                 if t.attrib["sequenceB"] == "aggregate"]
+        assert sorted(names) == ["human.chr1", "mouse.chr1"]
+    
+    def testEarlyStopping(self):
+        comparison = MafComparison(self.trueMaf, self.predictedMaf)
+        comparison.sample(1000000, batchSize=1000, ciWidth=0.1)
+        assert comparison.numSampled < 1000000
+        assert comparison.maxInterval() <= 0.1
+        comparison.sample(5000, batchSize=1000)
+        assert comparison.numSampled == 5000
+            
+def main():
+    unittest.main()
+    
+if __name__ == '__main__':
+    main()
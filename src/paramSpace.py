@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+
+#Copyright (C) 2011 by Glenn Hickey
+#
+#Released under the MIT license, see LICENSE.txt
+
+""" declarative space of Params.  Each parameter is given a list
+of values and the space is the cartesian product, except that the
+progressive-only parameters are left unset for vanilla runs.
+Combinations can be pruned with constraints, and combinations that
+render the same config xml (and so would produce the same alignment)
+are only generated once.
+
+"""
+
+import os
+import copy
+import itertools
+import xml.etree.ElementTree as ET
+
+from progressiveBenchmarks.src.params import Params
+
+def getDefaultConfigPath():
+    srcDir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(os.path.dirname(srcDir), "lib", "cactus_workflow_config.xml")
+
+class ParamSpace:
+    # Params attributes that only apply to progressive runs (see Params.check)
+    ProgressiveOnly = ["outgroupStrategy", "singleCopyStrategy", "requiredFraction",
+                       "selfAlignment", "subtreeSize", "kyotoTycoon"]
+
+    def __init__(self, configPath=None):
+        if configPath is None:
+            configPath = getDefaultConfigPath()
+        self.config = ET.parse(configPath).getroot()
+        self.parameters = []
+        self.constraints = []
+
+    # values are tried in the order given.  parameters are varied in
+    # the order they were added, last one fastest
+    def addParameter(self, name, values):
+        assert hasattr(Params(), name)
+        self.parameters.append((name, list(values)))
+
+    # constraint is a function of a Params returning False for
+    # combinations that shouldn't be run
+    def addConstraint(self, constraint):
+        self.constraints.append(constraint)
+
+    # everything that determines the alignment: the rendered config
+    # along with the options that aren't expressed in it
+    def canonicalKey(self, params):
+        xmlTree = ET.ElementTree(copy.deepcopy(self.config))
+        params.applyToXml(xmlTree)
+        return (ET.tostring(xmlTree.getroot()), params.vanilla, params.kyotoTycoon)
+
+    def __product(self, parameters):
+        names = [i[0] for i in parameters]
+        for values in itertools.product(*[i[1] for i in parameters]):
+            yield zip(names, values)
+
+    # seen is the set of canonical keys already generated.  pass the
+    # same set to several spaces to deduplicate across them
+    def generate(self, seen=None):
+        if seen is None:
+            seen = set()
+        general = [i for i in self.parameters if i[0] not in self.ProgressiveOnly]
+        progressive = [i for i in self.parameters if i[0] in self.ProgressiveOnly]
+        for generalValues in self.__product(general):
+            if dict(generalValues).get("vanilla", False) == True:
+                progressiveValuesList = [[]]
+            else:
+                progressiveValuesList = self.__product(progressive)
+            for progressiveValues in progressiveValuesList:
+                params = Params()
+                for name, value in generalValues + progressiveValues:
+                    setattr(params, name, value)
+                if False in [constraint(params) for constraint in self.constraints]:
+                    continue
+                key = self.canonicalKey(params)
+                if key not in seen:
+                    seen.add(key)
+                    yield params
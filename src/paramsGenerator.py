@@ -13,6 +13,7 @@ import xml.etree.ElementTree as ET
 import sys
 
 from progressiveBenchmarks.src.params import Params
+from progressiveBenchmarks.src.paramSpace import ParamSpace
 
 def getRootPathString():
     """
@@ -38,44 +39,31 @@ class ParamsGenerator:
         self.kyotoTycoon = [None]
         self.templatePath = [None]
         self.numThreads = [None]
+        self.constraints = []
+    
+    # the space of the lists above, varied in this order
+    def getSpace(self):
+        space = ParamSpace()
+        space.addParameter("templatePath", self.templatePath)
+        space.addParameter("annealingRounds", self.annealingRounds)
+        space.addParameter("minBlockDegree", self.minBlockDegree)
+        space.addParameter("repeatMask", self.repeatMask)
+        space.addParameter("numThreads", self.numThreads)
+        space.addParameter("vanilla", self.vanilla)
+        space.addParameter("outgroupStrategy", self.outgroupStrategy)
+        space.addParameter("singleCopyStrategy", self.singleCopyStrategy)
+        space.addParameter("requiredFraction", self.requiredFraction)
+        space.addParameter("selfAlignment", self.selfAlignment)
+        space.addParameter("subtreeSize", self.subtreeSize)
+        space.addParameter("kyotoTycoon", self.kyotoTycoon)
+        for constraint in self.constraints:
+            space.addConstraint(constraint)
+        return space
         
-    def generate(self):
-        for tp in self.templatePath:   
-            for ar in self.annealingRounds:
-                for mb in self.minBlockDegree:
-                    for rm in self.repeatMask:
-                        for nt in self.numThreads:
-                            for va in self.vanilla:
-                                if va == True:
-                                    params = Params()
-                                    params.templatePath = tp
-                                    params.annealingRounds = ar
-                                    params.minBlockDegree = mb
-                                    params.repeatMask = rm
-                                    params.numThreads = nt
-                                    params.vanilla = va
-                                    yield params
-                                else:     
-                                    for og in self.outgroupStrategy:
-                                        for sc in self.singleCopyStrategy:
-                                            for cf in self.requiredFraction:
-                                                for sa in self.selfAlignment:
-                                                    for st in self.subtreeSize:
-                                                        for kt in self.kyotoTycoon:
-                                                            params = Params()
-                                                            params.templatePath = tp
-                                                            params.annealingRounds = ar
-                                                            params.minBlockDegree = mb
-                                                            params.repeatMask = rm
-                                                            params.outgroupStrategy = og
-                                                            params.singleCopyStrategy = sc
-                                                            params.subtreeSize = st
-                                                            params.requiredFraction = cf
-                                                            params.selfAlignment = sa
-                                                            params.vanilla = va
-                                                            params.kyotoTycoon = kt
-                                                            params.numThreads = nt
-                                                            yield params
+    # combinations that render the same config are only generated once
+    def generate(self, seen=None):
+        for params in self.getSpace().generate(seen):
+            yield params
                                 
 class EverythingButSelf():
     class EverythingButSelf_MB2(ParamsGenerator):
@@ -95,9 +83,10 @@ class EverythingButSelf():
             self.requiredFraction = [0]
    
     def generate(self):
-        for p in self.EverythingButSelf_MB2().generate():
+        seen = set()
+        for p in self.EverythingButSelf_MB2().generate(seen):
             yield p
-        for p in self.EverythingButSelf_MB0().generate():
+        for p in self.EverythingButSelf_MB0().generate(seen):
             yield p
         
 # all the progressive-related combinations                                
@@ -161,9 +150,9 @@ class DefaultProgTest(ParamsGenerator):
         self.vanilla = [False]
         
 class NumThreadsTest(SingleCase):
-    def __init__(self):
+    def __init__(self, numThreads=[1, 2, 3, 4]):
         SingleCase.__init__(self)
-        self.numThreads = [1, 2, 3, 4]
+        self.numThreads = list(numThreads)
         self.outgroupStrategy = ['greedy', 'none']
                              
     
\ No newline at end of file
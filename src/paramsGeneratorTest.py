@@ -18,6 +18,7 @@ from sonLib.bioio import system
 
 from progressiveBenchmarks.src.paramsGenerator import AllProgressive
 from progressiveBenchmarks.src.paramsGenerator import EverythingButSelf
+from progressiveBenchmarks.src.paramsGenerator import ParamsGenerator
 
 class TestCase(unittest.TestCase):
     
@@ -59,6 +60,33 @@ class TestCase(unittest.TestCase):
     def testParamsAsRow(self):
         for params in EverythingButSelf().generate():
             assert len(params.asRow()) == len(params.Header)
+    
+    def testIdenticalConfigsCollapsed(self):
+        pg = ParamsGenerator()
+        pg.vanilla = [False]
+        # same as the defaults in the config
+        pg.outgroupStrategy = [None, 'none']
+        pg.requiredFraction = [None, 0]
+        assert len(list(pg.generate())) == 1
+        pg.outgroupStrategy = ['none', 'greedy']
+        assert len(list(pg.generate())) == 2
+    
+    def testVanillaIgnoresProgressiveParams(self):
+        pg = ParamsGenerator()
+        pg.outgroupStrategy = ['none', 'greedy']
+        pg.selfAlignment = [True, False]
+        vanilla = [p for p in pg.generate() if p.vanilla == True]
+        assert len(vanilla) == 1
+        assert vanilla[0].outgroupStrategy is None
+        
+    def testConstraints(self):
+        pg = ParamsGenerator()
+        pg.vanilla = [False]
+        pg.outgroupStrategy = ['none', 'greedy', 'greedyLeaves']
+        pg.constraints = [lambda p: p.outgroupStrategy != 'greedyLeaves']
+        names = [str(p) for p in pg.generate()]
+        assert len(names) == 2
+        assert '_ogGreedyleaves' not in names
             
 def main():
     unittest.main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+
+#Copyright (C) 2011 by Glenn Hickey
+#
+#Released under the MIT license, see LICENSE.txt
+
+""" adaptive search over the parameter sets of a ParamsGenerator.
+Rather than running the whole cartesian product on every dataset,
+successive halving runs all candidates on the cheapest dataset, reads
+back their accuracy and run time from the Summary, and only promotes
+the best 1/eta of them to the next (larger) dataset.
+
+"""
+
+import math
+
+class SuccessiveHalving:
+    def __init__(self, candidates, numRungs, eta=3, timeWeight=0.01):
+        assert eta > 1
+        self.candidates = list(candidates)
+        self.numRungs = numRungs
+        self.eta = eta
+        # accuracy given up for each 10x in run time
+        self.timeWeight = timeWeight
+        # list of (rung, name, score, promoted) for the report
+        self.history = []
+
+    # score a summary row (a dictionary keyed on Summary.Header).
+    # rows without accuracy results score None and are never promoted
+    def score(self, row):
+        try:
+            accuracy = float(row["Bal. Accuracy"])
+            runTime = float(row["Run_Time"])
+        except (KeyError, ValueError):
+            return None
+        return accuracy - self.timeWeight * math.log10(max(runTime, 1.0))
+
+    # number of candidates that survive a rung with n candidates
+    def numPromoted(self, n):
+        return max(1, int(math.ceil(float(n) / self.eta)))
+
+    # rows maps str(params) to the summary row of each candidate on
+    # rung.  keeps the best candidates and returns them
+    def select(self, rung, rows):
+        scored = []
+        for params in self.candidates:
+            score = None
+            if str(params) in rows:
+                score = self.score(rows[str(params)])
+            scored.append((score, params))
+        finished = [x for x in scored if x[0] is not None]
+        finished.sort(key=lambda x: x[0], reverse=True)
+        promoted = [x[1] for x in finished[:self.numPromoted(len(scored))]]
+        for score, params in scored:
+            self.history.append((rung, str(params), score, params in promoted))
+        self.candidates = promoted
+        return promoted
+
+    def isFinished(self, rung):
+        return rung + 1 >= self.numRungs or len(self.candidates) <= 1
+
+    def write(self, path):
+        outFile = open(path, "w")
+        outFile.write("Rung,Params,Score,Promoted\n")
+        for rung, name, score, promoted in self.history:
+            if score is None:
+                score = ""
+            outFile.write("%d,%s,%s,%s\n" % (rung, name, score, promoted))
+        outFile.close()
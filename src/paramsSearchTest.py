@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+
+#Copyright (C) 2011 by Glenn Hickey
+#
+#Released under the MIT license, see LICENSE.txt
+"""
+"""
+
+import unittest
+
+from progressiveBenchmarks.src.paramsGenerator import AllProgressive
+from progressiveBenchmarks.src.paramsSearch import SuccessiveHalving
+
+class TestCase(unittest.TestCase):
+    
+    def setUp(self):
+        unittest.TestCase.setUp(self)
+        self.candidates = list(AllProgressive().generate())
+    
+    def makeRows(self, candidates):
+        rows = dict()
+        for i, params in enumerate(candidates):
+            rows[str(params)] = {"Bal. Accuracy" : str(0.5 + i * 0.001),
+                                 "Run_Time" : "100.0"}
+        return rows
+    
+    def testPromotesBest(self):
+        search = SuccessiveHalving(self.candidates, 3, eta=3)
+        promoted = search.select(0, self.makeRows(self.candidates))
+        assert len(promoted) == search.numPromoted(len(self.candidates))
+        assert promoted[0] is self.candidates[-1]
+        assert self.candidates[0] not in promoted
+    
+    def testMissingRowsNotPromoted(self):
+        search = SuccessiveHalving(self.candidates, 3, eta=2)
+        rows = self.makeRows(self.candidates[:3])
+        promoted = search.select(0, rows)
+        assert len(promoted) == 3
+        assert len(search.history) == len(self.candidates)
+    
+    def testSlowerScoresLower(self):
+        search = SuccessiveHalving(self.candidates, 3)
+        fast = search.score({"Bal. Accuracy" : "0.9", "Run_Time" : "10"})
+        slow = search.score({"Bal. Accuracy" : "0.9", "Run_Time" : "1000"})
+        assert fast > slow
+        assert search.score({"Run_Time" : "10"}) is None
+    
+    def testFinishes(self):
+        search = SuccessiveHalving(self.candidates, 3, eta=3)
+        rung = 0
+        while True:
+            search.select(rung, self.makeRows(search.candidates))
+            if search.isFinished(rung):
+                break
+            rung += 1
+        assert rung == 2
+        assert len(search.candidates) < len(self.candidates)
+            
+def main():
+    unittest.main()
+    
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+
+#Copyright (C) 2011 by Glenn Hickey
+#
+#Released under the MIT license, see LICENSE.txt
+
+""" speed / accuracy trade off of the parameter sets of a sweep.  For
+each dataset the runs are placed on (time, balanced accuracy), the
+Pareto-optimal ones (no other run is both at least as fast and at
+least as accurate) are marked, every other run is given a frontier run
+that dominates it, and the accuracy gained per extra cpu hour is
+estimated between neighbouring frontier runs.
+
+"""
+
+import os
+from optparse import OptionParser
+
+# does a (time, accuracy) point dominate b?
+def dominates(a, b):
+    return a[0] <= b[0] and a[1] >= b[1] and (a[0] < b[0] or a[1] > b[1])
+
+# indices of the Pareto-optimal (time, accuracy) points, in order of
+# increasing time (and accuracy).  points that tie exactly don't 
+# dominate each other, so all of them are on the frontier
+def paretoFrontier(points):
+    order = sorted(range(len(points)), key=lambda i: (points[i][0], -points[i][1], i))
+    frontier = []
+    for i in order:
+        if len(frontier) == 0 or points[i][1] > points[frontier[-1]][1] or \
+           points[i] == points[frontier[-1]]:
+            frontier.append(i)
+    return frontier
+
+class ParetoReport:
+    # timeColumn is the summary column the frontier is computed on:
+    # Run_Time (wall clock) or Clock_Time (cpu)
+    def __init__(self, timeColumn="Run_Time"):
+        self.timeColumn = timeColumn
+        # list of (dataset, params, time, cpu hours, accuracy, frontier,
+        # dominated by, marginal accuracy per cpu hour)
+        self.table = []
+
+    # rows is a list of (params name, summary row as a dictionary keyed
+    # on Summary.Header).  rows without times or accuracy are skipped
+    def addDataset(self, dataset, rows):
+        names = []
+        points = []
+        cpuHours = []
+        for name, row in rows:
+            try:
+                time = float(row[self.timeColumn])
+                cpu = float(row["Clock_Time"]) / 3600.0
+                accuracy = float(row["Bal. Accuracy"])
+            except (KeyError, ValueError):
+                continue
+            names.append(name)
+            points.append((time, accuracy))
+            cpuHours.append(cpu)
+        frontier = paretoFrontier(points)
+        marginal = dict()
+        for prev, i in zip(frontier[:-1], frontier[1:]):
+            extraCpu = cpuHours[i] - cpuHours[prev]
+            if extraCpu > 0:
+                marginal[i] = (points[i][1] - points[prev][1]) / extraCpu
+        for i in xrange(len(points)):
+            dominatedBy = ""
+            if i not in frontier:
+                # the fastest frontier run that dominates it
+                for j in frontier:
+                    if dominates(points[j], points[i]):
+                        dominatedBy = names[j]
+                        break
+            self.table.append((dataset, names[i], points[i][0], cpuHours[i],
+                               points[i][1], i in frontier, dominatedBy,
+                               marginal.get(i, "")))
+
+    # the frontier of a dataset as a list of params names
+    def getFrontier(self, dataset):
+        return [i[1] for i in self.table if i[0] == dataset and i[5] is True]
+
+    def write(self, path):
+        outFile = open(path, "w")
+        outFile.write("Dataset,Params,%s,CPU_Hours,Bal. Accuracy,Frontier,"
+                      "Dominated_By,Marginal_Acc_per_CPU_Hour\n" % self.timeColumn)
+        for row in self.table:
+            outFile.write("%s\n" % ",".join([str(i) for i in row]))
+        outFile.close()
+
+def main():
+    usage = "usage: %prog <summary csv> [summary csv ...] <output csv>"
+    description = "Write the speed/accuracy Pareto frontier of summary csvs"
+    parser = OptionParser(usage=usage, description=description)
+    parser.add_option("--cpu", dest="cpu", action="store_true", default=False,
+                      help="compute the frontier on cpu time (Clock_Time) "
+                      "instead of wall time (Run_Time)")
+
+    options, args = parser.parse_args()
+
+    if len(args) < 2:
+        parser.print_help()
+        raise RuntimeError("Wrong number of arguments")
+
+    report = ParetoReport("Clock_Time" if options.cpu else "Run_Time")
+    for path in args[:-1]:
+        inFile = open(path)
+        header = inFile.readline().rstrip("\n").split(",")
+        # the params are the columns before the jobTree times
+        numParams = header.index("Run_Time")
+        rows = []
+        for line in inFile:
+            values = line.rstrip("\n").split(",")
+            rows.append((" ".join(values[:numParams]), dict(zip(header, values))))
+        inFile.close()
+        report.addDataset(os.path.basename(path).replace("_summary.csv", ""), rows)
+    report.write(args[-1])
+
+if __name__ == '__main__':
+    main()
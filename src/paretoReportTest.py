@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+
+#Copyright (C) 2011 by Glenn Hickey
+#
+#Released under the MIT license, see LICENSE.txt
+"""
+"""
+
+import unittest
+
+from progressiveBenchmarks.src.paretoReport import dominates
+from progressiveBenchmarks.src.paretoReport import paretoFrontier
+from progressiveBenchmarks.src.paretoReport import ParetoReport
+
+class TestCase(unittest.TestCase):
+    
+    def makeRow(self, runTime, clockTime, accuracy):
+        return {"Run_Time" : str(runTime), "Clock_Time" : str(clockTime),
+                "Bal. Accuracy" : str(accuracy)}
+    
+    def testFrontier(self):
+        points = [(10.0, 0.5), (20.0, 0.7), (15.0, 0.4), (30.0, 0.7), 
+                  (40.0, 0.9), (10.0, 0.3)]
+        assert paretoFrontier(points) == [0, 1, 4]
+        assert dominates(points[1], points[3])
+        assert not dominates(points[3], points[3])
+        assert not dominates(points[0], points[1])
+        
+        # exact ties are all on the frontier
+        points = [(20.0, 0.7), (10.0, 0.5), (20.0, 0.7), (20.0, 0.6), (10.0, 0.5)]
+        assert paretoFrontier(points) == [1, 4, 0, 2]
+        report = ParetoReport()
+        report.addDataset("Blanchette0", [("a", self.makeRow(100, 3600, 0.5)),
+                                          ("b", self.makeRow(100, 3600, 0.5)),
+                                          ("c", self.makeRow(100, 7200, 0.4))])
+        assert report.getFrontier("Blanchette0") == ["a", "b"]
+        assert [i[6] for i in report.table] == ["", "", "a"]
+    
+    def testReport(self):
+        report = ParetoReport()
+        rows = [("fast", self.makeRow(100, 3600, 0.5)),
+                ("slow", self.makeRow(400, 3 * 3600, 0.9)),
+                ("bad", self.makeRow(200, 7200, 0.4)),
+                ("failed", {"Run_Time" : "100", "Clock_Time" : "100"})]
+        report.addDataset("Blanchette0", rows)
+        assert report.getFrontier("Blanchette0") == ["fast", "slow"]
+        table = dict([(i[1], i) for i in report.table])
+        assert "failed" not in table
+        assert table["bad"][6] == "fast"
+        assert table["fast"][7] == ""
+        assert abs(table["slow"][7] - 0.2) < 1e-9
+        
+def main():
+    unittest.main()
+
+if __name__ == '__main__':
+    main()
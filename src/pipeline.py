@@ -8,6 +8,7 @@ import xml.etree.ElementTree as ET
 import xml
 import sys
 import re
+import copy
 from optparse import OptionParser
 
 from jobTree.scriptTree.target import Target 
@@ -39,7 +40,6 @@ from cactus.shared.test import getInputs
 from sonLib.bioio import TestStatus
 from cactus.progressive.experimentWrapper import ExperimentWrapper
 from cactus.progressive.cactus_createMultiCactusProject import cleanEventTree
-from cactus.progressive.ktserverLauncher import KtserverLauncher
 from progressiveBenchmarks.src.params import Params
 from progressiveBenchmarks.src.paramsGenerator import ParamsGenerator
 from progressiveBenchmarks.src.paramsGenerator import EverythingButSelf
@@ -49,8 +49,37 @@ from progressiveBenchmarks.src.paramsGenerator import SmallProgressive
 from progressiveBenchmarks.src.paramsGenerator import SingleCase
 from progressiveBenchmarks.src.paramsGenerator import KyotoTycoon
 from progressiveBenchmarks.src.paramsGenerator import LastzTuning
+from progressiveBenchmarks.src.paramsGenerator import NumThreadsTest
 from progressiveBenchmarks.src.applyNamingToMaf import applyNamingToMaf
 from progressiveBenchmarks.src.summary import Summary
+from progressiveBenchmarks.src.summary import writeColumnar
+from progressiveBenchmarks.src.resultsDb import ResultsDb
+from progressiveBenchmarks.src.paretoReport import ParetoReport
+from progressiveBenchmarks.src.criticalPath import analyzeRun
+from progressiveBenchmarks.src.scalingReport import ScalingReport
+from progressiveBenchmarks.src.instrumentation import PhaseTimer
+from progressiveBenchmarks.src.instrumentation import readPhases
+from progressiveBenchmarks.src.instrumentation import readContext
+from progressiveBenchmarks.src.execution import Runner
+from progressiveBenchmarks.src.execution import removePath
+from progressiveBenchmarks.src.execution import movePath
+from progressiveBenchmarks.src.execution import copyFile
+from progressiveBenchmarks.src.execution import symlink
+from progressiveBenchmarks.src.ktServerPool import KtServerPool
+from progressiveBenchmarks.src.ktServerPool import reservePort
+from progressiveBenchmarks.src.ktServerPool import releasePort
+from progressiveBenchmarks.src.ktServerPool import getKtAddress
+from progressiveBenchmarks.src.ktServerPool import getPortOwner
+from progressiveBenchmarks.src.ktServerPool import writeWithPort
+from progressiveBenchmarks.src.scratch import placeRun
+from progressiveBenchmarks.src.scratch import rewritePaths
+from progressiveBenchmarks.src.paramsSearch import SuccessiveHalving
+from progressiveBenchmarks.src.resourceEstimator import ResourceEstimator
+from progressiveBenchmarks.src.shards import Shard
+from progressiveBenchmarks.src.resultCache import ResultCache
+from progressiveBenchmarks.src.truthStore import TruthStore
+from progressiveBenchmarks.src.commandCache import wrapBlastStrings
+from progressiveBenchmarks.src.commandCache import wrapPreprocessorStrings
 
 def getRootPathString():
     """
@@ -63,6 +92,40 @@ def getRootPathString():
 def getCactusDiskString(alignmentFile):
     return "<st_kv_database_conf type=\"tokyo_cabinet\"><tokyo_cabinet database_dir=\"%s\"/></st_kv_database_conf>" % alignmentFile
 
+# compare two mafs with the mafComparator binary, or with the native
+# multi-core comparator (which needs numpy) if it was asked for
+def runMafComparator(options, mafFile1, mafFile2, outputFile):
+    if options.nativeComparator is True:
+        from progressiveBenchmarks.src.mafComparator import compareMafs
+        compareMafs(mafFile1, mafFile2, outputFile, 
+                    sampleNumber=options.comparatorSamples,
+                    numProcesses=options.comparatorProcesses,
+                    ciWidth=options.comparatorCIWidth)
+    else:
+        getRunner(options).run(["mafComparator", "--mafFile1", mafFile1, 
+                                "--mafFile2", mafFile2, "--outputFile", outputFile])
+
+# runs the external tools with the timeout and retries of the options
+def getRunner(options):
+    return Runner(timeout=options.toolTimeout, retries=options.toolRetries)
+
+def getNameMapCacheDir(options):
+    if options.cacheDir is not None:
+        return os.path.join(os.path.abspath(options.cacheDir), "nameMaps")
+    return None
+
+def getTruthStore(options):
+    if options.cacheDir is not None:
+        cache = ResultCache(options.cacheDir)
+        return TruthStore(os.path.join(cache.cacheDir, "truth"), cache.memoDir,
+                          getRunner(options))
+    return None
+
+def getComparatorCpu(options):
+    if options.nativeComparator is True:
+        return options.comparatorProcesses
+    return 1
+
 class MakeAlignment(Target):
     """Target runs the alignment.
     """
@@ -70,13 +133,22 @@ class MakeAlignment(Target):
                  sequences, 
                  newickTree,
                  outputDir,
-                 params):
+                 params,
+                 postTargets=None):
                  #requiredSpecies,
                  #singleCopySpecies,
                  #referenceAlgorithm, minimumBlockDegree, 
                  #blastAlignmentString, baseLevel, maxNumberOfChains, permutations,
                  #theta, useSimulatedAnnealing, heldOutSequence):
-        Target.__init__(self, cpu=4, memory=4000000000)
+        self.estimator = ResourceEstimator(maxCpu=options.maxAlignmentCpu)
+        if options.resourceModel is not None:
+            self.estimator.readModel(options.resourceModel)
+        self.maxThreads = self.estimator.estimateCpu(sequences, newickTree, params)
+        if options.threadLadder is not None:
+            #Scaling runs are given exactly the threads they test
+            self.maxThreads = int(params.numThreads)
+        self.memoryEstimate = self.estimator.estimateMemory(sequences, newickTree, params)
+        Target.__init__(self, cpu=self.maxThreads, memory=self.memoryEstimate)
         self.sequences = sequences
         self.newickTree = newickTree
         #self.requiredSpecies = requiredSpecies
@@ -93,180 +165,396 @@ class MakeAlignment(Target):
         self.options = options
         #self.heldOutSequence = heldOutSequence
         self.params = params
+        #Targets that only need the published alignment (eg its comparison
+        #to the truth), run alongside its stats
+        self.postTargets = postTargets
+        if self.postTargets is None:
+            self.postTargets = []
     
-    def runProgressive(self):
+    #Render the config for the params
+    def makeConfig(self):
+        xmlTree = ET.parse(os.path.join(getRootPathString(), "lib", "cactus_workflow_config.xml"))
+        self.params.applyToXml(xmlTree)
+        config = xmlTree.getroot()
+        assert config is not None
+        return config
+    
+    #Put the database (and, if asked, the jobTree) of the run in a 
+    #node-local scratch directory if there is one with enough space.
+    #returns (scratch directory or None, directory for the database, 
+    #directory for the jobTree), recording where they are for the summary
+    def placeRun(self, tempLocalDir):
+        scratchDir, dbDir, jobTreeDir, placement = placeRun(
+            self.params, self.outputDir, tempLocalDir, self.options.scratchDir,
+            self.options.scratchJobTree, self.options.scratchSpace * 2**30)
+        if self.options.scratchDir is not None and scratchDir is None and \
+           self.params.kyotoTycoon != True:
+            logger.warning("Less than %sG free in %s, so the database stays in %s" %
+                           (self.options.scratchSpace, self.options.scratchDir, 
+                            tempLocalDir))
+        self.timer.context.update(placement)
+        return scratchDir, dbDir, jobTreeDir
+    
+    # run the progressive alignment, unless the output directory already
+    # has it.  returns True if it was run
+    def runProgressive(self, config):
         logger.debug("Going to put the alignment in %s" % self.outputDir)
         if not os.path.isdir(self.outputDir):
             os.mkdir(self.outputDir)
 
         if not os.path.exists(os.path.join(self.outputDir, "progressiveCactusAlignment")):
-            xmlTree = ET.parse(os.path.join(getRootPathString(), "lib", "cactus_workflow_config.xml"))
-            
-            #Set the parameters
-            tempLocalDir = os.path.join(self.outputDir, "tempProgressiveCactusAlignment")
-            system("rm -rf %s" % tempLocalDir)
-            os.mkdir(tempLocalDir)
-            
-            #Set the config parameters
-            self.params.applyToXml(xmlTree)
-            config = xmlTree.getroot()
-            assert config is not None
-            
-            #Write the config file
-            tempConfigFile = os.path.join(tempLocalDir, "config.xml")
-            fileHandle = open(tempConfigFile, 'w')
-            assert fileHandle is not None
-            tree = ET.ElementTree(config)
-            tree.write(fileHandle)
-            fileHandle.close()
-         
-            #Make the experiment file
-            tempExperimentFile = os.path.join(tempLocalDir, "experiment.xml")
-            
-            if self.params.kyotoTycoon == True:
-                dbConfElem = ET.Element("st_kv_database_conf", type="kyoto_tycoon")
-                ktElem = ET.SubElement(dbConfElem, "kyoto_tycoon", host="localhost", port="1978", database_dir="dummy")
-            else:
-                dbConfElem = None
+            #Don't leave the databases on scratch (which may be memory) or 
+            #the kyoto tycoon port reserved if the run fails
+            scratchDir = None
+            port = None
+            portOwner = getPortOwner(self.outputDir)
+            try:
+                with self.timer.phase("writeConfig"):
+                    #Set the parameters
+                    tempLocalDir = os.path.join(self.outputDir, "tempProgressiveCactusAlignment")
+                    removePath(tempLocalDir)
+                    os.mkdir(tempLocalDir)
+                
+                    #Write the config file
+                    tempConfigFile = os.path.join(tempLocalDir, "config.xml")
+                    fileHandle = open(tempConfigFile, 'w')
+                    assert fileHandle is not None
+                    tree = ET.ElementTree(config)
+                    tree.write(fileHandle)
+                    fileHandle.close()
+             
+                    #Make the experiment file
+                    tempExperimentFile = os.path.join(tempLocalDir, "experiment.xml")
+                
+                    if self.params.kyotoTycoon == True:
+                        #A port of its own, so runs on the same node don't collide
+                        port = reservePort(portOwner)
+                        dbConfElem = ET.Element("st_kv_database_conf", type="kyoto_tycoon")
+                        ktElem = ET.SubElement(dbConfElem, "kyoto_tycoon", host="localhost", port=str(port), database_dir="dummy")
+                    else:
+                        dbConfElem = None
+                
+                    cactusWorkflowExperiment = CactusWorkflowExperiment(
+                                                         sequences=self.sequences, 
+                                                         newickTreeString=self.newickTree, 
+                                                         #requiredSpecies=self.requiredSpecies,
+                                                         #singleCopySpecies=self.singleCopySpecies,
+                                                         databaseName="cactusAlignment",
+                                                         outputDir=tempLocalDir,
+                                                         configFile=tempConfigFile,
+                                                         databaseConf = dbConfElem)
+                    cactusWorkflowExperiment.writeExperimentFile(tempExperimentFile)
             
-            cactusWorkflowExperiment = CactusWorkflowExperiment(
-                                                 sequences=self.sequences, 
-                                                 newickTreeString=self.newickTree, 
-                                                 #requiredSpecies=self.requiredSpecies,
-                                                 #singleCopySpecies=self.singleCopySpecies,
-                                                 databaseName="cactusAlignment",
-                                                 outputDir=tempLocalDir,
-                                                 configFile=tempConfigFile,
-                                                 databaseConf = dbConfElem)
-            cactusWorkflowExperiment.writeExperimentFile(tempExperimentFile)
+                scratchDir, dbDir, jobTreeDir = self.placeRun(tempLocalDir)
             
-            #The jobtree
-            tempJobTreeDir = os.path.join(tempLocalDir, "jobTree")
+                #The jobtree
+                tempJobTreeDir = os.path.join(jobTreeDir, "jobTree")
             
-            #The place to put the temporary experiment dir
-            tempExperimentDir = os.path.join(tempLocalDir, "progressiveCactusAlignment")
+                #The place to put the temporary experiment dir, which holds the databases
+                tempExperimentDir = os.path.join(dbDir, "progressiveCactusAlignment")
             
       
-            #The temporary experiment 
-            runCactusCreateMultiCactusProject(tempExperimentFile, 
-                                              tempExperimentDir)
-            logger.info("Setup the cactus progressive experiment")
+                #The temporary experiment 
+                with self.timer.phase("createMultiCactusProject"):
+                    runCactusCreateMultiCactusProject(tempExperimentFile, 
+                                                      tempExperimentDir)
+                logger.info("Setup the cactus progressive experiment")
             
-            runCactusProgressive(os.path.join(tempExperimentDir, "progressiveCactusAlignment_project.xml"), 
-                                 tempJobTreeDir, 
-                                 #batchSystem=batchSystem, 
-                                 buildMaf=True,
-                                 joinMaf=True,
-                                 #buildTrees=buildTrees, buildFaces=buildFaces, buildReference=buildReference,
-                                 jobTreeStats=True,
-                                 maxThreads=4,
-                                 logLevel="DEBUG")
-            logger.info("Ran the progressive workflow")
+                with self.timer.phase("cactusProgressive"):
+                    runCactusProgressive(os.path.join(tempExperimentDir, "progressiveCactusAlignment_project.xml"), 
+                                         tempJobTreeDir, 
+                                         #batchSystem=batchSystem, 
+                                         buildMaf=True,
+                                         joinMaf=True,
+                                         #buildTrees=buildTrees, buildFaces=buildFaces, buildReference=buildReference,
+                                         jobTreeStats=True,
+                                         maxThreads=self.maxThreads,
+                                         logLevel="DEBUG")
+                logger.info("Ran the progressive workflow")
             
-            #Check if the jobtree completed sucessively.
-            runJobTreeStatusAndFailIfNotComplete(tempJobTreeDir)
-            logger.info("Checked the job tree dir for the progressive run")
+                #Check if the jobtree completed sucessively.
+                with self.timer.phase("jobTreeStatus"):
+                    runJobTreeStatusAndFailIfNotComplete(tempJobTreeDir)
+                logger.info("Checked the job tree dir for the progressive run")
             
-            #Run the cactus tree stats
-            expPath = os.path.join(tempExperimentDir, "Anc0", "Anc0_experiment.xml")
-            exp = ExperimentWrapper(ET.parse(expPath).getroot())
-            if exp.getDbType() == "kyoto_tycoon":
-                ktserver = KtserverLauncher()
-                ktserver.spawnServer(exp) 
-            treeStatsFile = os.path.join(self.outputDir, "treeStats.xml")
-            system("cactus_treeStats --cactusDisk \'%s\' --flowerName 0 --outputFile %s" %(exp.getDiskDatabaseString(),
-                                                                                        treeStatsFile))
-            if exp.getDbType() == "kyoto_tycoon":
-                ktserver.killServer(exp)
-                
-            #Now copy the true assembly back to the output
-            system("mv %s %s/experiment.xml" % (tempExperimentFile, self.outputDir))
-            system("mv %s %s" % (tempExperimentDir, self.outputDir))
-            system("jobTreeStats --jobTree %s --outputFile %s/jobTreeStats.xml" % (tempJobTreeDir, self.outputDir))
-            system("mv %s %s/config.xml" % (tempConfigFile, self.outputDir))
+                #Now copy the true assembly back to the output, so the comparison
+                #can start on it straight away
+                localExperimentDir = os.path.join(tempLocalDir, "progressiveCactusAlignment")
+                localJobTreeDir = os.path.join(tempLocalDir, "jobTree")
+                with self.timer.phase("publish"):
+                    movePath(tempExperimentFile, os.path.join(self.outputDir, "experiment.xml"))
+                    movePath(tempConfigFile, os.path.join(self.outputDir, "config.xml"))
+                    if scratchDir is None:
+                        movePath(tempExperimentDir, self.outputDir)
+                if scratchDir is not None:
+                    with self.timer.phase("copyBack"):
+                        movePath(tempExperimentDir, self.outputDir)
+                        #The xml points at the original path of the project, below
+                        rewritePaths(os.path.join(self.outputDir, "progressiveCactusAlignment"),
+                                     tempExperimentDir, os.path.abspath(localExperimentDir))
+                        if tempJobTreeDir != localJobTreeDir:
+                            movePath(tempJobTreeDir, localJobTreeDir)
+                        removePath(scratchDir)
+            except:
+                if scratchDir is not None:
+                    removePath(scratchDir)
+                raise
+            finally:
+                if port is not None:
+                    releasePort(port, portOwner)
+            with self.timer.phase("publish"):
+                #But keep a link to the multicactus project in its original path so we can navigate
+                # the paths in the xml...
+                actualResultsDir = os.path.join(os.path.abspath(self.outputDir), "progressiveCactusAlignment")
+                tempResultsDir = os.path.join(self.outputDir, "tempProgressiveCactusAlignment")
+                symlink(actualResultsDir, tempResultsDir)
+            self.timer.write(os.path.join(self.outputDir, "phaseTimes.json"))
             
-            #But keep a link to the multicactus project in its original path so we can navigate
-            # the paths in the xml...
-            actualResultsDir = os.path.join(os.path.abspath(self.outputDir), "progressiveCactusAlignment")
-            tempResultsDir = os.path.join(self.outputDir, "tempProgressiveCactusAlignment")
-            system("ln -s %s %s" % (actualResultsDir, tempResultsDir))
+            #The tree stats and jobTree stats read different inputs, so run 
+            #them concurrently with each other and the comparison
+            expPath = os.path.join(localExperimentDir, "Anc0", "Anc0_experiment.xml")
+            self.addChildTarget(MakeTreeStats(self.options, expPath, self.outputDir))
+            self.addChildTarget(MakeJobTreeStats(self.options, localJobTreeDir, self.outputDir))
+            return True
+        return False
                 
-    def runVanilla(self):
+    # as runProgressive, for a vanilla alignment
+    def runVanilla(self, config):
         logger.debug("Going to put the alignment in %s" % self.outputDir)
         if not os.path.isdir(self.outputDir):
             os.mkdir(self.outputDir)
 
         if not os.path.exists(os.path.join(self.outputDir, "cactusAlignmentVanilla")):
-            xmlTree = ET.parse(os.path.join(getRootPathString(), "lib", "cactus_workflow_config.xml"))
+            #Don't leave the database on scratch (which may be memory) if the run fails
+            scratchDir = None
+            try:
+                with self.timer.phase("writeConfig"):
+                    #Set the parameters
+                    tempLocalDir = os.path.join(self.outputDir, "tempVanillaCactusAlignment")
+                    removePath(tempLocalDir)
+                    os.mkdir(tempLocalDir)
             
-            #Set the parameters
-            tempLocalDir = os.path.join(self.outputDir, "tempVanillaCactusAlignment")
-            system("rm -rf %s" % tempLocalDir)
-            os.mkdir(tempLocalDir)
+                    #Write the config file
+                    tempConfigFile = os.path.join(tempLocalDir, "config.xml")
+                    fileHandle = open(tempConfigFile, 'w')
+                    assert fileHandle is not None
+                    tree = ET.ElementTree(config)
+                    tree.write(fileHandle)
+                    fileHandle.close()
+             
+                    #Make the experiment file
+                    tempExperimentFile = os.path.join(tempLocalDir, "experiment.xml")
+                    #Now do standard cactus..
+                    #Make the experiment file
+                    tempExperimentFile2 = os.path.join(tempLocalDir, "experiment.xml")
+                
+                    scratchDir, dbDir, jobTreeDir = self.placeRun(tempLocalDir)
+
+                    cactusWorkflowExperiment = CactusWorkflowExperiment(
+                                                         sequences=self.sequences, 
+                                                         newickTreeString=self.newickTree, 
+                                                         #requiredSpecies=self.requiredSpecies,
+                                                         #singleCopySpecies=self.singleCopySpecies,
+                                                         databaseName="cactusAlignmentVanilla",
+                                                         outputDir=dbDir,
+                                                         configFile=tempConfigFile)
+                    tempExperimentDir2 = os.path.join(dbDir, "cactusAlignmentVanilla")
+                    cactusWorkflowExperiment.writeExperimentFile(tempExperimentFile2)
+               
+                    # apply naming to the event tree to be consistent with progressive
+                    exp = ExperimentWrapper(ET.parse(tempExperimentFile2).getroot())
+                    cleanEventTree(exp)
+                    exp.writeXML(tempExperimentFile2)
             
-            #Set the config parameters
-            self.params.applyToXml(xmlTree)
-            config = xmlTree.getroot()
-            assert config is not None
-        
-            #Write the config file
-            tempConfigFile = os.path.join(tempLocalDir, "config.xml")
-            fileHandle = open(tempConfigFile, 'w')
-            assert fileHandle is not None
-            tree = ET.ElementTree(config)
-            tree.write(fileHandle)
-            fileHandle.close()
-         
-            #Make the experiment file
-            tempExperimentFile = os.path.join(tempLocalDir, "experiment.xml")
-            #Now do standard cactus..
-            #Make the experiment file
-            tempExperimentFile2 = os.path.join(tempLocalDir, "experiment.xml")
-
-            cactusWorkflowExperiment = CactusWorkflowExperiment(
-                                                 sequences=self.sequences, 
-                                                 newickTreeString=self.newickTree, 
-                                                 #requiredSpecies=self.requiredSpecies,
-                                                 #singleCopySpecies=self.singleCopySpecies,
-                                                 databaseName="cactusAlignmentVanilla",
-                                                 outputDir=tempLocalDir,
-                                                 configFile=tempConfigFile)
-            tempExperimentDir2 = os.path.join(tempLocalDir, "cactusAlignmentVanilla")
-            cactusWorkflowExperiment.writeExperimentFile(tempExperimentFile2)
-           
-            # apply naming to the event tree to be consistent with progressive
-            exp = ExperimentWrapper(ET.parse(tempExperimentFile2).getroot())
-            cleanEventTree(exp)
-            exp.writeXML(tempExperimentFile2)
+                #We're done with the progressive, now run the vanilla cactus for comparison
+                tempJobTreeDir2 = os.path.join(jobTreeDir, "jobTreeVanilla")
+                with self.timer.phase("cactusWorkflow"):
+                    runCactusWorkflow(tempExperimentFile2, tempJobTreeDir2,
+                                      jobTreeStats=True,
+                                      setupAndBuildAlignments=True,
+                                      buildReference=True,
+                                      maxThreads=self.maxThreads)
             
-            #We're done with the progressive, now run the vanilla cactus for comparison
-            tempJobTreeDir2 = os.path.join(tempLocalDir, "jobTreeVanilla")
-            runCactusWorkflow(tempExperimentFile2, tempJobTreeDir2,
-                              jobTreeStats=True,
-                              setupAndBuildAlignments=True,
-                              buildReference=True,
-                              maxThreads=4)
+                with self.timer.phase("jobTreeStatus"):
+                    runJobTreeStatusAndFailIfNotComplete(tempJobTreeDir2)
+                logger.info("Checked the job tree dir for the vanilla run")
             
-            runJobTreeStatusAndFailIfNotComplete(tempJobTreeDir2)
-            logger.info("Checked the job tree dir for the vanilla run")
+                with self.timer.phase("mafGenerator"):
+                    runCactusMAFGenerator(os.path.join(self.outputDir, "cactusVanilla.maf"), getCactusDiskString(tempExperimentDir2))
             
-            runCactusMAFGenerator(os.path.join(self.outputDir, "cactusVanilla.maf"), getCactusDiskString(tempExperimentDir2))
+                localJobTreeDir = os.path.join(tempLocalDir, "jobTreeVanilla")
+                with self.timer.phase("publish"):
+                    movePath(tempExperimentFile2, os.path.join(self.outputDir, "experiment.xml"))
+                    if scratchDir is None:
+                        movePath(tempExperimentDir2, self.outputDir)
+                if scratchDir is not None:
+                    with self.timer.phase("copyBack"):
+                        movePath(tempExperimentDir2, self.outputDir)
+                        #The experiment points at the original path of the database, below
+                        rewritePaths(os.path.join(self.outputDir, "experiment.xml"), tempExperimentDir2,
+                                     os.path.abspath(os.path.join(tempLocalDir, "cactusAlignmentVanilla")))
+                        if tempJobTreeDir2 != localJobTreeDir:
+                            movePath(tempJobTreeDir2, localJobTreeDir)
+                        removePath(scratchDir)
+            except:
+                if scratchDir is not None:
+                    removePath(scratchDir)
+                raise
+            with self.timer.phase("publish"):
+                #Keep a link to the database in its original path, which is
+                #the one in the experiment
+                symlink(os.path.join(os.path.abspath(self.outputDir), "cactusAlignmentVanilla"), 
+                        tempLocalDir)
+            self.timer.write(os.path.join(self.outputDir, "phaseTimes.json"))
             
-            #Run the cactus tree stats
-            treeStatsFile = os.path.join(self.outputDir, "treeStats.xml")
-            system("cactus_treeStats --cactusDisk \'%s\' --flowerName 0 --outputFile %s" %(exp.getDiskDatabaseString(),
-                                                                                        treeStatsFile))
+            #The tree stats and jobTree stats read different inputs, so run 
+            #them concurrently with each other and the comparison
+            expPath = os.path.join(self.outputDir, "experiment.xml")
+            self.addChildTarget(MakeTreeStats(self.options, expPath, self.outputDir))
+            self.addChildTarget(MakeJobTreeStats(self.options, localJobTreeDir, self.outputDir))
+            return True
+        return False
+        
+    
+    def run(self):
+        #Times the phases of the run outside cactus
+        self.timer = PhaseTimer()
+        with self.timer.phase("renderConfig"):
+            config = self.makeConfig()
+        
+        #Work inside the content-addressed cache entry, leaving the 
+        #params-named output directory as a link to it
+        entryLock = None
+        if self.options.cacheDir is not None:
+            cache = ResultCache(self.options.cacheDir)
+            with self.timer.phase("resultCache"):
+                key = cache.getKey(config, self.newickTree, self.sequences, self.params)
+                self.outputDir = cache.link(key, self.outputDir)
+                #Wait for any other run of the same configuration, whose 
+                #result is then reused
+                entryLock = cache.lock(self.outputDir)
+            logger.info("Using result cache entry %s" % self.outputDir)
             
-            system("jobTreeStats --jobTree %s --outputFile %s/jobTreeStats.xml" % (tempJobTreeDir2, self.outputDir))
-            system("mv %s %s" % (tempExperimentDir2, self.outputDir))
-            system("mv %s %s/experiment.xml" % (tempExperimentFile2, self.outputDir))
+            #Share the preprocessed sequences and the lastz stage with every
+            #other run on the same sequences
+            wrapPreprocessorStrings(config, os.path.join(cache.cacheDir, "preprocessor"),
+                                    cache.memoDir)
+            wrapBlastStrings(config, os.path.join(cache.cacheDir, "blast"), cache.memoDir)
         
+        try:
+            if self.params.vanilla == True:
+                aligned = self.runVanilla(config)
+            else:
+                aligned = self.runProgressive(config)
+        finally:
+            if entryLock is not None:
+                entryLock.release()
+        
+        #The comparisons skip results that are already there, so they are
+        #safe to run against a cache entry shared with another run
+        for target in self.postTargets:
+            self.addChildTarget(target)
+        
+        #The stats and phase times of a cache hit belong to the run that
+        #made the entry, which may still be writing them
+        if entryLock is not None and not aligned:
+            logger.info("Reusing the cached alignment in %s" % self.outputDir)
+            return
+        
+        #Record the inputs and requests for calibrating the resource model
+        self.estimator.writeRecord(os.path.join(self.outputDir, "resources.xml"),
+                                   self.sequences, self.newickTree,
+                                   self.maxThreads, self.memoryEstimate)
+        self.setFollowOnTarget(FinishAlignment(self.outputDir, self.maxThreads))
+
+# where a post-alignment target writes the time of its phase, until
+# FinishAlignment merges it into phaseTimes.json
+def getPhaseTimesPath(outputDir, name):
+    return os.path.join(outputDir, "phaseTimes.%s.json" % name)
+
+class MakeTreeStats(Target):
+    """Runs cactus_treeStats on a finished alignment.
+    """
+    def __init__(self, options, expPath, outputDir):
+        Target.__init__(self)
+        self.options = options
+        self.expPath = expPath
+        self.outputDir = outputDir
     
     def run(self):
-        if self.params.vanilla == True:
-           self.runVanilla()
-        else:
-            self.runProgressive()
+        timer = PhaseTimer()
+        with timer.phase("treeStats") as phase:
+            expPath = self.expPath
+            port = None
+            portOwner = getPortOwner(self.outputDir)
+            try:
+                if getKtAddress(expPath) is not None:
+                    #The port of the alignment was released when it finished, so 
+                    #serve the database on one reserved by this target
+                    port = reservePort(portOwner)
+                    expPath = os.path.join(self.getLocalTempDir(), "experiment.xml")
+                    writeWithPort(self.expPath, port, expPath)
+                exp = ExperimentWrapper(ET.parse(expPath).getroot())
+                #The kyoto tycoon server (if any) is killed on the way out, 
+                #whether or not the stats worked
+                with KtServerPool() as ktServers:
+                    ktServers.start(exp, getKtAddress(expPath))
+                    phase.addCommand(getRunner(self.options).run(
+                        ["cactus_treeStats", "--cactusDisk", exp.getDiskDatabaseString(),
+                         "--flowerName", "0", "--outputFile", 
+                         os.path.join(self.outputDir, "treeStats.xml")]))
+            finally:
+                if port is not None:
+                    releasePort(port, portOwner)
+        timer.write(getPhaseTimesPath(self.outputDir, "treeStats"))
+
+class MakeJobTreeStats(Target):
+    """Runs jobTreeStats on the jobTree of a finished alignment.
+    """
+    def __init__(self, options, jobTreeDir, outputDir):
+        Target.__init__(self)
+        self.options = options
+        self.jobTreeDir = jobTreeDir
+        self.outputDir = outputDir
+    
+    def run(self):
+        timer = PhaseTimer()
+        with timer.phase("jobTreeStats") as phase:
+            phase.addCommand(getRunner(self.options).run(
+                ["jobTreeStats", "--jobTree", self.jobTreeDir, "--outputFile", 
+                 os.path.join(self.outputDir, "jobTreeStats.xml")]))
+        timer.write(getPhaseTimesPath(self.outputDir, "jobTreeStats"))
+
+class FinishAlignment(Target):
+    """Joins the post-alignment targets: merges their phase times and
+    analyzes the run once its jobTree stats are written.
+    """
+    def __init__(self, outputDir, maxThreads):
+        Target.__init__(self)
+        self.outputDir = outputDir
+        self.maxThreads = maxThreads
+    
+    def run(self):
+        phaseTimesPath = os.path.join(self.outputDir, "phaseTimes.json")
+        timer = PhaseTimer()
+        if os.path.isfile(phaseTimesPath):
+            timer.phases = readPhases(phaseTimesPath)
+            timer.context = readContext(phaseTimesPath)
+        for name in ["treeStats", "jobTreeStats"]:
+            path = getPhaseTimesPath(self.outputDir, name)
+            if os.path.isfile(path):
+                timer.phases += readPhases(path)
+                removePath(path)
+        timer.write(phaseTimesPath)
+        
+        #Work out what limited the wall time of the run.  Only a diagnostic,
+        #so a run without usable jobTree stats (eg from before they were
+        #kept) still goes on to its comparison and summary
+        try:
+            analyzeRun(self.outputDir, self.maxThreads)
+        except Exception, e:
+            logger.warning("Could not analyze the critical path of %s: %s" %
+                           (self.outputDir, e))
 
 class MakeBlanchetteAlignments(Target):
     name = "blanchette"
@@ -280,68 +568,125 @@ class MakeBlanchetteAlignments(Target):
         if not os.path.isdir(outputDir):
             os.mkdir(outputDir)
     
+        #Compare each repeat as soon as it is aligned then merge the results
+        comparisonFiles = []
         for i in xrange(self.options.blanchetteRepeats):
             sequences, newickTreeString = getCactusInputs_blanchette(i)
+            stats = MakeBlanchetteRepeatStats(self.options, outputDir, self.params, i)
             self.addChildTarget(MakeAlignment(self.options, sequences, newickTreeString, os.path.join(outputDir, str(i)), 
-                                        self.params))
-        self.setFollowOnTarget(MakeBlanchetteStats(self.options, outputDir, self.params))
-        
-class MakeBlanchetteStats(Target):
-    """Builds basic stats and the maf alignment.
+                                        self.params, [stats]))
+            comparisonFiles.append(os.path.join(outputDir, str(i), "mafComparison.xml"))
+        self.setFollowOnTarget(MakeMergedComparison(self.options, comparisonFiles, 
+                                                    os.path.join(outputDir, "mafComparison.xml")))
+
+class MakeBlanchetteRepeatStats(Target):
+    """Compares the alignment of one blanchette repeat to the true alignment.
     """
-    def __init__(self, options, outputDir, params):
-        Target.__init__(self)
+    def __init__(self, options, outputDir, params, i):
+        Target.__init__(self, cpu=getComparatorCpu(options))
         self.options = options
         self.outputDir = outputDir
         self.params = params
-    
+        self.i = i
+        
     def run(self):
-        previousOutputFile = None
-        previousOutputFile2 = None
+        i = self.i
         blanchettePath = os.path.join(TestStatus.getPathToDataSets(), "blanchettesSimulation")
-        for i in xrange(self.options.blanchetteRepeats):
-            trueAlignmentMFA = os.path.join(os.path.join(blanchettePath, "%.2i.job" % i), "true.mfa")
+        trueAlignmentMFA = os.path.join(os.path.join(blanchettePath, "%.2i.job" % i), "true.mfa")
+        treeFile = os.path.join(blanchettePath, "tree.newick")
+        expPath = os.path.join(self.outputDir, str(i), "experiment.xml")
+        truthStore = getTruthStore(self.options)
+        if truthStore is not None:
+            #The converted and renamed truth is shared by the whole sweep
+            trueAlignmentMAF = truthStore.convertedMfa(trueAlignmentMFA, treeFile)
+            trueAlignmentMAF = truthStore.renamedMaf(trueAlignmentMAF, expPath,
+                                                     getNameMapCacheDir(self.options),
+                                                     getComparatorCpu(self.options))
+        else:
             trueAlignmentMAF = os.path.join(self.getLocalTempDir(), "temp.maf")
-            treeFile = os.path.join(blanchettePath, "tree.newick")
-            system("mfaToMaf --mfaFile %s --outputFile %s --treeFile %s" % (trueAlignmentMFA, trueAlignmentMAF, treeFile))
-            
+            getRunner(self.options).run(["mfaToMaf", "--mfaFile", trueAlignmentMFA, 
+                                         "--outputFile", trueAlignmentMAF, 
+                                         "--treeFile", treeFile])
             
             trueRenamedMAF = trueAlignmentMAF + ".renamed"
-            expPath = os.path.join(self.outputDir, str(i), "experiment.xml")
-            applyNamingToMaf(expPath, trueAlignmentMAF, trueRenamedMAF)
+            applyNamingToMaf(expPath, trueAlignmentMAF, trueRenamedMAF,
+                             getNameMapCacheDir(self.options),
+                             getComparatorCpu(self.options))
             trueAlignmentMAF = trueRenamedMAF
-            if self.params.vanilla == False:            
-                predictedAlignmentMaf = os.path.join(self.outputDir, str(i), "progressiveCactusAlignment", "Anc0", "Anc0.maf")
+        if self.params.vanilla == False:            
+            predictedAlignmentMaf = os.path.join(self.outputDir, str(i), "progressiveCactusAlignment", "Anc0", "Anc0.maf")
+        else:
+            predictedAlignmentMaf = os.path.join(self.outputDir, str(i), "cactusVanilla.maf")
+        
+        outputFile = os.path.join(self.getLocalTempDir(), "temp%i" % i)
+        runMafComparator(self.options, trueAlignmentMAF, predictedAlignmentMaf, outputFile)
+        copyFile(outputFile, os.path.join(self.outputDir, str(i), "mafComparison.xml"))
+
+class MakeMergedComparison(Target):
+    """Merges mafComparator results by pairwise tree reduction, so the 
+    merge takes log(n) steps rather than n.
+    """
+    def __init__(self, options, inputFiles, outputFile):
+        Target.__init__(self)
+        self.options = options
+        self.inputFiles = inputFiles
+        self.outputFile = outputFile
+    
+    def run(self):
+        if len(self.inputFiles) == 1:
+            copyFile(self.inputFiles[0], self.outputFile)
+            return
+        mid = len(self.inputFiles) / 2
+        halves = [self.inputFiles[:mid], self.inputFiles[mid:]]
+        halfFiles = []
+        tempFiles = []
+        for half, suffix in zip(halves, [".left", ".right"]):
+            if len(half) == 1:
+                halfFiles.append(half[0])
             else:
-                predictedAlignmentMaf = os.path.join(self.outputDir, str(i), "cactusVanilla.maf")
-            
-            outputFile = os.path.join(self.getLocalTempDir(), "temp%i" % i)
-            system("mafComparator --mafFile1 %s --mafFile2 %s --outputFile %s" % (trueAlignmentMAF, predictedAlignmentMaf, outputFile))
-            system("cp %s %s" % (outputFile, os.path.join(self.outputDir, str(i), "mafComparison.xml")))
-            if previousOutputFile != None:
-                system("mergeMafComparatorResults.py --results1 %s --results2 %s --outputFile %s" % (outputFile, previousOutputFile, outputFile))
-            previousOutputFile = outputFile
-            
-        system("mv %s %s" % (previousOutputFile, os.path.join(self.outputDir, "mafComparison.xml")))   
+                halfFile = self.outputFile + suffix
+                self.addChildTarget(MakeMergedComparison(self.options, half, halfFile))
+                halfFiles.append(halfFile)
+                tempFiles.append(halfFile)
+        self.setFollowOnTarget(MergeComparisonPair(self.options, halfFiles[0], halfFiles[1], 
+                                                   self.outputFile, tempFiles))
+
+class MergeComparisonPair(Target):
+    """Merges two mafComparator results, removing the temporary ones.
+    """
+    def __init__(self, options, inputFile1, inputFile2, outputFile, tempFiles):
+        Target.__init__(self)
+        self.options = options
+        self.inputFile1 = inputFile1
+        self.inputFile2 = inputFile2
+        self.outputFile = outputFile
+        self.tempFiles = tempFiles
+        
+    def run(self):
+        getRunner(self.options).run(["mergeMafComparatorResults.py", "--results1", 
+                                     self.inputFile1, "--results2", self.inputFile2, 
+                                     "--outputFile", self.outputFile])
+        for tempFile in self.tempFiles:
+            removePath(tempFile)
         
 class MakeEvolverPrimatesLoci1(MakeBlanchetteAlignments):
     name = "evolverPrimatesLoci1"
-    def setupStats(self, outputDir, trueMaf, params):
-        #Setup the stat computation
+    #Align, comparing the alignment to trueMaf as soon as it is published
+    def addAlignment(self, sequences, newickTreeString, outputDir, trueMaf):
         if self.params.vanilla == False:
             predictedMaf = os.path.join(outputDir, "progressiveCactusAlignment", "Anc0", "Anc0.maf")
         else:
             predictedMaf = os.path.join(outputDir, "cactusVanilla.maf")
         outputFile = os.path.join(outputDir, "mafComparison.xml")
-        self.setFollowOnTarget(MakeStats(self.options, trueMaf, predictedMaf, outputFile, params))
+        stats = MakeStats(self.options, trueMaf, predictedMaf, outputFile, self.params)
+        self.addChildTarget(MakeAlignment(self.options, sequences, newickTreeString, outputDir,
+                                          self.params, [stats]))
     
     def run(self):
         simDir = os.path.join(TestStatus.getPathToDataSets(), "evolver", "primates", "loci1")
         sequences, newickTreeString = getInputs(simDir, ("simHuman.chr6", "simChimp.chr6", "simGorilla.chr6", "simOrang.chr6"))
         outputDir = os.path.join(self.options.outputDir, "%s%s"  % (self.name, self.params))
-        self.addChildTarget(MakeAlignment(self.options, sequences, newickTreeString, outputDir,
-                                          self.params))
-        self.setupStats(outputDir, os.path.join(simDir, "all.burnin.maf"), self.params)
+        self.addAlignment(sequences, newickTreeString, outputDir, os.path.join(simDir, "all.burnin.maf"))
         
         
 class MakeEvolverMammalsLoci1(MakeEvolverPrimatesLoci1):
@@ -350,9 +695,7 @@ class MakeEvolverMammalsLoci1(MakeEvolverPrimatesLoci1):
         simDir = os.path.join(TestStatus.getPathToDataSets(), "evolver", "mammals", "loci1")
         sequences, newickTreeString = getInputs(simDir, ("simHuman.chr6", "simMouse.chr6", "simRat.chr6", "simCow.chr6", "simDog.chr6"))
         outputDir = os.path.join(self.options.outputDir, "%s%s"  % (self.name, self.params))
-        self.addChildTarget(MakeAlignment(self.options, sequences, newickTreeString, outputDir,
-                                          self.params))
-        self.setupStats(outputDir, os.path.join(simDir, "all.burnin.maf"), self.params)
+        self.addAlignment(sequences, newickTreeString, outputDir, os.path.join(simDir, "all.burnin.maf"))
         
 class MakeEvolverMammalsLoci1HumanMouse(MakeEvolverPrimatesLoci1):
     name = "evolverMammalsHumanMouseLoci1"
@@ -361,9 +704,7 @@ class MakeEvolverMammalsLoci1HumanMouse(MakeEvolverPrimatesLoci1):
         sequences, newickTreeString = getInputs(simDir, ("simHuman.chr6", "simMouse.chr6"))
         newickTreeString = "(simHuman:0.144018,simMouse:0.356483);"
         outputDir = os.path.join(self.options.outputDir, "%s%s"  % (self.name, self.params))
-        self.addChildTarget(MakeAlignment(self.options, sequences, newickTreeString, outputDir,
-                                          self.params))
-        self.setupStats(outputDir, os.path.join(simDir, "all.burnin.maf"), self.params)
+        self.addAlignment(sequences, newickTreeString, outputDir, os.path.join(simDir, "all.burnin.maf"))
         
 class MakeEevolverHumanMouseLarge(MakeEvolverPrimatesLoci1):
     name = "evolverHumanMouseLarge"
@@ -373,9 +714,7 @@ class MakeEevolverHumanMouseLarge(MakeEvolverPrimatesLoci1):
         newickTreeString = "(simHuman:0.144018,simMouse:0.356483);"
 
         outputDir = os.path.join(self.options.outputDir, "%s%s"  % (self.name, self.params))
-        self.addChildTarget(MakeAlignment(self.options, sequences, newickTreeString, outputDir,
-                                          self.params))
-        self.setupStats(outputDir, os.path.join(simDir, "all.burnin.maf"), self.params)
+        self.addAlignment(sequences, newickTreeString, outputDir, os.path.join(simDir, "all.burnin.maf"))
         
 class MakeBlanchetteHumanMouse(MakeEvolverPrimatesLoci1):
     name = "blanchetteHumanMouse"
@@ -385,9 +724,7 @@ class MakeBlanchetteHumanMouse(MakeEvolverPrimatesLoci1):
         #, newickTreeString = getInputs(simDir, ("HUMAN", "MOUSE"))
         newickTreeString = "(HUMAN:0.144018,MOUSE:0.356483);"
         outputDir = os.path.join(self.options.outputDir, "%s%s"  % (self.name, self.params))
-        self.addChildTarget(MakeAlignment(self.options, sequences, newickTreeString, outputDir,
-                                          self.params))
-        self.setupStats(outputDir, os.path.join(simDir, "true.maf"), self.params)
+        self.addAlignment(sequences, newickTreeString, outputDir, os.path.join(simDir, "true.maf"))
         
 class MakeBlanchetteHumanMouseDog(MakeEvolverPrimatesLoci1):
     name = "blanchetteHumanMouseDog"
@@ -397,13 +734,11 @@ class MakeBlanchetteHumanMouseDog(MakeEvolverPrimatesLoci1):
         #, newickTreeString = getInputs(simDir, ("HUMAN", "MOUSE"))
         newickTreeString = "((HUMAN:0.144018,MOUSE:0.356483):0.0238,DOG:0.197);"
         outputDir = os.path.join(self.options.outputDir, "%s%s"  % (self.name, self.params))
-        self.addChildTarget(MakeAlignment(self.options, sequences, newickTreeString, outputDir,
-                                          self.params))
-        self.setupStats(outputDir, os.path.join(simDir, "true.maf"), self.params)
+        self.addAlignment(sequences, newickTreeString, outputDir, os.path.join(simDir, "true.maf"))
         
 class MakeStats(Target):
     def __init__(self, options, trueMaf, predictedMaf, outputFile, params):
-        Target.__init__(self)
+        Target.__init__(self, cpu=getComparatorCpu(options))
         self.options = options
         self.trueMaf = trueMaf
         self.predictedMaf = predictedMaf
@@ -414,75 +749,237 @@ class MakeStats(Target):
         if not os.path.exists(self.outputFile):
             outputFile = os.path.join(self.getLocalTempDir(), "temp.xml")
            
-            trueRenamedMAF = os.path.join(self.getLocalTempDir(), "true_renamed.maf") 
             outputDir = os.path.split(self.outputFile)[0]
             expPath = os.path.join(outputDir, "experiment.xml")
-            applyNamingToMaf(expPath, self.trueMaf, trueRenamedMAF)
-            self.trueMaf = trueRenamedMAF
-            system("mafComparator --mafFile1 %s --mafFile2 %s --outputFile %s" % (self.trueMaf, self.predictedMaf, outputFile))
-            system("mv %s %s" % (outputFile, self.outputFile))
+            truthStore = getTruthStore(self.options)
+            if truthStore is not None:
+                #The renamed truth is shared by the whole sweep
+                self.trueMaf = truthStore.renamedMaf(self.trueMaf, expPath,
+                                                     getNameMapCacheDir(self.options),
+                                                     getComparatorCpu(self.options))
+            else:
+                trueRenamedMAF = os.path.join(self.getLocalTempDir(), "true_renamed.maf") 
+                applyNamingToMaf(expPath, self.trueMaf, trueRenamedMAF,
+                                 getNameMapCacheDir(self.options),
+                                 getComparatorCpu(self.options))
+                self.trueMaf = trueRenamedMAF
+            runMafComparator(self.options, self.trueMaf, self.predictedMaf, outputFile)
+            movePath(outputFile, self.outputFile)
+
+def getSummaryPath(rootDir, testCategory, params, i):
+    if i is not None:
+        return os.path.join(rootDir, testCategory.name + str(params), str(i))
+    else:
+        return os.path.join(rootDir, testCategory.name + str(params))
+
+# summarize the runs of each params in paramsList for one test category 
+# (and blanchette repeat i).  each run is looked for in the given root 
+# directories in turn, which lets the outputs of several shards be merged
+def makeSummary(rootDirs, testCategory, name, i, paramsList, db=None):
+    summary = Summary(db)
+    for params in paramsList:
+        rowName = name + str(params)
+        for rootDir in rootDirs:
+            basePath = getSummaryPath(rootDir, testCategory, params, i)
+            if os.path.isdir(basePath):
+                break
+        jobTreeStatsPath = os.path.join(basePath, "jobTreeStats.xml")
+        mafCompPath = os.path.join(basePath, "mafComparison.xml")
+        treeStatsPath = os.path.join(basePath, "treeStats.xml")
+        criticalPathPath = os.path.join(basePath, "criticalPath.xml")
+        phaseTimesPath = os.path.join(basePath, "phaseTimes.json")
+        if params.vanilla is False:
+            projPath = os.path.join(basePath, "progressiveCactusAlignment", 
+                                    "progressiveCactusAlignment_project.xml")
+        else:
+            projPath = None                    
+        summary.addRow(rowName, params, jobTreeStatsPath, mafCompPath, 
+                       treeStatsPath, projPath, criticalPathPath, phaseTimesPath)
+    return summary
+
+def getBaseNames(options, testCategory):
+    if testCategory == MakeBlanchetteAlignments:
+        for i in xrange(options.blanchetteRepeats):
+            yield (testCategory.name + str(i), i)
+    else:
+        yield (testCategory.name, None)
+
+# database of the stats of every run summarized so far
+def getResultsDb(options):
+    return ResultsDb(os.path.join(options.outputDir, "results.db"))
+
+# write the per category summaries of the runs found under rootDirs
+# to the output directory
+def writeSummaries(options, paramsGenerator, rootDirs):
+    db = getResultsDb(options)
+    summaries = []
+    for testCategory in [MakeBlanchetteAlignments, MakeEvolverPrimatesLoci1, MakeEvolverMammalsLoci1]:
+        repeats = []
+        for name, i in getBaseNames(options, testCategory):
+            summary = makeSummary(rootDirs, testCategory, name, i,
+                                  paramsGenerator.generate(), db)
+            summary.write(os.path.join(options.outputDir, "%s_summary.csv" % name))
+            summaries.append((name, i, summary))
+            repeats.append(summary)
+        if len(repeats) > 1:
+            Summary.writeAggregate(os.path.join(options.outputDir, "%s_repeats_summary.csv" %
+                                                testCategory.name),
+                                   Summary.aggregateRepeats(repeats))
+    db.close()
+    if options.columnarSummary is not None:
+        writeColumnar(os.path.join(options.outputDir, options.columnarSummary), summaries)
 
 class MakeSummary(Target):
     def __init__(self, options, paramsGenerator):
         Target.__init__(self)
         self.options = options
         self.paramsGenerator = paramsGenerator
+     
+    def run(self):
+        writeSummaries(self.options, self.paramsGenerator, [self.options.outputDir])
+        self.addChildTarget(MakeParetoReport(self.options, self.paramsGenerator))
+        if self.options.threadLadder is not None:
+            self.addChildTarget(MakeScalingReport(self.options, self.paramsGenerator))
+
+# write the speed / accuracy frontier of each dataset to the output
+# directory.  the summaries are read back from the results database
+def writeParetoReport(options, paramsGenerator, rootDirs):
+    db = getResultsDb(options)
+    report = ParetoReport(options.paretoTime)
+    for testCategory in MakeAllAlignments.TestCategories:
+        for name, i in getBaseNames(options, testCategory):
+            summary = makeSummary(rootDirs, testCategory, name, i,
+                                  paramsGenerator.generate(), db)
+            rows = [(rowName[len(name):], row) for rowName, row in summary.getRowDicts()]
+            report.addDataset(name, rows)
+    db.close()
+    report.write(os.path.join(options.outputDir, "pareto.csv"))
+
+# write the thread scaling of the runs of each dataset, for the whole
+# run and each timed phase (eg cactusProgressive), to the output 
+# directory.  the jobTree target type times aren't used since they are
+# summed over the targets, so they don't go down as threads are added
+def writeScalingReport(options, paramsGenerator, rootDirs):
+    db = getResultsDb(options)
+    report = ScalingReport()
+    for testCategory in MakeAllAlignments.TestCategories:
+        for name, i in getBaseNames(options, testCategory):
+            summary = makeSummary(rootDirs, testCategory, name, i,
+                                  paramsGenerator.generate(), db)
+            for params, (rowName, row) in zip(summary.params, summary.getRowDicts()):
+                stageTimes = {"Total" : row["Run_Time"]}
+                for column, value in row.items():
+                    if column.startswith("Phase_") and column.endswith("_wall") \
+                       and value != "":
+                        stageTimes[column[len("Phase_"):-len("_wall")]] = value
+                group = copy.copy(params)
+                group.numThreads = None
+                report.addRun(name, str(group), params.numThreads, stageTimes)
+    db.close()
+    report.write(os.path.join(options.outputDir, "scaling.csv"))
+
+class MakeScalingReport(Target):
+    def __init__(self, options, paramsGenerator):
+        Target.__init__(self)
+        self.options = options
+        self.paramsGenerator = paramsGenerator
+     
+    def run(self):
+        writeScalingReport(self.options, self.paramsGenerator, [self.options.outputDir])
+
+class MakeParetoReport(Target):
+    def __init__(self, options, paramsGenerator):
+        Target.__init__(self)
+        self.options = options
+        self.paramsGenerator = paramsGenerator
+     
+    def run(self):
+        writeParetoReport(self.options, self.paramsGenerator, [self.options.outputDir])
+
+class MakeSearchRound(Target):
+    """Runs the surviving candidates of a parameter search on the 
+    dataset of one rung of the search.
+    """
+    Rungs = [MakeBlanchetteHumanMouse, MakeEvolverPrimatesLoci1, MakeEvolverMammalsLoci1]
+    def __init__(self, options, search, rung):
+        Target.__init__(self)
+        self.options = options
+        self.search = search
+        self.rung = rung
     
-    def getBaseNames(self, testCategory):
-        if testCategory == MakeBlanchetteAlignments:
-            for i in xrange(self.options.blanchetteRepeats):
-                yield (testCategory.name + str(i), i)
-        else:
-            yield (testCategory.name, None)
+    def run(self):
+        testCategory = self.Rungs[self.rung]
+        logger.info("Running %d search candidates on %s" % (len(self.search.candidates),
+                                                            testCategory.name))
+        for params in self.search.candidates:
+            self.addChildTarget(testCategory(self.options, params))
+        self.setFollowOnTarget(MakeSearchSelection(self.options, self.search, self.rung))
+
+class MakeSearchSelection(Target):
+    """Reads back the results of a search rung and promotes the best
+    candidates to the next rung.
+    """
+    def __init__(self, options, search, rung):
+        Target.__init__(self)
+        self.options = options
+        self.search = search
+        self.rung = rung
     
-    def getPath(self, testCategory, params, i):
-        if i is not None:
-            return os.path.join(self.options.outputDir, testCategory.name + str(params), str(i))
-        else:
-            return os.path.join(self.options.outputDir, testCategory.name + str(params))
-     
     def run(self):
-        for testCategory in [MakeBlanchetteAlignments, MakeEvolverPrimatesLoci1, MakeEvolverMammalsLoci1]:
-            for name, i in self.getBaseNames(testCategory):
-                summary = Summary()
-                for params in self.paramsGenerator.generate():
-                    rowName = name + str(params)
-                    basePath = self.getPath(testCategory, params, i)
-                    jobTreeStatsPath = os.path.join(basePath, "jobTreeStats.xml")
-                    mafCompPath = os.path.join(basePath, "mafComparison.xml")
-                    treeStatsPath = os.path.join(basePath, "treeStats.xml")
-                    if params.vanilla is False:
-                        projPath = os.path.join(basePath, "progressiveCactusAlignment", 
-                                                "progressiveCactusAlignment_project.xml")
-                    else:
-                        projPath = None                    
-                    summary.addRow(rowName, params, jobTreeStatsPath, mafCompPath, 
-                                   treeStatsPath, projPath)
-                summary.write(os.path.join(self.options.outputDir, "%s_summary.csv" % name))
+        testCategory = MakeSearchRound.Rungs[self.rung]
+        db = getResultsDb(self.options)
+        summary = makeSummary([self.options.outputDir], testCategory, 
+                              testCategory.name, None, self.search.candidates, db)
+        db.close()
+        rows = dict()
+        for name, row in summary.getRowDicts():
+            rows[name[len(testCategory.name):]] = row
+        promoted = self.search.select(self.rung, rows)
+        logger.info("Promoted %s from %s" % (" ".join([str(i) for i in promoted]), 
+                                             testCategory.name))
+        self.search.write(os.path.join(self.options.outputDir, "search.csv"))
+        if not self.search.isFinished(self.rung):
+            self.setFollowOnTarget(MakeSearchRound(self.options, self.search, self.rung + 1))
                    
+# the params of the sweep: a thread ladder of the single case in a
+# scaling study, otherwise getParamsGenerator()
+def getSweepGenerator(options):
+    if options.threadLadder is not None:
+        return NumThreadsTest(options.threadLadder)
+    return getParamsGenerator()
+
+def getParamsGenerator():
+    #return ParamsGenerator()
+    #return BasicProgressive()
+    #return AllProgressive()
+    #return EverythingButSelf()
+    return SingleCase()
+    #return KyotoTycoon()
+    #return LastzTuning()
+
 class MakeAllAlignments(Target):
     """Makes alignments using pipeline.
     """
+    TestCategories = [MakeBlanchetteHumanMouse, MakeBlanchetteHumanMouseDog,
+                      MakeBlanchetteAlignments, MakeEvolverPrimatesLoci1,
+                      MakeEvolverMammalsLoci1, MakeEvolverMammalsLoci1HumanMouse]
+                      #MakeEevolverHumanMouseLarge]
     def __init__(self, options):
         Target.__init__(self)
         self.options = options
     
     def run(self):
-        #pg = ParamsGenerator()
-        #pg = BasicProgressive()
-        #pg = AllProgressive()
-        #pg = EverythingButSelf()
-        pg = SingleCase()
-        #pg = KyotoTycoon()
-        #pg = LastzTuning()
-        for params in pg.generate():
-            self.addChildTarget(MakeBlanchetteHumanMouse(self.options, params))
-            self.addChildTarget(MakeBlanchetteHumanMouseDog(self.options, params))
-            self.addChildTarget(MakeBlanchetteAlignments(self.options, params))
-            self.addChildTarget(MakeEvolverPrimatesLoci1(self.options, params))
-            self.addChildTarget(MakeEvolverMammalsLoci1(self.options, params))
-            self.addChildTarget(MakeEvolverMammalsLoci1HumanMouse(self.options, params))
-            #self.addChildTarget(MakeEevolverHumanMouseLarge(self.options, params))
+        pg = getSweepGenerator(self.options)
+        if self.options.search is True:
+            search = SuccessiveHalving(pg.generate(), len(MakeSearchRound.Rungs),
+                                       eta=self.options.searchEta)
+            self.addChildTarget(MakeSearchRound(self.options, search, 0))
+        else:
+            for params in pg.generate():
+                for testCategory in self.TestCategories:
+                    if self.options.shard is None or \
+                    self.options.shard.contains(testCategory, params):
+                        self.addChildTarget(testCategory(self.options, params))
         
         self.setFollowOnTarget(MakeSummary(self.options, pg))
 
@@ -494,17 +991,107 @@ def main():
     
     parser = OptionParser()
     parser.add_option("--outputDir", dest="outputDir")
+    parser.add_option("--cacheDir", dest="cacheDir", default=None,
+                      help="content-addressed store for alignment results, "
+                      "preprocessed sequences and lastz outputs. Output "
+                      "directories become links into it so identical "
+                      "configurations are only aligned once")
+    parser.add_option("--resourceModel", dest="resourceModel", default=None,
+                      help="calibrated model (from resourceEstimator.py) used to "
+                      "size the cpu and memory requests of each alignment")
+    parser.add_option("--maxAlignmentCpu", dest="maxAlignmentCpu", type="int",
+                      default=4, help="most cpus requested by an alignment "
+                      "[default=%default]")
+    parser.add_option("--nativeComparator", dest="nativeComparator", 
+                      action="store_true", default=False,
+                      help="compare mafs with the multi-core numpy comparator "
+                      "in mafComparator.py instead of the mafComparator binary")
+    parser.add_option("--comparatorProcesses", dest="comparatorProcesses",
+                      type="int", default=4, help="processes used by the native "
+                      "comparator [default=%default]")
+    parser.add_option("--comparatorSamples", dest="comparatorSamples",
+                      type="int", default=1000000, help="most homology pairs "
+                      "sampled by the native comparator [default=%default]")
+    parser.add_option("--comparatorCIWidth", dest="comparatorCIWidth",
+                      type="float", default=None, help="native comparator stops "
+                      "sampling once every species' 95% confidence interval is "
+                      "narrower than this")
+    parser.add_option("--columnarSummary", dest="columnarSummary", default=None,
+                      help="also write every summarized run to this file in "
+                      "the output directory as one long-form table, eg "
+                      "summary.parquet (.parquet is written as parquet, "
+                      "anything else as arrow).  needs pyarrow")
+    parser.add_option("--paretoTime", dest="paretoTime", default="Run_Time",
+                      type="choice", choices=["Run_Time", "Clock_Time"],
+                      help="summary column the speed/accuracy frontier in "
+                      "pareto.csv is computed on: Run_Time (wall) or "
+                      "Clock_Time (cpu) [default=%default]")
+    parser.add_option("--threadLadder", dest="threadLadder", default=None,
+                      help="run a thread scaling study: the single case with "
+                      "each of these comma-separated thread counts (eg 1,2,4,8), "
+                      "each given exactly that many cpus.  Writes scaling.csv")
+    parser.add_option("--toolTimeout", dest="toolTimeout", type="float",
+                      default=None, help="seconds after which an external tool "
+                      "(cactus_treeStats, jobTreeStats, mfaToMaf, mafComparator) "
+                      "is killed and counted as failed")
+    parser.add_option("--toolRetries", dest="toolRetries", type="int", default=0,
+                      help="times a failed external tool is run again "
+                      "[default=%default]")
+    parser.add_option("--blanchetteRepeats", dest="blanchetteRepeats", type="int",
+                      default=1, help="number of blanchette simulations aligned "
+                      "for each params.  With more than one, the mean, std, min "
+                      "and max of each column across them is written to "
+                      "blanchette_repeats_summary.csv [default=%default]")
+    parser.add_option("--scratchDir", dest="scratchDir", default=None,
+                      help="node-local directory (eg a local disk or tmpfs) "
+                      "for the tokyo cabinet databases of each run, which are "
+                      "moved back to the output directory once it is done")
+    parser.add_option("--scratchJobTree", dest="scratchJobTree", action="store_true",
+                      default=False, help="put the jobTree of each run in "
+                      "--scratchDir too")
+    parser.add_option("--scratchSpace", dest="scratchSpace", type="float",
+                      default=10.0, help="gigabytes that must be free in "
+                      "--scratchDir for a run to use it, otherwise its database "
+                      "stays in the output directory [default=%default]")
+    parser.add_option("--shard", dest="shard", default=None,
+                      help="only run shard i/N of the (test category x params) "
+                      "work items, eg 0/4")
+    parser.add_option("--mergeShards", dest="mergeShards", default=None,
+                      help="comma-separated output directories of shard runs. "
+                      "Writes their combined summaries to outputDir instead of "
+                      "running anything")
+    parser.add_option("--search", dest="search", action="store_true", default=False,
+                      help="search the parameters by successive halving instead "
+                      "of running every combination on every dataset")
+    parser.add_option("--searchEta", dest="searchEta", type="int", default=3,
+                      help="fraction (1/eta) of candidates promoted at each "
+                      "round of the search [default=%default]")
     
     Stack.addJobTreeOptions(parser)
     
     options, args = parser.parse_args()
     setLoggingFromOptions(options)
     
-    options.blanchetteRepeats = 1
-    
     if len(args) != 0:
         raise RuntimeError("Unrecognised input arguments: %s" % " ".join(args))
     
+    if options.threadLadder is not None:
+        options.threadLadder = [int(i) for i in options.threadLadder.split(",")]
+    
+    if options.mergeShards is not None:
+        pg = getSweepGenerator(options)
+        writeSummaries(options, pg, options.mergeShards.split(","))
+        writeParetoReport(options, pg, options.mergeShards.split(","))
+        if options.threadLadder is not None:
+            writeScalingReport(options, pg, options.mergeShards.split(","))
+        logger.info("Merged the shard summaries")
+        return
+    
+    if options.shard is not None:
+        if options.search is True:
+            raise RuntimeError("--shard cannot be combined with --search")
+        options.shard = Shard.fromString(options.shard)
+    
     Stack(MakeAllAlignments(options)).startJobTree(options)
     logger.info("Done with job tree")
 
@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+
+#Copyright (C) 2011 by Glenn Hickey
+#
+#Released under the MIT license, see LICENSE.txt
+
+""" estimate the cpu and memory to request for an alignment from the
+size of its input sequences and the number of leaves in its tree.
+The linear models are calibrated by least squares from the
+resources.xml (inputs) and jobTreeStats.xml (what was actually used)
+files left in the output directories of earlier runs.
+
+"""
+
+import os
+import math
+import xml.etree.ElementTree as ET
+from optparse import OptionParser
+
+# total size in bytes of a sequence file or directory of files
+def sequenceSize(path):
+    if not os.path.isdir(path):
+        return os.path.getsize(path)
+    size = 0
+    for dirPath, dirNames, fileNames in os.walk(path):
+        for fileName in fileNames:
+            size += os.path.getsize(os.path.join(dirPath, fileName))
+    return size
+
+# number of leaves of a newick tree (assumes no unary nodes)
+def countLeaves(newickTree):
+    return newickTree.count(",") + 1
+
+# least squares fit of y = a + b * x.  returns (a, b)
+def fitLine(xs, ys):
+    n = float(len(xs))
+    meanX = sum(xs) / n
+    meanY = sum(ys) / n
+    sxx = sum([(x - meanX) ** 2 for x in xs])
+    if sxx == 0:
+        return (meanY, 0.0)
+    sxy = sum([(x - meanX) * (y - meanY) for x, y in zip(xs, ys)])
+    b = sxy / sxx
+    return (meanY - b * meanX, b)
+
+class ResourceEstimator:
+    def __init__(self, maxCpu=4, maxMemory=64000000000):
+        self.maxCpu = maxCpu
+        self.maxMemory = maxMemory
+        self.minMemory = 500000000
+        # peak memory = memoryIntercept + memoryPerByte * input bytes
+        self.memoryIntercept = 1000000000.0
+        self.memoryPerByte = 50.0
+        # parallelism = cpuIntercept + cpuPerLeaf * leaves
+        self.cpuIntercept = 1.0
+        self.cpuPerLeaf = 0.5
+        # safety margin applied to predicted memory
+        self.headroom = 1.5
+
+    def estimateCpu(self, sequences, newickTree, params):
+        cpu = int(math.ceil(self.cpuIntercept + self.cpuPerLeaf * countLeaves(newickTree)))
+        if params.numThreads is not None:
+            cpu = max(cpu, int(params.numThreads))
+        return max(1, min(cpu, self.maxCpu))
+
+    def estimateMemory(self, sequences, newickTree, params):
+        totalSize = sum([sequenceSize(i) for i in sequences])
+        memory = self.headroom * (self.memoryIntercept + self.memoryPerByte * totalSize)
+        return int(max(self.minMemory, min(memory, self.maxMemory)))
+
+    # record the inputs of a run next to its jobTreeStats.xml for calibration
+    def writeRecord(self, path, sequences, newickTree, cpu, memory):
+        elem = ET.Element("resources")
+        elem.attrib["sequence_size"] = str(sum([sequenceSize(i) for i in sequences]))
+        elem.attrib["leaves"] = str(countLeaves(newickTree))
+        elem.attrib["cpu"] = str(cpu)
+        elem.attrib["memory"] = str(memory)
+        ET.ElementTree(elem).write(path)
+
+    # peak memory in bytes and parallelism (cpu time over wall time)
+    # recorded in a jobTreeStats.xml.  memory is None if jobTree didn't
+    # record it.  jobTree's max_memory is ru_maxrss, in kilobytes.
+    # jobTree only records the max_memory of each target, so the peak is
+    # taken as that of the largest target.  this is an approximation: it
+    # ignores targets running at the same time (up to maxThreads of them),
+    # whose memory adds up on the node, and so underestimates runs with a
+    # lot of parallelism.  headroom is there to cover the difference
+    def __observed(self, jobTreeStatsPath):
+        root = ET.parse(jobTreeStatsPath).getroot()
+        memory = None
+        for elem in root.getiterator():
+            if "max_memory" in elem.attrib:
+                memory = max(memory, float(elem.attrib["max_memory"]) * 1024)
+        parallelism = float(root.attrib["total_clock"]) / \
+                      max(float(root.attrib["total_run_time"]), 1.0)
+        return memory, parallelism
+
+    # fit the models to every run under outputDir.  a cached run is
+    # reached through its cache entry and each run directory linked to
+    # it, so directories are only counted once
+    def calibrate(self, outputDir):
+        sizes, memories, leaves, parallelisms = [], [], [], []
+        seen = set()
+        for dirPath, dirNames, fileNames in os.walk(outputDir, followlinks=True):
+            realPath = os.path.realpath(dirPath)
+            if realPath in seen:
+                dirNames[:] = []
+                continue
+            seen.add(realPath)
+            if "resources.xml" in fileNames and "jobTreeStats.xml" in fileNames:
+                record = ET.parse(os.path.join(dirPath, "resources.xml")).getroot()
+                memory, parallelism = self.__observed(os.path.join(dirPath, "jobTreeStats.xml"))
+                if memory is not None:
+                    sizes.append(float(record.attrib["sequence_size"]))
+                    memories.append(memory)
+                leaves.append(float(record.attrib["leaves"]))
+                parallelisms.append(parallelism)
+        if len(memories) > 1:
+            self.memoryIntercept, self.memoryPerByte = fitLine(sizes, memories)
+        if len(parallelisms) > 1:
+            self.cpuIntercept, self.cpuPerLeaf = fitLine(leaves, parallelisms)
+        return len(parallelisms)
+
+    def writeModel(self, path):
+        elem = ET.Element("resourceModel")
+        for name in ["memoryIntercept", "memoryPerByte", "cpuIntercept",
+                     "cpuPerLeaf", "headroom"]:
+            elem.attrib[name] = repr(getattr(self, name))
+        ET.ElementTree(elem).write(path)
+
+    def readModel(self, path):
+        elem = ET.parse(path).getroot()
+        for name, value in elem.attrib.items():
+            setattr(self, name, float(value))
+
+def main():
+    usage = "usage: %prog <output dir> <model xml>"
+    description = "Calibrate the resource model from the runs in an output directory"
+    parser = OptionParser(usage=usage, description=description)
+
+    options, args = parser.parse_args()
+
+    if len(args) != 2:
+        parser.print_help()
+        raise RuntimeError("Wrong number of arguments")
+
+    estimator = ResourceEstimator()
+    numRuns = estimator.calibrate(args[0])
+    estimator.writeModel(args[1])
+    print "Calibrated from %d runs" % numRuns
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+
+#Copyright (C) 2011 by Glenn Hickey
+#
+#Released under the MIT license, see LICENSE.txt
+"""
+"""
+
+import unittest
+import os
+import shutil
+import tempfile
+
+from progressiveBenchmarks.src.params import Params
+from progressiveBenchmarks.src.resourceEstimator import ResourceEstimator
+from progressiveBenchmarks.src.resourceEstimator import fitLine
+
+class TestCase(unittest.TestCase):
+
+    def setUp(self):
+        unittest.TestCase.setUp(self)
+        self.tempDir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        unittest.TestCase.tearDown(self)
+        shutil.rmtree(self.tempDir)
+
+    def writeFile(self, path, contents):
+        outFile = open(path, "w")
+        outFile.write(contents)
+        outFile.close()
+        return path
+
+    # the output directory of a run on a sequence of size bytes, whose
+    # targets peaked at memories kilobytes (none recorded if empty), clock
+    # seconds of cpu over runTime seconds
+    def writeRun(self, name, size, newickTree, memories, clock, runTime):
+        runDir = os.path.join(self.tempDir, "runs", name)
+        os.makedirs(runDir)
+        seqPath = self.writeFile(os.path.join(runDir, "seq.fa"), "A" * size)
+        ResourceEstimator().writeRecord(os.path.join(runDir, "resources.xml"),
+                                        [seqPath], newickTree, 1, 1)
+        targets = "".join(["<target max_memory=\"%d\"/>" % i for i in memories])
+        self.writeFile(os.path.join(runDir, "jobTreeStats.xml"),
+                       "<stats total_clock=\"%f\" total_run_time=\"%f\">"
+                       "<target_types>%s</target_types></stats>" %
+                       (clock, runTime, targets))
+
+    def testFitLine(self):
+        a, b = fitLine([1.0, 2.0, 3.0], [5.0, 7.0, 9.0])
+        assert abs(a - 3.0) < 1e-9 and abs(b - 2.0) < 1e-9
+        assert fitLine([2.0, 2.0], [1.0, 3.0]) == (2.0, 0.0)
+
+    def testCalibrate(self):
+        # memory = 1GB + 1MB per byte, taken from the largest target
+        self.writeRun("a", 100, "(a,b);", [3000, 1048576 + 102400, 50000], 20.0, 10.0)
+        self.writeRun("b", 200, "(a,b,c);", [1048576 + 204800], 40.0, 10.0)
+        self.writeRun("c", 400, "(a,b,c,d,e);", [1048576 + 409600, 2000], 80.0, 10.0)
+        # no memory recorded: only used for the cpu model
+        self.writeRun("d", 5, "(a,b,c,d);", [], 60.0, 10.0)
+        # cached runs are also reached through the links to them
+        os.symlink(os.path.join(self.tempDir, "runs", "a"),
+                   os.path.join(self.tempDir, "runs", "d", "linked"))
+        os.symlink(os.path.join(self.tempDir, "runs", "c"),
+                   os.path.join(self.tempDir, "runs", "linked"))
+        estimator = ResourceEstimator()
+        assert estimator.calibrate(os.path.join(self.tempDir, "runs")) == 4
+        assert abs(estimator.memoryIntercept - 1073741824.0) < 1e-3
+        assert abs(estimator.memoryPerByte - 1048576.0) < 1e-6
+        # parallelism = 2 * leaves - 2
+        assert abs(estimator.cpuIntercept + 2.0) < 1e-6
+        assert abs(estimator.cpuPerLeaf - 2.0) < 1e-6
+
+        # too few runs leave the defaults alone
+        estimator = ResourceEstimator()
+        assert estimator.calibrate(os.path.join(self.tempDir, "runs", "a")) == 1
+        assert estimator.memoryPerByte == ResourceEstimator().memoryPerByte
+        assert estimator.cpuPerLeaf == ResourceEstimator().cpuPerLeaf
+
+    def testModel(self):
+        estimator = ResourceEstimator()
+        estimator.memoryIntercept = 1234.5
+        estimator.memoryPerByte = 0.1
+        estimator.cpuIntercept = -2.0
+        estimator.cpuPerLeaf = 1.0 / 3.0
+        estimator.headroom = 2.0
+        modelPath = os.path.join(self.tempDir, "model.xml")
+        estimator.writeModel(modelPath)
+        copy = ResourceEstimator(maxCpu=2)
+        copy.readModel(modelPath)
+        for name in ["memoryIntercept", "memoryPerByte", "cpuIntercept",
+                     "cpuPerLeaf", "headroom"]:
+            assert getattr(copy, name) == getattr(estimator, name)
+        assert copy.maxCpu == 2
+        # estimates are clamped to the limits
+        seqPath = self.writeFile(os.path.join(self.tempDir, "seq.fa"), "A" * 10)
+        assert copy.estimateCpu([seqPath], "(" + ",".join(["x"] * 15) + ");", Params()) == 2
+        assert copy.estimateMemory([seqPath], "(a,b);", Params()) == copy.minMemory
+
+def main():
+    unittest.main()
+
+if __name__ == '__main__':
+    main()
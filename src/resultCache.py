@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+
+#Copyright (C) 2011 by Glenn Hickey
+#
+#Released under the MIT license, see LICENSE.txt
+
+""" content-addressed cache of alignment results.  An alignment is
+stored under a digest of everything that determines it: the rendered
+config xml, the newick tree, the bytes of the input sequences and the
+few Params options (vanilla, kyoto tycoon) that aren't expressed in the
+config.  The parameter-named output directories of a sweep are
+symlinks into the cache, so identical configurations share one result
+no matter what they are called.  An entry is locked while it is being
+aligned, so a second run of the same configuration waits for the first
+rather than starting over in the same directory.
+
+"""
+
+import os
+import errno
+import fcntl
+import hashlib
+import xml.etree.ElementTree as ET
+
+BlockSize = 1 << 20
+
+# like mkdir -p, for directories other runs may be making at the same time
+def makeDirs(path):
+    try:
+        os.makedirs(path)
+    except OSError, e:
+        if e.errno != errno.EEXIST or not os.path.isdir(path):
+            raise
+
+def stringDigest(*items):
+    digest = hashlib.sha1()
+    for item in items:
+        digest.update(str(item))
+        digest.update("\0")
+    return digest.hexdigest()
+
+# digest of the contents of a file.  the input genomes can be large so
+# digests are remembered in memoDir, keyed on path, size and mtime
+def fileDigest(path, memoDir=None):
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    stamp = "%d %.6f" % (stat.st_size, stat.st_mtime)
+    memoPath = None
+    if memoDir is not None:
+        memoPath = os.path.join(memoDir, stringDigest(path))
+        if os.path.isfile(memoPath):
+            memoFile = open(memoPath, "r")
+            tokens = memoFile.read().split()
+            memoFile.close()
+            if len(tokens) == 3 and " ".join(tokens[:2]) == stamp:
+                return tokens[2]
+
+    digest = hashlib.sha1()
+    inFile = open(path, "rb")
+    while True:
+        block = inFile.read(BlockSize)
+        if not block:
+            break
+        digest.update(block)
+    inFile.close()
+    result = digest.hexdigest()
+
+    if memoPath is not None:
+        makeDirs(memoDir)
+        tempPath = "%s.%d" % (memoPath, os.getpid())
+        memoFile = open(tempPath, "w")
+        memoFile.write("%s %s\n" % (stamp, result))
+        memoFile.close()
+        os.rename(tempPath, memoPath)
+    return result
+
+# digest of a sequence path as given to cactus: either a fasta file
+# or a directory of fasta files.  names are included since cactus
+# derives event names from them
+def sequenceDigest(path, memoDir=None):
+    path = os.path.abspath(path)
+    if not os.path.isdir(path):
+        return stringDigest(os.path.basename(path), fileDigest(path, memoDir))
+    tokens = [os.path.basename(path)]
+    for dirPath, dirNames, fileNames in os.walk(path):
+        dirNames.sort()
+        for fileName in sorted(fileNames):
+            filePath = os.path.join(dirPath, fileName)
+            tokens.append(os.path.relpath(filePath, path))
+            tokens.append(fileDigest(filePath, memoDir))
+    return stringDigest(*tokens)
+
+# exclusive lock on a cache entry, held until release (or the process
+# exits).  a posix lock, so it works across the nodes sharing the cache
+class EntryLock:
+    def __init__(self, entry, blocking=True):
+        self.lockFile = open(os.path.join(entry, ".lock"), "a")
+        flags = fcntl.LOCK_EX
+        if blocking is False:
+            flags |= fcntl.LOCK_NB
+        try:
+            fcntl.lockf(self.lockFile, flags)
+        except IOError:
+            self.lockFile.close()
+            raise
+
+    def release(self):
+        fcntl.lockf(self.lockFile, fcntl.LOCK_UN)
+        self.lockFile.close()
+
+class ResultCache:
+    def __init__(self, cacheDir):
+        self.cacheDir = os.path.abspath(cacheDir)
+        self.memoDir = os.path.join(self.cacheDir, "digests")
+        self.resultsDir = os.path.join(self.cacheDir, "results")
+
+    def getKey(self, config, newickTree, sequences, params):
+        tokens = [ET.tostring(config), newickTree, params.vanilla,
+                  params.kyotoTycoon]
+        for sequence in sequences:
+            tokens.append(sequenceDigest(sequence, self.memoDir))
+        return stringDigest(*tokens)
+
+    def entryPath(self, key):
+        return os.path.join(self.resultsDir, key[:2], key)
+
+    # make outputDir a link to the cache entry for key, creating the
+    # entry if it doesn't exist yet.  a link left over from an earlier
+    # (now stale) configuration is repointed.  a real directory from
+    # before the cache was used is moved aside rather than deleted.
+    # returns the path of the entry
+    def link(self, key, outputDir):
+        entry = self.entryPath(key)
+        makeDirs(entry)
+        if os.path.islink(outputDir):
+            if os.path.realpath(outputDir) == os.path.realpath(entry):
+                return entry
+            os.remove(outputDir)
+        elif os.path.exists(outputDir):
+            asidePath = outputDir + ".uncached"
+            i = 1
+            while os.path.lexists(asidePath):
+                asidePath = "%s.uncached.%d" % (outputDir, i)
+                i += 1
+            os.rename(outputDir, asidePath)
+        os.symlink(entry, outputDir)
+        return entry
+
+    # lock the entry (as returned by link) while aligning into it.  
+    # waits for any other run of the entry to finish, unless blocking
+    # is False, when IOError is raised instead
+    def lock(self, entry, blocking=True):
+        return EntryLock(entry, blocking)
@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+
+#Copyright (C) 2011 by Glenn Hickey
+#
+#Released under the MIT license, see LICENSE.txt
+"""
+"""
+
+import unittest
+import os
+import sys
+import shutil
+import tempfile
+import subprocess
+import xml.etree.ElementTree as ET
+
+from progressiveBenchmarks.src.params import Params
+from progressiveBenchmarks.src.resultCache import ResultCache
+from progressiveBenchmarks.src.resultCache import stringDigest
+from progressiveBenchmarks.src.resultCache import fileDigest
+from progressiveBenchmarks.src.resultCache import sequenceDigest
+from progressiveBenchmarks.src.resultCache import makeDirs
+
+class TestCase(unittest.TestCase):
+
+    def setUp(self):
+        unittest.TestCase.setUp(self)
+        self.tempDir = tempfile.mkdtemp()
+        self.memoDir = os.path.join(self.tempDir, "memo")
+
+    def tearDown(self):
+        unittest.TestCase.tearDown(self)
+        shutil.rmtree(self.tempDir)
+
+    def writeFile(self, path, contents):
+        outFile = open(path, "w")
+        outFile.write(contents)
+        outFile.close()
+        return path
+
+    def testStringDigest(self):
+        assert stringDigest("a", "b") == stringDigest("a", "b")
+        # items are delimited, so they can't run into each other
+        assert stringDigest("ab", "c") != stringDigest("a", "bc")
+
+    def testFileDigestMemo(self):
+        path = self.writeFile(os.path.join(self.tempDir, "seq.fa"), ">a\nACGT\n")
+        digest = fileDigest(path)
+        assert fileDigest(path, self.memoDir) == digest
+        assert len(os.listdir(self.memoDir)) == 1
+        # the memo is used while the size and mtime are unchanged...
+        memoPath = os.path.join(self.memoDir, os.listdir(self.memoDir)[0])
+        stamp = open(memoPath).read().split()[:2]
+        self.writeFile(memoPath, "%s %s remembered\n" % tuple(stamp))
+        assert fileDigest(path, self.memoDir) == "remembered"
+        # ...and not once the file changes
+        self.writeFile(path, ">a\nACGTT\n")
+        assert fileDigest(path, self.memoDir) == fileDigest(path)
+        assert fileDigest(path, self.memoDir) != digest
+        # an existing memo dir is fine
+        makeDirs(self.memoDir)
+
+    def testSequenceDigest(self):
+        seqDir = os.path.join(self.tempDir, "human")
+        os.makedirs(os.path.join(seqDir, "sub"))
+        self.writeFile(os.path.join(seqDir, "chr1.fa"), ">chr1\nACGT\n")
+        self.writeFile(os.path.join(seqDir, "sub", "chr2.fa"), ">chr2\nGG\n")
+        digest = sequenceDigest(seqDir, self.memoDir)
+        assert sequenceDigest(seqDir) == digest
+        # the name of the sequence counts, since cactus names events by it
+        shutil.copytree(seqDir, os.path.join(self.tempDir, "mouse"))
+        assert sequenceDigest(os.path.join(self.tempDir, "mouse")) != digest
+        self.writeFile(os.path.join(seqDir, "sub", "chr2.fa"), ">chr2\nGT\n")
+        assert sequenceDigest(seqDir, self.memoDir) != digest
+        filePath = os.path.join(seqDir, "chr1.fa")
+        assert sequenceDigest(filePath) == stringDigest("chr1.fa", fileDigest(filePath))
+
+    def testKey(self):
+        cache = ResultCache(os.path.join(self.tempDir, "cache"))
+        seqPath = self.writeFile(os.path.join(self.tempDir, "seq.fa"), ">a\nACGT\n")
+        config = ET.fromstring("<config><alignment/></config>")
+        params = Params()
+        key = cache.getKey(config, "(a,b);", [seqPath], params)
+        assert cache.getKey(config, "(a,b);", [seqPath], Params()) == key
+        params.vanilla = True
+        assert cache.getKey(config, "(a,b);", [seqPath], params) != key
+        config.find("alignment").attrib["x"] = "1"
+        assert cache.getKey(config, "(a,b);", [seqPath], Params()) != key
+        assert cache.entryPath(key).startswith(os.path.join(cache.resultsDir, key[:2]))
+
+    def testLink(self):
+        cache = ResultCache(os.path.join(self.tempDir, "cache"))
+        outputDir = os.path.join(self.tempDir, "output")
+        entry = cache.link("aa11", outputDir)
+        assert os.path.isdir(entry)
+        assert os.path.realpath(outputDir) == os.path.realpath(entry)
+        assert cache.link("aa11", outputDir) == entry
+        # a stale link is repointed
+        other = cache.link("bb22", outputDir)
+        assert os.path.realpath(outputDir) == os.path.realpath(other)
+        assert os.path.isdir(entry)
+        # real directories are moved aside, however many there have been
+        for i in xrange(3):
+            os.remove(outputDir)
+            os.mkdir(outputDir)
+            cache.link("aa11", outputDir)
+        assert os.path.isdir(outputDir + ".uncached")
+        assert os.path.isdir(outputDir + ".uncached.1")
+        assert os.path.isdir(outputDir + ".uncached.2")
+
+    def testLock(self):
+        cache = ResultCache(os.path.join(self.tempDir, "cache"))
+        entry = cache.link("aa11", os.path.join(self.tempDir, "output"))
+        # posix locks belong to processes, so try from another one
+        tryLock = [sys.executable, "-c", "import fcntl, sys\n"
+                   "f = open(sys.argv[1], 'a')\n"
+                   "try:\n"
+                   "    fcntl.lockf(f, fcntl.LOCK_EX | fcntl.LOCK_NB)\n"
+                   "except IOError:\n"
+                   "    sys.exit(1)\n", os.path.join(entry, ".lock")]
+        entryLock = cache.lock(entry)
+        assert subprocess.call(tryLock) == 1
+        entryLock.release()
+        assert subprocess.call(tryLock) == 0
+        entryLock = cache.lock(entry, blocking=False)
+        entryLock.release()
+
+def main():
+    unittest.main()
+
+if __name__ == '__main__':
+    main()
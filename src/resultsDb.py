@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+
+#Copyright (C) 2011 by Glenn Hickey
+#
+#Released under the MIT license, see LICENSE.txt
+
+""" sqlite store of the summary statistics of each run, keyed on its
+output directory.  A run is only parsed again when the size or mtime
+of one of its result files (or the summary layout) changes, so the
+summaries of a large output tree can be rewritten cheaply after every
+sweep.  Each run's columns are also kept in a long-form metrics table
+for ad-hoc queries.
+
+"""
+
+import os
+import sqlite3
+import json
+from optparse import OptionParser
+
+from progressiveBenchmarks.src.resultCache import stringDigest
+
+class ResultsDb:
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS runs "
+                                "(path TEXT PRIMARY KEY, signature TEXT, stats TEXT)")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS metrics "
+                                "(path TEXT, name TEXT, value TEXT)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS metricsPath "
+                                "ON metrics (path)")
+
+    # digest of the layout the stats are computed in and the size and
+    # mtime of each of the files they are computed from
+    def signature(self, schema, paths):
+        items = [schema]
+        for path in paths:
+            items.append(path)
+            if path is not None and os.path.exists(path):
+                stat = os.stat(path)
+                items.append("%d %.6f" % (stat.st_size, stat.st_mtime))
+        return stringDigest(*items)
+
+    # stats stored for path, or None if they are missing or stale
+    def lookup(self, path, signature):
+        cursor = self.connection.execute("SELECT signature, stats FROM runs "
+                                         "WHERE path = ?", (path,))
+        result = cursor.fetchone()
+        if result is None or result[0] != signature:
+            return None
+        return json.loads(result[1])
+
+    # columns maps column names to values for the metrics table
+    def store(self, path, signature, stats, columns):
+        self.connection.execute("INSERT OR REPLACE INTO runs VALUES (?, ?, ?)",
+                                (path, signature, json.dumps(stats)))
+        self.connection.execute("DELETE FROM metrics WHERE path = ?", (path,))
+        self.connection.executemany("INSERT INTO metrics VALUES (?, ?, ?)",
+                                    [(path, name, str(value)) for name, value
+                                     in columns.items()])
+
+    def query(self, sql, args=()):
+        return self.connection.execute(sql, args).fetchall()
+
+    def close(self):
+        self.connection.commit()
+        self.connection.close()
+
+def main():
+    usage = "usage: %prog <results db> <sql query>"
+    description = "Print the result of a query on a results database as csv"
+    parser = OptionParser(usage=usage, description=description)
+
+    options, args = parser.parse_args()
+
+    if len(args) != 2:
+        parser.print_help()
+        raise RuntimeError("Wrong number of arguments")
+
+    db = ResultsDb(args[0])
+    for row in db.query(args[1]):
+        print ",".join([str(i) for i in row])
+    db.close()
+
+if __name__ == '__main__':
+    main()
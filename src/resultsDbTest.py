@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+
+#Copyright (C) 2011 by Glenn Hickey
+#
+#Released under the MIT license, see LICENSE.txt
+"""
+"""
+
+import unittest
+import os
+
+from sonLib.bioio import getTempDirectory
+from sonLib.bioio import system
+from progressiveBenchmarks.src.resultsDb import ResultsDb
+
+class TestCase(unittest.TestCase):
+    
+    def setUp(self):
+        unittest.TestCase.setUp(self)
+        self.tempDir = getTempDirectory(os.getcwd())
+        self.statsPath = os.path.join(self.tempDir, "jobTreeStats.xml")
+        statsFile = open(self.statsPath, "w")
+        statsFile.write("<stats total_run_time=\"1\"/>")
+        statsFile.close()
+        self.db = ResultsDb(os.path.join(self.tempDir, "results.db"))
+    
+    def tearDown(self):
+        unittest.TestCase.tearDown(self)
+        self.db.close()
+        system("rm -rf %s" % self.tempDir)
+    
+    def testStoreAndLookup(self):
+        signature = self.db.signature(["Run_Time"], [self.statsPath, None])
+        assert self.db.lookup(self.tempDir, signature) is None
+        stats = [1.0, "", {"human" : "0.9"}]
+        self.db.store(self.tempDir, signature, stats, {"Run_Time" : 1.0})
+        assert self.db.lookup(self.tempDir, signature) == stats
+        rows = self.db.query("SELECT value FROM metrics WHERE name = ?", ("Run_Time",))
+        assert rows == [("1.0",)]
+    
+    def testChangedFileIsStale(self):
+        signature = self.db.signature(["Run_Time"], [self.statsPath])
+        self.db.store(self.tempDir, signature, [1.0], {})
+        assert self.db.signature(["Run_Time", "Clock_Time"], [self.statsPath]) != signature
+        stat = os.stat(self.statsPath)
+        os.utime(self.statsPath, (stat.st_atime, stat.st_mtime + 10))
+        newSignature = self.db.signature(["Run_Time"], [self.statsPath])
+        assert newSignature != signature
+        assert self.db.lookup(self.tempDir, newSignature) is None
+        
+def main():
+    unittest.main()
+
+if __name__ == '__main__':
+    main()
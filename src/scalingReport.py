@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+
+#Copyright (C) 2011 by Glenn Hickey
+#
+#Released under the MIT license, see LICENSE.txt
+
+""" thread scaling of a thread-count ladder of runs.  Runs that only
+differ in their number of threads are grouped, and for the whole run
+and each stage (phase timed by the pipeline) the speedup and efficiency
+over the smallest thread count are computed, along with the serial
+fractions of fitted Amdahl (fixed size) and Gustafson (scaled size)
+models.
+
+"""
+
+from progressiveBenchmarks.src.resourceEstimator import fitLine
+
+# serial fraction s of Amdahl's law, time(n) = time(1) * (s + (1 - s) / n),
+# fit by least squares on 1 / n.  None if there are too few points
+def fitAmdahl(threads, times):
+    if len(set(threads)) < 2:
+        return None
+    serial, parallel = fitLine([1.0 / i for i in threads], times)
+    if serial + parallel <= 0:
+        return None
+    return min(1.0, max(0.0, serial / (serial + parallel)))
+
+# serial fraction s of Gustafson's law, speedup(n) = n - s * (n - 1),
+# fit by least squares through the origin on n - 1
+def fitGustafson(threads, speedups):
+    sxx = sum([(n - 1.0) ** 2 for n in threads])
+    if sxx == 0:
+        return None
+    sxy = sum([(n - 1.0) * (n - s) for n, s in zip(threads, speedups)])
+    return min(1.0, max(0.0, sxy / sxx))
+
+# speedups relative to the run with the fewest threads, assuming it
+# scaled perfectly up to that count
+def speedups(threads, times):
+    base = min(zip(threads, times))
+    return [base[0] * base[1] / max(t, 1e-9) for t in times]
+
+class ScalingReport:
+    def __init__(self):
+        # map of (dataset, group, stage) to list of (threads, time)
+        self.runs = dict()
+        self.order = []
+
+    # stageTimes maps stage name (eg Total or a phase) to wall time.
+    # group names the configuration apart from the thread count
+    def addRun(self, dataset, group, numThreads, stageTimes):
+        for stage, time in stageTimes.items():
+            key = (dataset, group, stage)
+            if key not in self.runs:
+                self.runs[key] = []
+                self.order.append(key)
+            self.runs[key].append((int(numThreads), float(time)))
+
+    # list of (dataset, group, stage, threads, times, speedups,
+    # efficiencies, amdahl serial fraction, gustafson serial fraction)
+    # for every curve with at least two thread counts
+    def getCurves(self):
+        curves = []
+        for key in self.order:
+            points = sorted(self.runs[key])
+            threads = [i[0] for i in points]
+            times = [i[1] for i in points]
+            if len(set(threads)) < 2:
+                continue
+            speedup = speedups(threads, times)
+            efficiency = [s / n for s, n in zip(speedup, threads)]
+            curves.append(key + (threads, times, speedup, efficiency,
+                                 fitAmdahl(threads, times),
+                                 fitGustafson(threads, speedup)))
+        return curves
+
+    def write(self, path):
+        outFile = open(path, "w")
+        outFile.write("Dataset,Params,Stage,Threads,Time,Speedup,Efficiency,"
+                      "Amdahl_Serial,Amdahl_Max_Speedup,Gustafson_Serial\n")
+        for curve in self.getCurves():
+            dataset, group, stage, threads, times, speedup, efficiency, \
+                     amdahl, gustafson = curve
+            maxSpeedup = ""
+            if amdahl is not None and amdahl > 0:
+                maxSpeedup = 1.0 / amdahl
+            elif amdahl is not None:
+                maxSpeedup = "inf"
+            for i in xrange(len(threads)):
+                row = [dataset, group, stage, threads[i], times[i], speedup[i],
+                       efficiency[i], amdahl, maxSpeedup, gustafson]
+                outFile.write("%s\n" % ",".join(["" if j is None else str(j)
+                                                 for j in row]))
+        outFile.close()
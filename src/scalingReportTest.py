@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+
+#Copyright (C) 2011 by Glenn Hickey
+#
+#Released under the MIT license, see LICENSE.txt
+"""
+"""
+
+import unittest
+
+from progressiveBenchmarks.src.scalingReport import fitAmdahl
+from progressiveBenchmarks.src.scalingReport import fitGustafson
+from progressiveBenchmarks.src.scalingReport import ScalingReport
+
+class TestCase(unittest.TestCase):
+    
+    def amdahlTime(self, serial, n):
+        return 100.0 * (serial + (1.0 - serial) / n)
+    
+    def testFits(self):
+        threads = [1, 2, 4, 8]
+        times = [self.amdahlTime(0.1, n) for n in threads]
+        assert abs(fitAmdahl(threads, times) - 0.1) < 1e-9
+        assert fitAmdahl([4, 4], [1.0, 2.0]) is None
+        speedups = [n - 0.25 * (n - 1) for n in threads]
+        assert abs(fitGustafson(threads, speedups) - 0.25) < 1e-9
+    
+    def testCurves(self):
+        report = ScalingReport()
+        for n in [4, 1, 2]:
+            report.addRun("blanchette0", "_ogGreedy", n, 
+                          {"Total" : self.amdahlTime(0.0, n),
+                           "RunBlast" : 10.0})
+        report.addRun("blanchette0", "_ogNone", 1, {"Total" : 50.0})
+        curves = report.getCurves()
+        assert len(curves) == 2
+        total = [i for i in curves if i[2] == "Total"][0]
+        assert total[3] == [1, 2, 4]
+        assert [round(i, 9) for i in total[5]] == [1.0, 2.0, 4.0]
+        assert [round(i, 9) for i in total[6]] == [1.0, 1.0, 1.0]
+        assert abs(total[7]) < 1e-9
+        blast = [i for i in curves if i[2] == "RunBlast"][0]
+        assert abs(blast[7] - 1.0) < 1e-9
+        
+def main():
+    unittest.main()
+
+if __name__ == '__main__':
+    main()
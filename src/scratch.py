@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+
+#Copyright (C) 2011 by Glenn Hickey
+#
+#Released under the MIT license, see LICENSE.txt
+
+""" node-local scratch space (a local disk or tmpfs) for the tokyo
+cabinet database and jobTree of a run, which cactus reads and writes
+at random and so is slowed down a lot by network storage.  The scratch
+directory of a run is only used if it has enough free space, and once
+the run is done its contents are moved back to the output directory
+and the paths in its xml pointed at their new place.
+
+"""
+
+import os
+
+from progressiveBenchmarks.src.resultCache import stringDigest
+from progressiveBenchmarks.src.execution import removePath
+
+# bytes free to an unprivileged user on the file system of path
+def freeSpace(path):
+    stat = os.statvfs(path)
+    return stat.f_bavail * stat.f_frsize
+
+# type of the file system path is on (eg tmpfs, ext4, nfs), from the
+# mount with the longest matching mount point, or "" if unknown
+def fileSystemType(path, mountsPath="/proc/mounts"):
+    path = os.path.realpath(path)
+    best = ("", "")
+    try:
+        mounts = open(mountsPath)
+    except IOError:
+        return ""
+    for line in mounts:
+        fields = line.split()
+        if len(fields) < 3:
+            continue
+        mountPoint = fields[1].replace("\\040", " ")
+        if (path == mountPoint or
+            path.startswith(mountPoint.rstrip("/") + "/")) and \
+            len(mountPoint) >= len(best[0]):
+            best = (mountPoint, fields[2])
+    mounts.close()
+    return best[1]
+
+# where (eg scratch or output) and on what type of file system path
+# is, as recorded in the summary
+def describePlacement(where, path):
+    return "%s:%s" % (where, fileSystemType(path))
+
+# an empty scratch directory under scratchRoot for the run writing to
+# outputDir, or None if scratchRoot has less than requiredBytes free.
+# the name only depends on outputDir, so a second attempt at the run on
+# the same node starts afresh
+def makeScratchDir(scratchRoot, outputDir, requiredBytes):
+    if freeSpace(scratchRoot) < requiredBytes:
+        return None
+    scratchDir = os.path.join(os.path.abspath(scratchRoot), "progressiveBenchmarks_%s" %
+                              stringDigest(os.path.abspath(outputDir)))
+    removePath(scratchDir)
+    os.mkdir(scratchDir)
+    return scratchDir
+
+# where to put the database and jobTree of a run (Params params) whose
+# temporary files otherwise go in tempLocalDir.  the database goes in a
+# scratch directory under scratchRoot (and the jobTree too if
+# scratchJobTree) unless scratchRoot is None, the run uses kyoto tycoon
+# (whose database lives in its server) or there are less than
+# requiredBytes free.  returns (scratch directory or None, directory for
+# the database, directory for the jobTree, map of database and jobTree
+# to their placement for the summary)
+def placeRun(params, outputDir, tempLocalDir, scratchRoot, scratchJobTree=False,
+             requiredBytes=0):
+    scratchDir = None
+    if scratchRoot is not None and params.kyotoTycoon != True:
+        scratchDir = makeScratchDir(scratchRoot, outputDir, requiredBytes)
+    dbDir = tempLocalDir
+    jobTreeDir = tempLocalDir
+    if scratchDir is not None:
+        dbDir = scratchDir
+        if scratchJobTree is True:
+            jobTreeDir = scratchDir
+    placement = dict()
+    for name, path in [("database", dbDir), ("jobTree", jobTreeDir)]:
+        if path == scratchDir:
+            placement[name] = describePlacement("scratch", path)
+        else:
+            placement[name] = describePlacement("output", path)
+    return scratchDir, dbDir, jobTreeDir, placement
+
+# replace oldPrefix with newPrefix in the xml file path, or every xml
+# file under the directory path.  each file is replaced in one rename
+def rewritePaths(path, oldPrefix, newPrefix):
+    if os.path.isdir(path):
+        for dirPath, dirNames, fileNames in os.walk(path):
+            for fileName in fileNames:
+                if fileName.endswith(".xml"):
+                    rewritePaths(os.path.join(dirPath, fileName), oldPrefix,
+                                 newPrefix)
+        return
+    inFile = open(path)
+    text = inFile.read()
+    inFile.close()
+    if oldPrefix not in text:
+        return
+    tempPath = "%s.%d.tmp" % (path, os.getpid())
+    outFile = open(tempPath, "w")
+    outFile.write(text.replace(oldPrefix, newPrefix))
+    outFile.close()
+    os.rename(tempPath, path)
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+
+#Copyright (C) 2011 by Glenn Hickey
+#
+#Released under the MIT license, see LICENSE.txt
+"""
+"""
+
+import unittest
+import os
+import shutil
+import tempfile
+
+from progressiveBenchmarks.src.scratch import fileSystemType
+from progressiveBenchmarks.src.scratch import describePlacement
+from progressiveBenchmarks.src.scratch import makeScratchDir
+from progressiveBenchmarks.src.scratch import rewritePaths
+from progressiveBenchmarks.src.scratch import placeRun
+from progressiveBenchmarks.src.params import Params
+
+class TestCase(unittest.TestCase):
+    
+    def setUp(self):
+        unittest.TestCase.setUp(self)
+        self.tempDir = tempfile.mkdtemp()
+    
+    def tearDown(self):
+        unittest.TestCase.tearDown(self)
+        shutil.rmtree(self.tempDir)
+    
+    def writeFile(self, path, contents):
+        outFile = open(path, "w")
+        outFile.write(contents)
+        outFile.close()
+    
+    def testFileSystemType(self):
+        mountsPath = os.path.join(self.tempDir, "mounts")
+        self.writeFile(mountsPath, "rootfs / ext4 rw 0 0\n"
+                       "tmpfs /dev/shm tmpfs rw 0 0\n"
+                       "server:/home /home nfs rw 0 0\n")
+        assert fileSystemType("/dev/shm/run", mountsPath) == "tmpfs"
+        assert fileSystemType("/home/me", mountsPath) == "nfs"
+        assert fileSystemType("/homework", mountsPath) == "ext4"
+        assert fileSystemType("/", mountsPath) == "ext4"
+        assert fileSystemType("/", os.path.join(self.tempDir, "missing")) == ""
+        assert describePlacement("scratch", self.tempDir).startswith("scratch:")
+    
+    def testMakeScratchDir(self):
+        outputDir = os.path.join(self.tempDir, "output")
+        scratchDir = makeScratchDir(self.tempDir, outputDir, 0)
+        assert os.path.isdir(scratchDir)
+        self.writeFile(os.path.join(scratchDir, "leftOver"), "")
+        # a second attempt at the run gets the same, emptied, directory
+        assert makeScratchDir(self.tempDir, outputDir, 0) == scratchDir
+        assert os.listdir(scratchDir) == []
+        assert makeScratchDir(self.tempDir, os.path.join(self.tempDir, "other"), 
+                              0) != scratchDir
+        assert makeScratchDir(self.tempDir, outputDir, 2**70) is None
+    
+    def testPlaceRun(self):
+        outputDir = os.path.join(self.tempDir, "output")
+        tempLocalDir = os.path.join(outputDir, "temp")
+        # a default params (kyotoTycoon None) uses scratch
+        params = Params()
+        scratchDir, dbDir, jobTreeDir, placement = placeRun(params, outputDir, 
+                                                            tempLocalDir, self.tempDir)
+        assert scratchDir is not None and os.path.isdir(scratchDir)
+        assert dbDir == scratchDir
+        assert jobTreeDir == tempLocalDir
+        assert placement["database"].startswith("scratch:")
+        assert placement["jobTree"].startswith("output:")
+        scratchDir, dbDir, jobTreeDir, placement = placeRun(params, outputDir, 
+                                                            tempLocalDir, self.tempDir,
+                                                            scratchJobTree=True)
+        assert jobTreeDir == scratchDir
+        assert placement["jobTree"].startswith("scratch:")
+        
+        # not without a scratch root, with kyoto tycoon or without the space
+        for kyotoTycoon, scratchRoot, requiredBytes in [(None, None, 0),
+                                                        (True, self.tempDir, 0),
+                                                        (None, self.tempDir, 2**70)]:
+            params.kyotoTycoon = kyotoTycoon
+            scratchDir, dbDir, jobTreeDir, placement = placeRun(params, outputDir,
+                                                                tempLocalDir, scratchRoot, 
+                                                                True, requiredBytes)
+            assert scratchDir is None
+            assert dbDir == tempLocalDir and jobTreeDir == tempLocalDir
+            assert placement["database"].startswith("output:")
+    
+    def testRewritePaths(self):
+        projectDir = os.path.join(self.tempDir, "project")
+        os.makedirs(os.path.join(projectDir, "Anc0"))
+        expPath = os.path.join(projectDir, "Anc0", "Anc0_experiment.xml")
+        self.writeFile(expPath, "<exp><tokyo_cabinet database_dir=\"/scratch/x/project/Anc0\"/>"
+                       "<ref path=\"/scratch/x/project/Anc0/Anc0.fa\"/></exp>")
+        mafPath = os.path.join(projectDir, "Anc0", "Anc0.maf")
+        self.writeFile(mafPath, "/scratch/x/project\n")
+        rewritePaths(projectDir, "/scratch/x/project", "/out/temp/project")
+        assert open(expPath).read() == "<exp><tokyo_cabinet database_dir=" \
+               "\"/out/temp/project/Anc0\"/><ref path=\"/out/temp/project/Anc0/Anc0.fa\"/></exp>"
+        assert open(mafPath).read() == "/scratch/x/project\n"
+        assert sorted(os.listdir(os.path.join(projectDir, "Anc0"))) == \
+               ["Anc0.maf", "Anc0_experiment.xml"]
+
+def main():
+    unittest.main()
+
+if __name__ == '__main__':
+    main()
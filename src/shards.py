@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+
+#Copyright (C) 2011 by Glenn Hickey
+#
+#Released under the MIT license, see LICENSE.txt
+
+""" deterministic partitioning of a sweep's (test category x params)
+work items into shards, so that each shard can be run as its own
+jobTree on a different node or cluster.  An item is assigned by a
+digest of its output name, so the partition doesn't depend on the
+order of generation, the python version or the machine.
+
+"""
+
+import hashlib
+
+class Shard:
+    def __init__(self, index, count):
+        if count < 1 or index < 0 or index >= count:
+            raise RuntimeError("Invalid shard %d/%d" % (index, count))
+        self.index = index
+        self.count = count
+
+    # parse the i/N notation of the --shard option
+    @staticmethod
+    def fromString(string):
+        try:
+            index, count = [int(i) for i in string.split("/")]
+        except ValueError:
+            raise RuntimeError("Shard must be given as i/N, not %s" % string)
+        return Shard(index, count)
+
+    def contains(self, testCategory, params):
+        name = testCategory.name + str(params)
+        digest = int(hashlib.md5(name).hexdigest(), 16)
+        return digest % self.count == self.index
+
+    def __str__(self):
+        return "%d/%d" % (self.index, self.count)
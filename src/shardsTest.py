@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+
+#Copyright (C) 2011 by Glenn Hickey
+#
+#Released under the MIT license, see LICENSE.txt
+"""
+"""
+
+import unittest
+
+from progressiveBenchmarks.src.params import Params
+from progressiveBenchmarks.src.paramsGenerator import AllProgressive
+from progressiveBenchmarks.src.shards import Shard
+
+# stands in for the test categories of the pipeline, which are only
+# looked at for their name
+class Category:
+    def __init__(self, name):
+        self.name = name
+
+class TestCase(unittest.TestCase):
+
+    def setUp(self):
+        unittest.TestCase.setUp(self)
+        self.categories = [Category(i) for i in ["Blanchette", "EvolverPrimatesLoci1",
+                                                 "EvolverMammalsLoci1"]]
+
+    def items(self):
+        return [(c, p) for c in self.categories for p in AllProgressive().generate()]
+
+    def testEachItemInOneShard(self):
+        items = self.items()
+        for count in [1, 2, 3, 8]:
+            shards = [Shard(i, count) for i in xrange(count)]
+            sizes = [0] * count
+            for category, params in items:
+                owners = [s.index for s in shards if s.contains(category, params)]
+                assert len(owners) == 1
+                sizes[owners[0]] += 1
+            assert sum(sizes) == len(items)
+            if count > 1:
+                # not everything piles up in one shard
+                assert max(sizes) < len(items)
+
+    def testStable(self):
+        shard = Shard(2, 5)
+        first = [shard.contains(c, p) for c, p in self.items()]
+        # freshly generated params, in another order
+        items = self.items()
+        items.reverse()
+        second = [shard.contains(c, p) for c, p in items]
+        second.reverse()
+        assert first == second
+        # fixed by the digest of the name, not the run or the machine
+        assert Shard(6, 7).contains(Category("Blanchette"), Params())
+
+    def testFromString(self):
+        shard = Shard.fromString("3/4")
+        assert (shard.index, shard.count) == (3, 4)
+        assert str(shard) == "3/4"
+        for string in ["4/4", "1/0", "-1/2", "1", "a/b"]:
+            self.assertRaises(RuntimeError, Shard.fromString, string)
+
+def main():
+    unittest.main()
+
+if __name__ == '__main__':
+    main()
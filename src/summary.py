@@ -13,9 +13,13 @@ import os
 import xml.etree.ElementTree as ET
 import sys
 import copy
+import math
+import warnings
 
 from optparse import OptionParser
 from progressiveBenchmarks.src.params import Params
+from progressiveBenchmarks.src.instrumentation import readPhases
+from progressiveBenchmarks.src.instrumentation import readContext
 from cactus.progressive.multiCactusProject import MultiCactusProject
 from cactus.progressive.multiCactusTree import MultiCactusTree
 from cactus.progressive.experimentWrapper import ExperimentWrapper
@@ -25,35 +29,100 @@ class Summary:
     ["Run_Time", "Clock_Time", "Base_tot_run", "Base_tot_clock", \
      "Core_tot_run", "Core_tot_clock", "RefCoord_tot_run", 
      "RefCoord_tot_clock", "SelfBlast_tot_run", "SelfBlast_tot_clock",\
-     "Blast_tot_run", "Blast_tot_clcok",\
+     "Blast_tot_run", "Blast_tot_clcok", "Unaccounted_Clock", \
+     "CP_Path", "CP_Time", "CP_Fraction", "CP_Tail", "Parallelism", \
+     "Par_Efficiency", "DB_Placement", "JobTree_Placement", \
      "Sensitivity", "Specificity", "Bal. Accuracy", \
+     "Sens_CI", "Spec_CI", "Species_CI", \
      "Root Growth", "Avg Growth", "BBL_Min", "BBL_Max", "BBL_Avg", "TGS_Min", \
      "TGS_Max", "TGS_Avg"]
     SensIdx = len(Header)
     SpecIdx = SensIdx + 1 
-    def __init__(self):
+    TargetTypesIdx = SpecIdx + 1
+    # target types of the fixed Base_ to Blast_ columns (total time then
+    # total clock of each), which are kept, misspelling and all, for the
+    # scripts that read them.  the same values are also in the per 
+    # target type columns
+    FixedTargetTypes = ["CactusBaseLevelAlignerWrapper", "CactusCoreWrapper",
+                        "CactusSetReferenceCoordinates", "RunSelfBlast", "RunBlast"]
+    # (column suffix, jobTreeStats attribute) reported for every
+    # target type
+    TargetTypeStats = [("tot_time", "total_time"), ("med_time", "median_time"),
+                       ("max_time", "max_time"), ("tot_clock", "total_clock"),
+                       ("med_clock", "median_clock"), ("max_clock", "max_clock"),
+                       ("count", "total_number"), ("max_mem", "max_memory")]
+    # phases timed outside cactus, from phaseTimes.json, and the 
+    # (column suffix, phase record key) reported for each
+    PhasesIdx = TargetTypesIdx + 1
+    PhaseStats = [("wall", "wall"), ("cpu", "cpu"), ("child_cpu", "child_cpu"),
+                  ("peak_rss_kb", "peak_rss_kb")]
+    # stats of runs already parsed are read back from the ResultsDb
+    # db, if one is given
+    def __init__(self, db=None):
         self.table = []
+        self.names = []
+        self.params = []
+        self.db = db
 
     def addRow(self, catName, params, jobTreeStatsPath, mafCompPath, 
-               treeStatsPath, projPath):
+               treeStatsPath, projPath, criticalPathPath=None, phaseTimesPath=None):
         if os.path.isfile(jobTreeStatsPath) and os.path.isfile(mafCompPath) \
            and os.path.isfile(treeStatsPath):
-            mafXmlRoot = ET.parse(mafCompPath).getroot()
-            jtXmlRoot = ET.parse(jobTreeStatsPath).getroot()
-            tsXmlRoot = ET.parse(treeStatsPath).getroot()
-            if projPath is not None:
-                project = MultiCactusProject()
-                project.readXML(projPath)
-            else:
-                project = None
+            stats = None
+            if self.db is not None:
+                runPath = os.path.dirname(os.path.abspath(jobTreeStatsPath))
+                schema = self.Header + [i[0] for i in self.TargetTypeStats] + \
+                         [i[0] for i in self.PhaseStats]
+                signature = self.db.signature(schema, [jobTreeStatsPath, 
+                                              mafCompPath, treeStatsPath, projPath,
+                                              criticalPathPath, phaseTimesPath])
+                stats = self.db.lookup(runPath, signature)
+            if stats is None:
+                stats = self.__runStats(jobTreeStatsPath, mafCompPath, 
+                                        treeStatsPath, projPath, criticalPathPath,
+                                        phaseTimesPath)
+                if self.db is not None:
+                    self.db.store(runPath, signature, stats, self.__statsColumns(stats))
             row = params.asRow()
-            row.extend(self.__jtStats(jtXmlRoot))
-            row.extend(self.__totalAggregate(mafXmlRoot))
-            row.extend(self.__growthStats(project))
-            row.extend(self.__cactusTreeStats(tsXmlRoot))
-            row.extend(self.__speciesAggregate(mafXmlRoot))
-            rowstring = str(row)
+            row.extend(stats)
             self.table.append(row)
+            self.names.append(catName)
+            self.params.append(params)
+    
+    # the columns of a row that come from the result files of a run
+    def __runStats(self, jobTreeStatsPath, mafCompPath, treeStatsPath, projPath,
+                   criticalPathPath, phaseTimesPath):
+        if projPath is not None:
+            project = MultiCactusProject()
+            project.readXML(projPath)
+        else:
+            project = None
+        totalAggregate, speciesAggregate = self.__comparisonStats(mafCompPath)
+        jtStats, targetTypes = self.__jtStats(jobTreeStatsPath)
+        stats = []
+        stats.extend(jtStats)
+        stats.extend(self.__criticalPathStats(criticalPathPath))
+        stats.extend(self.__placementStats(phaseTimesPath))
+        stats.extend(totalAggregate)
+        stats.extend(self.__growthStats(project))
+        stats.extend(self.__cactusTreeStats(treeStatsPath))
+        stats.extend(speciesAggregate)
+        stats.append(targetTypes)
+        stats.append(self.__phaseStats(phaseTimesPath))
+        return stats
+    
+    # map of column name to value of the stats of a run
+    def __statsColumns(self, stats):
+        columns = dict(zip(self.Header[len(Params.Header):], stats[:-4]))
+        for name, value in stats[-4].items():
+            columns["%s_sens" % name] = value
+        for name, value in stats[-3].items():
+            columns["%s_spec" % name] = value
+        for group in stats[-2:]:
+            for name, values in group.items():
+                for suffix, value in values.items():
+                    columns["%s_%s" % (name, suffix)] = value
+        return columns
     
     def addEmptyLine(self):
         row = self.getRows().next()
@@ -61,6 +130,8 @@ class Summary:
         for i in xrange(len(row)):
             emptyRow.append("")
         self.table.append(emptyRow)
+        self.names.append("")
+        self.params.append(None)
         
     def write(self, path):
         if len(self.table) > 0:
@@ -80,66 +151,142 @@ class Summary:
                 rowString += "%s," % str(rowAsList[col])
         return "%s\n" % rowString[:len(rowString)-1] 
     
-    def __pairTests(self, xmlRoot, i):
-        assert i == 0 or i == 1
-        homologyTest = xmlRoot.findall("homologyTests")[i]
-        pairTests = homologyTest.find("homologyPairTests")
-        for test in pairTests.findall("homologyTest"):
-            yield test
+    # stream the elements of an xml file, yielding (ancestors, element)
+    # once each element has been read.  ancestors is the list of open
+    # elements from the root down, which still have their attributes.
+    # elements are cleared and removed from their parent once yielded,
+    # so memory is bounded by the depth of the file rather than its size
+    def __iterElements(self, path):
+        ancestors = []
+        for event, elem in ET.iterparse(path, events=("start", "end")):
+            if event == "start":
+                ancestors.append(elem)
+            else:
+                ancestors.pop()
+                yield ancestors, elem
+                elem.clear()
+                if len(ancestors) > 0:
+                    ancestors[-1].remove(elem)
     
-    # returns [map of species names to aggregate sensitivity, 
-    #          map of species names to aggregate specificity]
-    def __speciesAggregate(self, xmlRoot):
-        results = [dict(), dict()]
-        for i in [0,1]:
-            for test in self.__pairTests(xmlRoot, i):
+    # width of the confidence interval of an aggregate, if the 
+    # comparator reported one
+    def __ciWidth(self, aggElem):
+        if "ciLow" in aggElem.attrib and "ciHigh" in aggElem.attrib:
+            return float(aggElem.attrib["ciHigh"]) - float(aggElem.attrib["ciLow"])
+        return ""
+    
+    # read the maf comparison in one pass. returns 
+    # [[sensitivity, specificity, balanced accuracy, 
+    #   sensitivity ci width, specificity ci width, widest per species ci],
+    #  [map of species names to aggregate sensitivity, 
+    #   map of species names to aggregate specificity]]
+    def __comparisonStats(self, mafCompPath):
+        results = []
+        widths = []
+        species = [dict(), dict()]
+        speciesWidths = []
+        # index of the homologyTests being read
+        i = 0
+        for ancestors, elem in self.__iterElements(mafCompPath):
+            tags = [x.tag for x in ancestors[1:]] + [elem.tag]
+            if tags == ["homologyTests"]:
+                i += 1
+            elif tags == ["homologyTests", "aggregateResults", "all"]:
+                results.append(float(elem.attrib["average"]))
+                widths.append(self.__ciWidth(elem))
+            elif tags == ["homologyTests", "homologyPairTests", "homologyTest",
+                          "aggregateResults", "all"]:
+                test = ancestors[3]
+                assert i == 0 or i == 1
                 if test.attrib["sequenceB"] == "aggregate":
-                    name = test.attrib["sequenceA"]
-                    agg = test.find("aggregateResults").find("all")
-                    val = agg.attrib["average"]
-                    results[i][name] = val
+                    species[i][test.attrib["sequenceA"]] = elem.attrib["average"]
                 elif test.attrib["sequenceA"] == "aggregate":
-                    name = test.attrib["sequenceB"]
-                    agg = test.find("aggregateResults").find("all")
-                    val = agg.attrib["average"]
-                    results[i][name] = val
-        return results            
-        
-    # returns [sensitivity, specificity]
-    def __totalAggregate(self, xmlRoot):
-        homologyTests = xmlRoot.findall("homologyTests")
-        assert len(homologyTests) == 2
-        results = []
-        for ht in homologyTests:
-            agg = ht.find("aggregateResults").find("all")
-            results.append(float(agg.attrib["average"]))
+                    species[i][test.attrib["sequenceB"]] = elem.attrib["average"]
+                else:
+                    continue
+                width = self.__ciWidth(elem)
+                if width != "":
+                    speciesWidths.append(width)
+        assert len(results) == 2
         acc = (results[-1] + results[-2]) / 2
         results.append(acc)
+        results.extend(widths)
+        if len(speciesWidths) > 0:
+            results.append(max(speciesWidths))
+        else:
+            results.append("")
+        return [results, species]
+        
+    # returns [[total run time, total clock, times of the 
+    #           FixedTargetTypes, clock not accounted for by any target
+    #           type],
+    #          map of target type to map of TargetTypeStats suffix to 
+    #          value]
+    def __jtStats(self, jobTreeStatsPath):
+        targetTypes = dict()
+        typesClock = None
+        for ancestors, elem in self.__iterElements(jobTreeStatsPath):
+            if len(ancestors) == 0:
+                jtRow = [float(elem.attrib["total_run_time"]), 
+                         float(elem.attrib["total_clock"])]
+            elif len(ancestors) == 2 and ancestors[1].tag == "target_types":
+                targetTypes[elem.tag] = dict()
+                for suffix, attribute in self.TargetTypeStats:
+                    if attribute in elem.attrib:
+                        targetTypes[elem.tag][suffix] = elem.attrib[attribute]
+                if "total_clock" in elem.attrib:
+                    typesClock = float(elem.attrib["total_clock"]) + (typesClock or 0.0)
+        for targetType in self.FixedTargetTypes:
+            for suffix in ["tot_time", "tot_clock"]:
+                jtRow.append(targetTypes.get(targetType, dict()).get(suffix, ""))
+        if typesClock is not None:
+            jtRow.append(jtRow[1] - typesClock)
+        else:
+            jtRow.append("")
+        return [jtRow, targetTypes]
+    
+    # returns [subproblems on the critical path, critical path time, 
+    #          fraction of the wall time on it, time after the root 
+    #          subproblem, parallelism, parallel efficiency] 
+    # from criticalPath.xml, if the run has one
+    def __criticalPathStats(self, criticalPathPath):
+        if criticalPathPath is None or not os.path.isfile(criticalPathPath):
+            return ["", "", "", "", "", ""]
+        attrib = ET.parse(criticalPathPath).getroot().attrib
+        results = [attrib.get("path", ""), attrib.get("path_time", "")]
+        if "path_time" in attrib and float(attrib["wall_time"]) > 0:
+            results.append(float(attrib["path_time"]) / float(attrib["wall_time"]))
+        else:
+            results.append("")
+        results.append(attrib.get("tail_time", ""))
+        results.append(attrib["parallelism"])
+        results.append(attrib["efficiency"])
         return results
     
-    def __getElemAtt(self, node, elemName, attributeName, default=""):
-            elem = node.find(elemName)
-            if elem is not None:
-                if attributeName in elem.attrib:
-                    return elem.attrib[attributeName]
-            return default
-        
-    # returns the total run time  
-    def __jtStats(self, xmlRoot):       
-        jtRow = [float(xmlRoot.attrib["total_run_time"]), 
-                float(xmlRoot.attrib["total_clock"])]
-        ttElem = xmlRoot.find("target_types")
-        jtRow.append(self.__getElemAtt(ttElem, "CactusBaseLevelAlignerWrapper", "total_time"))
-        jtRow.append(self.__getElemAtt(ttElem, "CactusBaseLevelAlignerWrapper", "total_clock"))
-        jtRow.append(self.__getElemAtt(ttElem, "CactusCoreWrapper", "total_time"))
-        jtRow.append(self.__getElemAtt(ttElem, "CactusCoreWrapper", "total_clock"))
-        jtRow.append(self.__getElemAtt(ttElem, "CactusSetReferenceCoordinates", "total_time"))
-        jtRow.append(self.__getElemAtt(ttElem, "CactusSetReferenceCoordinates", "total_clock"))
-        jtRow.append(self.__getElemAtt(ttElem, "RunSelfBlast", "total_time"))
-        jtRow.append(self.__getElemAtt(ttElem, "RunSelfBlast", "total_clock"))
-        jtRow.append(self.__getElemAtt(ttElem, "RunBlast", "total_time"))
-        jtRow.append(self.__getElemAtt(ttElem, "RunBlast", "total_clock"))
-        return jtRow
+    # returns [where the database was, where the jobTree was], as
+    # recorded with the phase times, eg scratch:tmpfs or output:nfs
+    def __placementStats(self, phaseTimesPath):
+        if phaseTimesPath is None or not os.path.isfile(phaseTimesPath):
+            return ["", ""]
+        context = readContext(phaseTimesPath)
+        return [context.get("database", ""), context.get("jobTree", "")]
+    
+    # returns map of Phase_<phase> to map of PhaseStats suffix to value,
+    # with the times of phases run more than once added up
+    def __phaseStats(self, phaseTimesPath):
+        results = dict()
+        if phaseTimesPath is None or not os.path.isfile(phaseTimesPath):
+            return results
+        for phase in readPhases(phaseTimesPath):
+            values = results.setdefault("Phase_%s" % phase["name"], dict())
+            for suffix, key in self.PhaseStats:
+                if phase[key] is None:
+                    continue
+                if suffix == "peak_rss_kb":
+                    values[suffix] = max(values.get(suffix, 0), phase[key])
+                else:
+                    values[suffix] = values.get(suffix, 0.0) + phase[key]
+        return results
     
     # give some stats on how the reference geneomes grow:
     # root growth: ratio of root to biggest leaf
@@ -180,18 +327,22 @@ class Summary:
     # get some stats on the cactus graph structure 
     # bbl = <chains><base_block_lengths >
     # tgs = <terminal_group_sizes>
-    def __cactusTreeStats(self, treeStatsXmlRoot):
+    def __cactusTreeStats(self, treeStatsPath):
+        bbl = None
+        tgs = None
+        for ancestors, elem in self.__iterElements(treeStatsPath):
+            tags = [i.tag for i in ancestors[1:]] + [elem.tag]
+            if tags == ["chains", "base_block_lengths"]:
+                bbl = dict(elem.attrib)
+            elif tags == ["terminal_group_sizes"]:
+                tgs = dict(elem.attrib)
         results = []
-        chains = treeStatsXmlRoot.find("chains")
-        bbl = chains.find("base_block_lengths")
-        results.append(bbl.attrib["min"])
-        results.append(bbl.attrib["max"])
-        results.append(bbl.attrib["avg"])
-        
-        tgs = treeStatsXmlRoot.find("terminal_group_sizes")
-        results.append(tgs.attrib["min"])
-        results.append(tgs.attrib["max"])
-        results.append(tgs.attrib["avg"])
+        results.append(bbl["min"])
+        results.append(bbl["max"])
+        results.append(bbl["avg"])
+        results.append(tgs["min"])
+        results.append(tgs["max"])
+        results.append(tgs["avg"])
         return results
                         
     # return boolean vector identifying empty columns
@@ -208,6 +359,21 @@ class Summary:
                 colNum +=1
         return ec
     
+    # target type (or phase) columns of all the rows, since the stages
+    # that are run differ (eg between vanilla and progressive)
+    # returns a list of (index in the row, target type, suffix)
+    def __groupedColumns(self):
+        columns = []
+        for idx, stats in [(self.TargetTypesIdx, self.TargetTypeStats),
+                           (self.PhasesIdx, self.PhaseStats)]:
+            names = set()
+            for entry in self.table:
+                names.update(entry[idx].keys())
+            for name in sorted(names):
+                for suffix, key in stats:
+                    columns.append((idx, name, suffix))
+        return columns
+        
     def getHeader(self):
         assert len(self.table) > 0
         row = self.table[0]
@@ -220,9 +386,12 @@ class Summary:
         for i in species:
             header.append("%s_sens" % i)
             header.append("%s_spec" % i)
+        for idx, name, suffix in self.__groupedColumns():
+            header.append("%s_%s" % (name, suffix))
         return header
     
     def getRows(self):
+        groupedColumns = self.__groupedColumns()
         for entry in self.table:
             row = entry[:self.SensIdx]
             species = []
@@ -234,8 +403,132 @@ class Summary:
             for i in species:
                 row.append(entry[self.SensIdx][i])
                 row.append(entry[self.SpecIdx][i])
+            for idx, name, suffix in groupedColumns:
+                row.append(entry[idx].get(name, dict()).get(suffix, ""))
             yield row
     
+    # iterate (name, row) with each row as a dictionary keyed on header
+    def getRowDicts(self):
+        if len(self.table) > 0:
+            header = self.getHeader()
+            for name, row in zip(self.names, self.getRows()):
+                yield name, dict(zip(header, row))
+    
+    # the columns after the params as a float array with a row for each
+    # params and nan for empty values.  returns (column names, 
+    # str(params) of each row, array)
+    def getMatrix(self):
+        #Only the repeat aggregation needs numpy, so keep it optional
+        import numpy as np
+        header = self.getHeader()[len(Params.Header):]
+        keys = []
+        values = []
+        for params, row in zip(self.params, self.getRows()):
+            if params is not None:
+                keys.append(str(params))
+                values.append([toFloat(i) for i in row[len(Params.Header):]])
+        matrix = np.array(values, dtype=float).reshape(len(keys), len(header))
+        return header, keys, matrix
+    
+    # mean, standard deviation, min, max and count of each column of 
+    # each params across several summaries (eg the blanchette repeats).
+    # rows and columns are matched by name, so runs missing from some
+    # summaries only count the ones they are in.  returns (column names,
+    # str(params) of each row, map of statistic name to array)
+    @staticmethod
+    def aggregateRepeats(summaries):
+        import numpy as np
+        matrices = [i.getMatrix() for i in summaries if len(i.table) > 0]
+        header = []
+        keys = []
+        for columns, rows, matrix in matrices:
+            header.extend([i for i in columns if i not in header])
+            keys.extend([i for i in rows if i not in keys])
+        colIdx = dict([(name, i) for i, name in enumerate(header)])
+        keyIdx = dict([(name, i) for i, name in enumerate(keys)])
+        cube = np.empty((len(matrices), len(keys), len(header)))
+        cube.fill(np.nan)
+        for i, (columns, rows, matrix) in enumerate(matrices):
+            index = np.ix_([keyIdx[j] for j in rows], [colIdx[j] for j in columns])
+            cube[i][index] = matrix
+        stats = dict()
+        with warnings.catch_warnings():
+            # all nan slices are expected (empty columns, single repeats)
+            warnings.simplefilter("ignore", RuntimeWarning)
+            stats["mean"] = np.nanmean(cube, axis=0)
+            stats["std"] = np.nanstd(cube, axis=0, ddof=1)
+            stats["min"] = np.nanmin(cube, axis=0)
+            stats["max"] = np.nanmax(cube, axis=0)
+        stats["count"] = np.sum(~np.isnan(cube), axis=0).astype(float)
+        return header, keys, stats
+
+    # write the output of aggregateRepeats as csv, with a row for each
+    # params and statistic
+    @staticmethod
+    def writeAggregate(path, aggregate):
+        header, keys, stats = aggregate
+        if len(keys) > 0:
+            outFile = open(path, "w")
+            outFile.write(",".join(["Params", "Statistic"] + header) + "\n")
+            for i, key in enumerate(keys):
+                for name in ["mean", "std", "min", "max", "count"]:
+                    values = ["" if math.isnan(x) else repr(x) for x in stats[name][i]]
+                    outFile.write(",".join([key, name] + values) + "\n")
+            outFile.close()
+
+# value of a summary column as a float, nan if it isn't a number
+def toFloat(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float("nan")
+
+# write the numeric columns of several summaries as one long-form 
+# table, with a row for each (run, column).  summaries is a list of 
+# (name, repeat, Summary), where repeat is None outside blanchette.
+# paths ending in .parquet are written as parquet, anything else as 
+# an arrow ipc file.  needs pyarrow
+def writeColumnar(path, summaries):
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise RuntimeError("pyarrow is needed to write %s" % path)
+    columns = dict([(i, []) for i in ["Name", "Repeat", "Params", "Metric", 
+                                      "Value"] + Params.Header])
+    for name, repeat, summary in summaries:
+        if len(summary.table) == 0:
+            continue
+        header = summary.getHeader()
+        for params, row in zip(summary.params, summary.getRows()):
+            if params is None:
+                continue
+            paramsRow = params.asRow()
+            for metric, value in zip(header, row)[len(Params.Header):]:
+                value = toFloat(value)
+                if math.isnan(value):
+                    continue
+                columns["Name"].append(name)
+                columns["Repeat"].append(repeat)
+                columns["Params"].append(str(params))
+                for column, paramsValue in zip(Params.Header, paramsRow):
+                    columns[column].append(str(paramsValue))
+                columns["Metric"].append(metric)
+                columns["Value"].append(value)
+    names = ["Name", "Repeat", "Params"] + Params.Header + ["Metric", "Value"]
+    types = [pa.string(), pa.int64(), pa.string()] + \
+            [pa.string()] * len(Params.Header) + [pa.string(), pa.float64()]
+    arrays = [pa.array(columns[i], type=t) for i, t in zip(names, types)]
+    table = pa.Table.from_arrays(arrays, names)
+    if path.endswith(".parquet"):
+        import pyarrow.parquet
+        pyarrow.parquet.write_table(table, path)
+    else:
+        sink = pa.OSFile(path, "wb")
+        writer = pa.RecordBatchFileWriter(sink, table.schema)
+        writer.write_table(table)
+        writer.close()
+        sink.close()
+    
 def main():
     usage = "usage: %prog <mafcomp xml> <jobtree xml>"
     description = "TEST: print summary row for input"
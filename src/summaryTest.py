@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+
+#Copyright (C) 2011 by Glenn Hickey
+#
+#Released under the MIT license, see LICENSE.txt
+"""
+"""
+
+import unittest
+import os
+import shutil
+import tempfile
+import subprocess
+
+import numpy as np
+
+from progressiveBenchmarks.src.params import Params
+from progressiveBenchmarks.src.summary import Summary
+from progressiveBenchmarks.src.instrumentation import PhaseTimer
+
+jobTreeStats = """<stats total_run_time="%f" total_clock="%f">
+<jobs><job time="1.0"/></jobs>
+<target_types><CactusCoreWrapper total_time="3.0" total_clock="4.0" total_number="2"/>
+%s</target_types>
+</stats>"""
+
+treeStats = """<stats><chains><base_block_lengths min="1" max="5" avg="2.5"/></chains>
+<terminal_group_sizes min="2" max="3" avg="2.2"/></stats>"""
+
+mafComparison = """<alignmentComparisons>
+<homologyTests><aggregateResults><all average="%f"/></aggregateResults>
+<homologyPairTests>
+<homologyTest sequenceA="human" sequenceB="aggregate">
+<aggregateResults><all average="0.5"/></aggregateResults></homologyTest>
+</homologyPairTests></homologyTests>
+<homologyTests><aggregateResults><all average="0.8"/></aggregateResults>
+<homologyPairTests>
+<homologyTest sequenceA="aggregate" sequenceB="human">
+<aggregateResults><all average="0.7"/></aggregateResults></homologyTest>
+</homologyPairTests></homologyTests>
+</alignmentComparisons>"""
+
+class TestCase(unittest.TestCase):
+    
+    def setUp(self):
+        unittest.TestCase.setUp(self)
+        self.tempDir = tempfile.mkdtemp()
+        self.count = 0
+    
+    def tearDown(self):
+        unittest.TestCase.tearDown(self)
+        shutil.rmtree(self.tempDir)
+    
+    def writeFile(self, contents):
+        path = os.path.join(self.tempDir, "%d.xml" % self.count)
+        self.count += 1
+        outFile = open(path, "w")
+        outFile.write(contents)
+        outFile.close()
+        return path
+    
+    def addRow(self, summary, params, runTime, sensitivity, targetTypes="",
+               phaseTimesPath=None):
+        summary.addRow("name", params, 
+                       self.writeFile(jobTreeStats % (runTime, runTime * 2, targetTypes)),
+                       self.writeFile(mafComparison % sensitivity),
+                       self.writeFile(treeStats), None, None, phaseTimesPath)
+    
+    def testRow(self):
+        summary = Summary()
+        self.addRow(summary, Params(), 10.0, 0.6)
+        name, row = list(summary.getRowDicts())[0]
+        assert row["Run_Time"] == 10.0
+        assert row["CactusCoreWrapper_tot_clock"] == "4.0"
+        assert row["CactusCoreWrapper_count"] == "2"
+        assert row["Core_tot_run"] == "3.0"
+        assert row["Core_tot_clock"] == "4.0"
+        assert row["Blast_tot_clcok"] == ""
+        assert row["CactusCoreWrapper_max_mem"] == ""
+        assert row["Unaccounted_Clock"] == 16.0
+        assert abs(row["Bal. Accuracy"] - 0.7) < 1e-9
+        assert row["human_sens"] == "0.5"
+        assert row["human_spec"] == "0.7"
+        assert row["TGS_Avg"] == "2.2"
+    
+    def testTargetTypesUnioned(self):
+        summary = Summary()
+        self.addRow(summary, Params(), 10.0, 0.6)
+        self.addRow(summary, Params(), 10.0, 0.6, 
+                    "<RunBlast total_time=\"1.0\" total_clock=\"2.0\" max_memory=\"100\"/>")
+        rows = [i[1] for i in summary.getRowDicts()]
+        assert rows[0]["RunBlast_max_mem"] == ""
+        assert rows[1]["RunBlast_max_mem"] == "100"
+        assert rows[1]["Unaccounted_Clock"] == 14.0
+        header = summary.getHeader()
+        assert header.index("CactusCoreWrapper_tot_time") < header.index("RunBlast_tot_time")
+    
+    def testPhases(self):
+        timer = PhaseTimer()
+        with timer.phase("publish"):
+            subprocess.call(["true"])
+        with timer.phase("treeStats"):
+            pass
+        with timer.phase("publish"):
+            pass
+        try:
+            with timer.phase("failing"):
+                raise RuntimeError("failed")
+        except RuntimeError:
+            pass
+        assert [i["name"] for i in timer.phases] == ["publish", "treeStats", 
+                                                    "publish", "failing"]
+        assert timer.phases[-1]["failed"] is True
+        phaseTimesPath = os.path.join(self.tempDir, "phaseTimes.json")
+        timer.context["database"] = "scratch:tmpfs"
+        timer.write(phaseTimesPath)
+        summary = Summary()
+        self.addRow(summary, Params(), 10.0, 0.6, phaseTimesPath=phaseTimesPath)
+        self.addRow(summary, Params(), 10.0, 0.6)
+        rows = [i[1] for i in summary.getRowDicts()]
+        publish = timer.phases[0]["wall"] + timer.phases[2]["wall"]
+        assert abs(rows[0]["Phase_publish_wall"] - publish) < 1e-9
+        assert rows[0]["Phase_treeStats_child_cpu"] == 0.0
+        assert rows[1]["Phase_publish_wall"] == ""
+        assert rows[0]["DB_Placement"] == "scratch:tmpfs"
+        assert rows[0]["JobTree_Placement"] == ""
+    
+    def testAggregateRepeats(self):
+        vanilla = Params()
+        vanilla.vanilla = True
+        repeats = [Summary(), Summary()]
+        self.addRow(repeats[0], Params(), 10.0, 0.6)
+        self.addRow(repeats[0], vanilla, 30.0, 0.2)
+        self.addRow(repeats[1], Params(), 20.0, 0.8)
+        header, keys, stats = Summary.aggregateRepeats(repeats)
+        assert keys == [str(Params()), str(vanilla)]
+        col = header.index("Run_Time")
+        assert np.allclose(stats["mean"][:, col], [15.0, 30.0])
+        assert np.allclose(stats["min"][:, col], [10.0, 30.0])
+        assert np.allclose(stats["max"][:, col], [20.0, 30.0])
+        assert np.allclose(stats["count"][:, col], [2, 1])
+        assert abs(stats["std"][0, col] - np.std([10.0, 20.0], ddof=1)) < 1e-9
+        assert np.isnan(stats["std"][1, col])
+        assert np.isnan(stats["mean"][0, header.index("Root Growth")])
+        
+def main():
+    unittest.main()
+
+if __name__ == '__main__':
+    main()
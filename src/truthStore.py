@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+
+#Copyright (C) 2011 by Glenn Hickey
+#
+#Released under the MIT license, see LICENSE.txt
+
+""" store of the true alignments used to score a sweep, converted
+to maf and renamed to the cactus sequence names.  Entries are keyed on
+the digests of their inputs (the truth file and the naming map), so
+they are built once per dataset and then shared read-only by every
+parameter combination's stats target.  Entries are published with an
+atomic rename, so concurrent targets never see a partial file.
+
+"""
+
+import os
+
+from progressiveBenchmarks.src.execution import Runner
+from progressiveBenchmarks.src.resultCache import fileDigest
+from progressiveBenchmarks.src.resultCache import stringDigest
+from progressiveBenchmarks.src.resultCache import makeDirs
+from progressiveBenchmarks.src.applyNamingToMaf import NamingMap
+from progressiveBenchmarks.src.applyNamingToMaf import applyNamingMapToMaf
+
+class TruthStore:
+    # runner runs the conversion tools (see execution.Runner)
+    def __init__(self, storeDir, memoDir=None, runner=None):
+        self.storeDir = os.path.abspath(storeDir)
+        self.memoDir = memoDir
+        self.runner = runner
+        if self.runner is None:
+            self.runner = Runner()
+
+    def entryPath(self, key):
+        return os.path.join(self.storeDir, key[:2], key + ".maf")
+
+    # return the entry for key, calling build(path) to make it if it
+    # doesn't exist yet
+    def __publish(self, key, build):
+        path = self.entryPath(key)
+        if not os.path.isfile(path):
+            makeDirs(os.path.dirname(path))
+            tempPath = "%s.%s.%d" % (path, os.uname()[1], os.getpid())
+            try:
+                build(tempPath)
+                os.rename(tempPath, path)
+            finally:
+                if os.path.exists(tempPath):
+                    os.remove(tempPath)
+        return path
+
+    # a true alignment in mfa format converted to maf
+    def convertedMfa(self, mfaPath, treePath):
+        key = stringDigest("mfaToMaf", fileDigest(mfaPath, self.memoDir),
+                           fileDigest(treePath, self.memoDir))
+        def build(path):
+            self.runner.run(["mfaToMaf", "--mfaFile", mfaPath, "--outputFile", path,
+                             "--treeFile", treePath])
+        return self.__publish(key, build)
+
+    # a true maf renamed with the naming map of an experiment
+    def renamedMaf(self, mafPath, experimentPath, nameMapCacheDir=None, 
+                   numProcesses=1):
+        nameMap = NamingMap()
+        nameMap.readExperiment(experimentPath, nameMapCacheDir)
+        key = stringDigest("renamed", fileDigest(mafPath, self.memoDir), 
+                           nameMap.digest())
+        def build(path):
+            applyNamingMapToMaf(nameMap, mafPath, path, numProcesses)
+        return self.__publish(key, build)